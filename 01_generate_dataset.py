@@ -3,19 +3,23 @@ Sales Dataset Generation Script
 Author: Juan Esteban Agudelo Alonso
 Project: Sales Data Analysis Portfolio
 Description: Generates synthetic sales data for portfolio demonstration
+
+Usage:
+    python 01_generate_dataset.py
+    python 01_generate_dataset.py --rows 100000000 --customers 5000000 --chunk-size 2000000
+    python 01_generate_dataset.py --rows 1000000000 --customers 20000000 --output-dir sales_shards --workers 64
 """
 
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from datetime import datetime
-
-# Configuration
-np.random.seed(42)
-n_transactions = 2500
 
-print("=" * 70)
-print("SALES DATASET GENERATION")
-print("=" * 70)
+from sales_pipeline.schema import COLUMNS, CENTS_PER_DOLLAR, memory_report, pandas_dtypes, to_dollars
 
 # ==========================================
 # PRODUCT CATALOG
@@ -53,146 +57,402 @@ products_catalog = {
     ]
 }
 
-print("\n📦 Product Catalog Loaded")
-print(f"   Categories: {len(products_catalog)}")
-total_products = sum(len(prods) for prods in products_catalog.values())
-print(f"   Total Products: {total_products}")
-
-# ==========================================
-# GENERATE DATES (with seasonality)
-# ==========================================
-
-print("\n📅 Generating transaction dates...")
-
-dates = []
-for _ in range(n_transactions):
-    # Higher probability in Q4 (holiday season)
-    month = np.random.choice(
-        range(1, 13),
-        p=[0.07, 0.07, 0.08, 0.08, 0.08, 0.08, 
-           0.08, 0.08, 0.09, 0.09, 0.10, 0.10]
-    )
-    day = np.random.randint(1, 29)
-    dates.append(datetime(2024, month, day))
-
-print(f"   ✅ Generated {len(dates):,} transaction dates")
-
-# ==========================================
-# GENERATE PRODUCTS AND CATEGORIES
-# ==========================================
-
-print("\n🏷️  Assigning products to transactions...")
-
-categories = []
-products = []
-unit_prices = []
-
-for _ in range(n_transactions):
-    # Category selection with realistic distribution
-    category = np.random.choice(
-        list(products_catalog.keys()),
-        p=[0.25, 0.30, 0.12, 0.23, 0.10]  # Smartphones highest
-    )
-    
-    # Product selection within category
-    product, price = products_catalog[category][
-        np.random.randint(0, len(products_catalog[category]))
-    ]
-    
-    categories.append(category)
-    products.append(product)
-    unit_prices.append(price)
-
-print(f"   ✅ Products assigned")
-
-# ==========================================
-# GENERATE QUANTITIES
-# ==========================================
+# Higher probability in Q4 (holiday season)
+month_probabilities = [0.07, 0.07, 0.08, 0.08, 0.08, 0.08,
+                       0.08, 0.08, 0.09, 0.09, 0.10, 0.10]
 
-print("\n📊 Generating purchase quantities...")
+# Category selection with realistic distribution (Smartphones highest)
+category_probabilities = [0.25, 0.30, 0.12, 0.23, 0.10]
 
 # Most orders are 1-2 items, occasional bulk
-quantities = np.random.choice(
-    [1, 2, 3, 4, 5],
-    n_transactions,
-    p=[0.60, 0.25, 0.10, 0.03, 0.02]
-)
-
-print(f"   ✅ Quantities generated")
-print(f"   Single-item purchases: {(quantities == 1).sum()} ({(quantities == 1).sum()/len(quantities)*100:.1f}%)")
-
-# ==========================================
-# GENERATE CUSTOMER IDs
-# ==========================================
+quantity_values = [1, 2, 3, 4, 5]
+quantity_probabilities = [0.60, 0.25, 0.10, 0.03, 0.02]
 
-print("\n👥 Generating customer data...")
+days_per_month = 28
+year = 2024
 
-# Simulate repeat customers
-n_unique_customers = 800
-customer_ids = [
-    f'CUST{str(i).zfill(4)}' 
-    for i in np.random.randint(1, n_unique_customers + 1, n_transactions)
-]
-
-print(f"   ✅ {n_unique_customers:,} unique customers")
-print(f"   ✅ {n_transactions:,} total transactions")
+# Rows drawn from one child seed; chunks are whole blocks, so the output for a
+# seed does not depend on --chunk-size
+draw_block_rows = 1 << 16
 
 # ==========================================
-# CREATE DATAFRAME
+# LOOKUP TABLES
 # ==========================================
 
-print("\n🔧 Building dataset...")
+category_names = np.array(list(products_catalog.keys()))
+category_sizes = np.array([len(prods) for prods in products_catalog.values()])
+category_offsets = np.concatenate([[0], np.cumsum(category_sizes)[:-1]])
+product_names = np.array([name for prods in products_catalog.values() for name, _ in prods])
+product_prices = np.array([price for prods in products_catalog.values() for _, price in prods])
+product_prices_cents = (product_prices * CENTS_PER_DOLLAR).astype(np.int32)
+
+# One entry per calendar day the generator can emit (days 1-28 of each month)
+day_calendar = np.array([
+    np.datetime64(f'{year}-{month:02d}-{day:02d}')
+    for month in range(1, 13)
+    for day in range(1, days_per_month + 1)
+])
+day_probabilities = np.repeat(np.array(month_probabilities) / days_per_month, days_per_month)
+day_probabilities /= day_probabilities.sum()
+day_labels = day_calendar.astype(str)
+
+
+def format_ids(prefix, numbers, width):
+    """
+    Vectorized equivalent of f'{prefix}{str(i).zfill(width)}'
+
+    Digits are computed arithmetically into a fixed-width byte buffer, which
+    is several times faster than going through Python string formatting.
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    prefix_bytes = np.frombuffer(prefix.encode('ascii'), dtype=np.uint8)
+    buffer = np.empty((len(numbers), len(prefix_bytes) + width), dtype=np.uint8)
+    buffer[:, :len(prefix_bytes)] = prefix_bytes
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    buffer[:, len(prefix_bytes):] = (numbers[:, None] // powers) % 10 + ord('0')
+    return buffer.view(f'S{buffer.shape[1]}').ravel().astype(f'U{buffer.shape[1]}')
+
+
+def draw_day_counts(rng, n_rows):
+    """
+    Number of transactions per calendar day.
+
+    Drawing the per-day counts up front lets every chunk be emitted already
+    in date order, so the output is sorted without holding it all in memory.
+    """
+    return rng.multinomial(n_rows, day_probabilities)
+
+
+def draw_chunk(rng, first_row, n_rows, day_bounds, n_customers):
+    """
+    Draw rows [first_row, first_row + n_rows) as integer index arrays.
+
+    day_bounds is the cumulative sum of the per-day transaction counts; rows
+    are assigned to days in order so each chunk continues where the last
+    one stopped.
+    """
+    row_numbers = np.arange(first_row, first_row + n_rows)
+    category_index = rng.choice(len(category_names), n_rows, p=category_probabilities)
+    within_category = (rng.random(n_rows) * category_sizes[category_index]).astype(np.int64)
+
+    return {
+        'transaction_number': row_numbers + 1,
+        'day_index': np.searchsorted(day_bounds, row_numbers, side='right'),
+        'category_index': category_index,
+        'product_index': category_offsets[category_index] + within_category,
+        'customer_number': rng.integers(1, n_customers + 1, n_rows),
+        'quantity': rng.choice(quantity_values, n_rows, p=quantity_probabilities)
+    }
+
+
+def build_frame(draws):
+    """
+    Turn the index arrays from draw_chunk into a frame in the compact schema
+    (uint32 keys, categoricals, uint8 quantity, int32 cents)
+    """
+    unit_prices = product_prices_cents[draws['product_index']]
+    frame = pd.DataFrame({
+        'transaction_id': draws['transaction_number'],
+        'sale_date': day_calendar[draws['day_index']],
+        'product': pd.Categorical.from_codes(draws['product_index'], categories=product_names),
+        'product_category': pd.Categorical.from_codes(draws['category_index'], categories=category_names),
+        'customer_id': draws['customer_number'],
+        'quantity': draws['quantity'],
+        'unit_price': unit_prices,
+        'revenue': draws['quantity'] * unit_prices
+    }, columns=COLUMNS)
+    return frame.astype(pandas_dtypes)
+
+
+def csv_layout(frame, draws, id_widths):
+    """
+    The published CSV schema: 'TXN00001' / 'CUST0001' labels and whole-dollar prices
+    """
+    txn_width, cust_width = id_widths
+    return frame.assign(
+        transaction_id=format_ids('TXN', frame['transaction_id'].to_numpy(), txn_width),
+        sale_date=day_labels[draws['day_index']],
+        customer_id=format_ids('CUST', frame['customer_id'].to_numpy(), cust_width),
+        unit_price=to_dollars(frame['unit_price'].to_numpy(np.int64)),
+        revenue=to_dollars(frame['revenue'].to_numpy(np.int64))
+    )
 
-df = pd.DataFrame({
-    'transaction_id': [f'TXN{str(i).zfill(5)}' for i in range(1, n_transactions + 1)],
-    'sale_date': dates,
-    'product': products,
-    'product_category': categories,
-    'customer_id': customer_ids,
-    'quantity': quantities,
-    'unit_price': unit_prices
-})
 
-# Calculate revenue
-df['revenue'] = df['quantity'] * df['unit_price']
+def round_to_blocks(chunk_size):
+    """
+    chunk_size rounded up to whole blocks of draw_block_rows
+    """
+    return -(-chunk_size // draw_block_rows) * draw_block_rows
+
+
+def draw_blocks(block_seeds, first_row, n_rows, day_bounds, n_customers):
+    """
+    draw_chunk over consecutive draw_block_rows blocks, each from its own
+    child seed, concatenated into one chunk
+    """
+    blocks = []
+    for i, seed in enumerate(block_seeds):
+        block_rows = min(draw_block_rows, n_rows - i * draw_block_rows)
+        blocks.append(draw_chunk(np.random.default_rng(seed), first_row + i * draw_block_rows,
+                                 block_rows, day_bounds, n_customers))
+    return {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+
+
+def write_rows(seed_sequence, path, first_row, n_rows, n_customers, id_widths, chunk_size, log=None):
+    """
+    Generate n_rows transactions starting at row first_row and write them to path.
+
+    The per-day counts and every block of draw_block_rows rows come from
+    child seeds of seed_sequence, and chunk_size is rounded up to whole
+    blocks, so the file depends only on the seed, never on chunk_size.
+    Returns running totals for the summary, so the full frame is never
+    materialized.
+    """
+    n_blocks = -(-n_rows // draw_block_rows)
+    day_seed, *block_seeds = seed_sequence.spawn(1 + n_blocks)
+    day_counts = draw_day_counts(np.random.default_rng(day_seed), n_rows)
+    day_bounds = first_row + np.cumsum(day_counts)
+    chunk_size = round_to_blocks(chunk_size)
+    chunk_blocks = chunk_size // draw_block_rows
+
+    stats = {
+        'rows': n_rows,
+        'total_revenue_cents': 0,
+        'single_item': 0,
+        'category_revenue_cents': np.zeros(len(category_names), dtype=np.int64),
+        'seen_customers': np.zeros(n_customers + 1, dtype=bool),
+        'seen_products': np.zeros(len(product_names), dtype=bool),
+        'day_counts': day_counts,
+        'first_rows': None,
+        'memory': None
+    }
+
+    for offset in range(0, n_rows, chunk_size):
+        chunk_rows = min(chunk_size, n_rows - offset)
+        first_block = offset // draw_block_rows
+        draws = draw_blocks(block_seeds[first_block:first_block + chunk_blocks], first_row + offset,
+                            chunk_rows, day_bounds, n_customers)
+        chunk = build_frame(draws)
+        csv_chunk = csv_layout(chunk, draws, id_widths)
+
+        csv_chunk.to_csv(path, mode='w' if offset == 0 else 'a',
+                         header=offset == 0, index=False)
+
+        revenue = chunk['revenue'].to_numpy(np.int64)
+        stats['total_revenue_cents'] += int(revenue.sum())
+        stats['single_item'] += int((draws['quantity'] == 1).sum())
+        stats['category_revenue_cents'] += np.bincount(draws['category_index'], weights=revenue,
+                                                       minlength=len(category_names)).astype(np.int64)
+        stats['seen_customers'][draws['customer_number']] = True
+        stats['seen_products'][draws['product_index']] = True
+        if stats['first_rows'] is None:
+            stats['first_rows'] = csv_chunk.head()
+            chunk.attrs['id_widths'] = dict(zip(['transaction_id', 'customer_id'], id_widths))
+            stats['memory'] = memory_report(chunk)
+
+        if log is not None:
+            log(f"   ✅ Rows {first_row + offset + 1:,}-{first_row + offset + chunk_rows:,} written")
+
+    return stats
+
+
+def merge_stats(parts):
+    """
+    Combine the running totals of several shards (in shard order)
+    """
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        merged['rows'] += part['rows']
+        merged['total_revenue_cents'] += part['total_revenue_cents']
+        merged['single_item'] += part['single_item']
+        merged['category_revenue_cents'] = merged['category_revenue_cents'] + part['category_revenue_cents']
+        merged['seen_customers'] = merged['seen_customers'] | part['seen_customers']
+        merged['seen_products'] = merged['seen_products'] | part['seen_products']
+        merged['day_counts'] = merged['day_counts'] + part['day_counts']
+    return merged
 
-# Sort by date
-df = df.sort_values('sale_date').reset_index(drop=True)
 
 # ==========================================
-# SAVE DATASET
+# SHARDED GENERATION
 # ==========================================
 
-print("\n💾 Saving dataset...")
-
-df.to_csv('sales_data.csv', index=False)
-
-print("   ✅ Saved as: sales_data.csv")
-
-# ==========================================
-# SUMMARY STATISTICS
-# ==========================================
+def shard_ranges(n_rows, shard_rows):
+    """
+    Disjoint [first_row, first_row + n) ranges covering all transactions
+    """
+    return [(first_row, min(shard_rows, n_rows - first_row))
+            for first_row in range(0, n_rows, shard_rows)]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def generate_shard(task):
+    """
+    Process-pool worker: write one shard file from its own child seed.
+
+    The shard's content depends only on the root seed and its shard index,
+    never on which worker runs it or how many workers there are.
+    """
+    shard_index, seed_sequence, first_row, n_rows, n_customers, id_widths, chunk_size, path = task
+    stats = write_rows(seed_sequence, path, first_row, n_rows, n_customers, id_widths, chunk_size)
+    stats['seen_customers'] = np.packbits(stats['seen_customers'])
+    stats['manifest'] = {
+        'shard': shard_index,
+        'file': os.path.basename(path),
+        'first_transaction': first_row + 1,
+        'last_transaction': first_row + n_rows,
+        'rows': n_rows,
+        'bytes': os.path.getsize(path),
+        'sha256': file_sha256(path)
+    }
+    return stats
+
+
+def generate_shards(args, id_widths, log=print):
+    """
+    Generate args.rows transactions as partitioned files plus manifest.json
+    """
+    os.makedirs(args.output_dir, exist_ok=True)
+    ranges = shard_ranges(args.rows, args.shard_rows)
+    child_seeds = np.random.SeedSequence(args.seed).spawn(len(ranges))
+    name_width = max(5, len(str(len(ranges) - 1)))
+
+    tasks = [
+        (i, child_seeds[i], first_row, n_rows, args.customers, id_widths, args.chunk_size,
+         os.path.join(args.output_dir, f'part-{i:0{name_width}d}.csv'))
+        for i, (first_row, n_rows) in enumerate(ranges)
+    ]
 
-print("\n" + "=" * 70)
-print("📊 DATASET SUMMARY")
-print("=" * 70)
-
-print(f"\n📌 Dimensions: {len(df):,} rows × {len(df.columns)} columns")
-print(f"📅 Date Range: {df['sale_date'].min().date()} to {df['sale_date'].max().date()}")
-print(f"💰 Total Revenue: ${df['revenue'].sum():,.2f}")
-print(f"📊 Average Transaction: ${df['revenue'].mean():,.2f}")
-print(f"👥 Unique Customers: {df['customer_id'].nunique():,}")
-print(f"📦 Unique Products: {df['product'].nunique()}")
-
-print("\n📋 First 5 Rows:")
-print(df.head())
-
-print("\n📋 Revenue by Category:")
-category_revenue = df.groupby('product_category')['revenue'].sum().sort_values(ascending=False)
-for cat, rev in category_revenue.items():
-    pct = (rev / df['revenue'].sum()) * 100
-    print(f"   {cat}: ${rev:,.2f} ({pct:.1f}%)")
-
-print("\n" + "=" * 70)
-print("✅ DATASET GENERATION COMPLETE!")
-print("=" * 70)
\ No newline at end of file
+    # Totals are folded in as shards finish so only one shard's stats are held at a time
+    merged = None
+    entries = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for stats in pool.map(generate_shard, tasks):
+            entry = stats.pop('manifest')
+            log(f"   ✅ Shard {entry['shard']}: transactions "
+                f"{entry['first_transaction']:,}-{entry['last_transaction']:,} → {entry['file']}")
+            entries.append(entry)
+            stats['seen_customers'] = np.unpackbits(
+                stats['seen_customers'], count=args.customers + 1).astype(bool)
+            merged = stats if merged is None else merge_stats([merged, stats])
+
+    manifest = {
+        'format': 'csv',
+        'columns': COLUMNS,
+        'seed': args.seed,
+        'rows': args.rows,
+        'customers': args.customers,
+        'shard_rows': args.shard_rows,
+        'chunk_size': args.chunk_size,
+        'shards': entries
+    }
+    manifest_path = os.path.join(args.output_dir, 'manifest.json')
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return merged, manifest_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic sales transactions.')
+    parser.add_argument('--rows', type=int, default=2500,
+                        help='number of transactions to generate (default: 2500)')
+    parser.add_argument('--customers', type=int, default=800,
+                        help='number of distinct customer IDs to draw from (default: 800)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='random seed (default: 42)')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000,
+                        help='rows generated and written per chunk, rounded up to whole blocks of '
+                             f'{draw_block_rows:,}; does not change the output (default: 1000000)')
+    parser.add_argument('--output', default='sales_data.csv',
+                        help='output CSV path (default: sales_data.csv)')
+    parser.add_argument('--output-dir',
+                        help='write partitioned shard files plus manifest.json here instead of --output')
+    parser.add_argument('--shard-rows', type=int, default=5_000_000,
+                        help='transactions per shard in --output-dir mode (default: 5000000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes in --output-dir mode (default: all CPUs)')
+    args = parser.parse_args(argv)
+    if min(args.rows, args.customers, args.chunk_size, args.shard_rows, args.workers) < 1:
+        parser.error('--rows, --customers, --chunk-size, --shard-rows and --workers must be positive')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    n_transactions = args.rows
+    n_unique_customers = args.customers
+
+    print("=" * 70)
+    print("SALES DATASET GENERATION")
+    print("=" * 70)
+
+    print("\n📦 Product Catalog Loaded")
+    print(f"   Categories: {len(products_catalog)}")
+    print(f"   Total Products: {len(product_names)}")
+
+    # ==========================================
+    # GENERATE AND SAVE IN CHUNKS
+    # ==========================================
+
+    id_widths = (max(5, len(str(n_transactions))), max(4, len(str(n_unique_customers))))
+
+    if args.output_dir:
+        n_shards = len(shard_ranges(n_transactions, args.shard_rows))
+        print(f"\n🔧 Building {n_shards:,} shards of up to {args.shard_rows:,} rows "
+              f"with {args.workers} workers...")
+        stats, manifest_path = generate_shards(args, id_widths)
+        print(f"\n💾 Saved {n_shards:,} shards to: {args.output_dir}")
+        print(f"   Manifest: {manifest_path}")
+    else:
+        print(f"\n🔧 Building dataset in chunks of {round_to_blocks(args.chunk_size):,} rows...")
+        stats = write_rows(np.random.SeedSequence(args.seed), args.output, 0, n_transactions, n_unique_customers,
+                           id_widths, args.chunk_size, log=print)
+        print(f"\n💾 Saved as: {args.output}")
+
+    # ==========================================
+    # SUMMARY STATISTICS
+    # ==========================================
+
+    total_revenue = stats['total_revenue_cents'] / CENTS_PER_DOLLAR
+    single_item = stats['single_item']
+    category_revenue = stats['category_revenue_cents'] / CENTS_PER_DOLLAR
+    memory = stats['memory']
+    active_days = np.flatnonzero(stats['day_counts'])
+
+    print("\n" + "=" * 70)
+    print("📊 DATASET SUMMARY")
+    print("=" * 70)
+
+    print(f"\n📌 Dimensions: {n_transactions:,} rows × {len(COLUMNS)} columns")
+    print(f"📅 Date Range: {day_calendar[active_days[0]]} to {day_calendar[active_days[-1]]}")
+    print(f"💰 Total Revenue: ${total_revenue:,.2f}")
+    print(f"📊 Average Transaction: ${total_revenue / n_transactions:,.2f}")
+    print(f"👥 Unique Customers: {int(stats['seen_customers'].sum()):,}")
+    print(f"📦 Unique Products: {int(stats['seen_products'].sum())}")
+    print(f"🛒 Single-item purchases: {single_item:,} ({single_item / n_transactions * 100:.1f}%)")
+
+    print(f"🧠 Memory per Row: {memory['compact_bytes_per_row']:.0f} bytes in the compact schema "
+          f"vs {memory['legacy_bytes_per_row']:.0f} bytes as CSV strings ({memory['saved_pct']:.1f}% saved)")
+
+    print("\n📋 First 5 Rows:")
+    print(stats['first_rows'])
+
+    print("\n📋 Revenue by Category:")
+    for i in np.argsort(-category_revenue, kind='stable'):
+        pct = (category_revenue[i] / total_revenue) * 100
+        print(f"   {category_names[i]}: ${category_revenue[i]:,.2f} ({pct:.1f}%)")
+
+    print("\n" + "=" * 70)
+    print("✅ DATASET GENERATION COMPLETE!")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
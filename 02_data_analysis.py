@@ -7,14 +7,18 @@ Project: Sales Data Analysis Portfolio
 import pandas as pd
 import numpy as np
 
+from sales_pipeline.context import get_context, monthly_frame
+from sales_pipeline.schema import format_ids, memory_report, to_dollars
+from sales_pipeline.timeseries import WINDOWS, daily_series
+from sales_pipeline.validate import validate_frame
+
 # Load data
 print("=" * 70)
 print("EXPLORATORY DATA ANALYSIS")
 print("=" * 70)
 
-df = pd.read_csv('sales_data.csv')
-df['sale_date'] = pd.to_datetime(df['sale_date'])
-df['year_month'] = df['sale_date'].dt.to_period('M')
+ctx = get_context()
+df = ctx.df
 
 # ==========================================
 # DATA QUALITY CHECKS
@@ -23,20 +27,30 @@ df['year_month'] = df['sale_date'].dt.to_period('M')
 print("\n🔍 DATA QUALITY ASSESSMENT")
 print("-" * 70)
 
+# One pass over the frame for every check (see sales_pipeline/validate.py)
+quality = validate_frame(df)
+
 print("\n1. Missing Values:")
-missing = df.isnull().sum()
+missing = pd.Series(quality['missing_by_column'], dtype='int64')
 if missing.sum() == 0:
     print("   ✅ No missing values")
 else:
     print(missing[missing > 0])
 
-print(f"\n2. Duplicate Transactions: {df.duplicated(subset='transaction_id').sum()}")
-print("   ✅ No duplicates" if df.duplicated(subset='transaction_id').sum() == 0 else "   ⚠️  Duplicates found")
+duplicates = quality['violations']['duplicate_transaction_id']
+print(f"\n2. Duplicate Transactions: {duplicates}")
+print("   ✅ No duplicates" if duplicates == 0 else "   ⚠️  Duplicates found")
 
-revenue_valid = (df['quantity'] * df['unit_price'] == df['revenue']).all()
+revenue_valid = quality['violations']['revenue_mismatch'] == 0
 print(f"\n3. Revenue Calculation Valid: {revenue_valid}")
 print("   ✅ All calculations correct" if revenue_valid else "   ⚠️  Issues found")
 
+memory = memory_report(df)
+print(f"\n4. Memory Footprint (compact schema):")
+print(f"   In memory: {memory['compact_bytes'] / 1e6:,.2f} MB ({memory['compact_bytes_per_row']:.0f} bytes/row)")
+print(f"   As plain CSV columns: {memory['legacy_bytes'] / 1e6:,.2f} MB ({memory['legacy_bytes_per_row']:.0f} bytes/row)")
+print(f"   ✅ Saved {memory['saved_bytes'] / 1e6:,.2f} MB ({memory['saved_pct']:.1f}%)")
+
 # ==========================================
 # DESCRIPTIVE STATISTICS
 # ==========================================
@@ -45,18 +59,18 @@ print("\n" + "=" * 70)
 print("📊 DESCRIPTIVE STATISTICS")
 print("=" * 70)
 
-print(f"\nTotal Transactions: {len(df):,}")
-print(f"Date Range: {df['sale_date'].min().date()} to {df['sale_date'].max().date()}")
-print(f"Unique Customers: {df['customer_id'].nunique():,}")
-print(f"Unique Products: {df['product'].nunique()}")
-print(f"Product Categories: {df['product_category'].nunique()}")
+print(f"\nTotal Transactions: {ctx.total_transactions:,}")
+print(f"Date Range: {ctx.first_date.date()} to {ctx.last_date.date()}")
+print(f"Unique Customers: {ctx.unique_customers:,}")
+print(f"Unique Products: {ctx.unique_products}")
+print(f"Product Categories: {ctx.n_categories}")
 
 print("\n💰 Revenue Statistics:")
-print(f"  Total Revenue: ${df['revenue'].sum():,.2f}")
-print(f"  Average Transaction: ${df['revenue'].mean():,.2f}")
-print(f"  Median Transaction: ${df['revenue'].median():,.2f}")
-print(f"  Max Transaction: ${df['revenue'].max():,.2f}")
-print(f"  Min Transaction: ${df['revenue'].min():,.2f}")
+print(f"  Total Revenue: ${ctx.total_revenue:,.2f}")
+print(f"  Average Transaction: ${ctx.revenue_mean:,.2f}")
+print(f"  Median Transaction: ${ctx.revenue_median:,.2f}")
+print(f"  Max Transaction: ${to_dollars(df['revenue'].max()):,.2f}")
+print(f"  Min Transaction: ${to_dollars(df['revenue'].min()):,.2f}")
 
 print("\n📦 Quantity Statistics:")
 print(df['quantity'].describe())
@@ -69,14 +83,13 @@ print("\n" + "=" * 70)
 print("📅 TIME-SERIES ANALYSIS")
 print("=" * 70)
 
-monthly_revenue = df.groupby('year_month')['revenue'].sum().reset_index()
-monthly_revenue['year_month'] = monthly_revenue['year_month'].astype(str)
+monthly_revenue = monthly_frame(ctx.monthly_revenue)
 
 print("\nMonthly Revenue:")
 for _, row in monthly_revenue.iterrows():
     print(f"  {row['year_month']}: ${row['revenue']:,.2f}")
 
-monthly_revenue_series = df.groupby('year_month')['revenue'].sum()
+monthly_revenue_series = ctx.monthly_revenue
 monthly_growth = monthly_revenue_series.pct_change() * 100
 
 print("\nMonth-over-Month Growth (%):")
@@ -84,6 +97,15 @@ for month, growth in monthly_growth.items():
     if pd.notna(growth):
         print(f"  {month}: {growth:+.2f}%")
 
+trend = daily_series(ctx)
+snapshot = trend.snapshot()['revenue']
+print(f"\nRolling Daily Revenue (as of {trend.end}):")
+for window in WINDOWS:
+    print(f"  Last {window} days: ${snapshot[f'sum_{window}d']:,.2f} (avg ${snapshot[f'avg_{window}d']:,.2f}/day)")
+for label, key in [('Week-over-Week', 'wow_pct'), ('Year-over-Year', 'yoy_pct')]:
+    growth = snapshot[key]
+    print(f"  {label} (7-day): {f'{growth:+.2f}%' if pd.notna(growth) else 'n/a (not enough history)'}")
+
 # ==========================================
 # PRODUCT ANALYSIS
 # ==========================================
@@ -92,11 +114,11 @@ print("\n" + "=" * 70)
 print("🏆 PRODUCT PERFORMANCE")
 print("=" * 70)
 
-top_products = df.groupby('product')['revenue'].sum().sort_values(ascending=False).head(10)
+top_products = ctx.product_revenue.head(10)
 
 print("\nTop 10 Products by Revenue:")
 for i, (product, revenue) in enumerate(top_products.items(), 1):
-    pct = (revenue / df['revenue'].sum()) * 100
+    pct = (revenue / ctx.total_revenue) * 100
     print(f"  {i}. {product}: ${revenue:,.2f} ({pct:.1f}%)")
 
 # ==========================================
@@ -107,10 +129,10 @@ print("\n" + "=" * 70)
 print("📦 CATEGORY PERFORMANCE")
 print("=" * 70)
 
-category_revenue = df.groupby('product_category')['revenue'].sum().sort_values(ascending=False)
+category_revenue = ctx.category_revenue
 
 print("\nRevenue by Category:")
-total_revenue = df['revenue'].sum()
+total_revenue = ctx.total_revenue
 for category, revenue in category_revenue.items():
     pct = (revenue / total_revenue) * 100
     print(f"  {category}: ${revenue:,.2f} ({pct:.1f}%)")
@@ -123,13 +145,15 @@ print("\n" + "=" * 70)
 print("👥 CUSTOMER ANALYSIS")
 print("=" * 70)
 
-top_customers = df.groupby('customer_id')['revenue'].sum().sort_values(ascending=False).head(10)
+top_customers = ctx.customer_revenue.head(10)
 
 print("\nTop 10 Customers by Revenue:")
+top_customers.index = format_ids(top_customers.index, 'customer_id', ctx.id_widths.get('customer_id'))
+
 for i, (customer, revenue) in enumerate(top_customers.items(), 1):
     print(f"  {i}. {customer}: ${revenue:,.2f}")
 
-customer_frequency = df.groupby('customer_id').size()
+customer_frequency = ctx.customer_summary['frequency']
 print("\nCustomer Purchase Frequency:")
 print(customer_frequency.describe())
 
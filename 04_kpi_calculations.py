@@ -6,10 +6,11 @@ Project: Sales Data Analysis Portfolio
 
 import pandas as pd
 
+from sales_pipeline.context import get_context
+from sales_pipeline.kpis import kpi_summary_table
+
 # Load data
-df = pd.read_csv('sales_data.csv')
-df['sale_date'] = pd.to_datetime(df['sale_date'])
-df['year_month'] = df['sale_date'].dt.to_period('M')
+ctx = get_context()
 
 print("=" * 70)
 print("KEY PERFORMANCE INDICATORS (KPIs)")
@@ -19,7 +20,7 @@ print("=" * 70)
 # KPI 1: Total Revenue
 # ==========================================
 
-total_revenue = df['revenue'].sum()
+total_revenue = ctx.total_revenue
 
 print(f"\n1. TOTAL REVENUE: ${total_revenue:,.2f}")
 print("   → Primary measure of business performance")
@@ -29,8 +30,8 @@ print("   → Baseline for growth targets")
 # KPI 2: Transaction Metrics
 # ==========================================
 
-total_transactions = len(df)
-unique_customers = df['customer_id'].nunique()
+total_transactions = ctx.total_transactions
+unique_customers = ctx.unique_customers
 
 print(f"\n2. TRANSACTION METRICS:")
 print(f"   Total Transactions: {total_transactions:,}")
@@ -42,8 +43,8 @@ print("   → Volume indicators for market penetration")
 # KPI 3: Average Order Value (AOV)
 # ==========================================
 
-aov = df['revenue'].mean()
-median_ov = df['revenue'].median()
+aov = ctx.revenue_mean
+median_ov = ctx.revenue_median
 
 print(f"\n3. AVERAGE ORDER VALUE (AOV): ${aov:,.2f}")
 print(f"   Median Order Value: ${median_ov:,.2f}")
@@ -65,8 +66,8 @@ print("   → Baseline for retention program ROI")
 # KPI 5: Product Mix Metrics
 # ==========================================
 
-avg_items_per_transaction = df['quantity'].mean()
-single_item_pct = (df['quantity'] == 1).sum() / len(df) * 100
+avg_items_per_transaction = ctx.quantity_mean
+single_item_pct = ctx.single_item_transactions / total_transactions * 100
 
 print(f"\n5. PRODUCT MIX METRICS:")
 print(f"   Avg Items per Transaction: {avg_items_per_transaction:.2f}")
@@ -78,7 +79,7 @@ print("   → Indicates cross-sell and bundling effectiveness")
 # KPI 6: Monthly Growth Rate
 # ==========================================
 
-monthly_revenue = df.groupby('year_month')['revenue'].sum()
+monthly_revenue = ctx.monthly_revenue
 monthly_growth = monthly_revenue.pct_change() * 100
 
 print(f"\n6. MONTHLY REVENUE GROWTH RATE:")
@@ -97,7 +98,7 @@ print("   → Indicates business momentum and trajectory")
 # ==========================================
 
 print(f"\n7. REVENUE BY CATEGORY:")
-category_revenue = df.groupby('product_category')['revenue'].sum().sort_values(ascending=False)
+category_revenue = ctx.category_revenue
 
 for category, revenue in category_revenue.items():
     pct = (revenue / total_revenue) * 100
@@ -114,38 +115,9 @@ print("\n" + "=" * 70)
 print("📊 KPI SUMMARY TABLE")
 print("=" * 70)
 
-kpi_summary = pd.DataFrame({
-    'KPI': [
-        'Total Revenue',
-        'Total Transactions',
-        'Unique Customers',
-        'Average Order Value',
-        'Avg Customer Value',
-        'Avg Items/Transaction',
-        'Single-Item Transaction %',
-        'Avg Monthly Growth %'
-    ],
-    'Value': [
-        f'${total_revenue:,.2f}',
-        f'{total_transactions:,}',
-        f'{unique_customers:,}',
-        f'${aov:,.2f}',
-        f'${avg_customer_value:,.2f}',
-        f'{avg_items_per_transaction:.2f}',
-        f'{single_item_pct:.1f}%',
-        f'{avg_growth:.2f}%'
-    ],
-    'Business Use': [
-        'Overall performance benchmark',
-        'Volume indicator',
-        'Market penetration metric',
-        'Upselling target',
-        'CAC comparison baseline',
-        'Cross-sell effectiveness',
-        'Bundling opportunity indicator',
-        'Growth momentum tracker'
-    ]
-})
+kpi_summary = kpi_summary_table(
+    total_revenue, total_transactions, unique_customers, aov,
+    avg_customer_value, avg_items_per_transaction, single_item_pct, avg_growth)
 
 print(kpi_summary.to_string(index=False))
 
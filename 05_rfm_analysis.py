@@ -5,17 +5,18 @@ Project: Sales Data Analysis Portfolio
 Description: Segments customers using RFM methodology for targeted marketing
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from sales_pipeline.charts import chart_job, render_charts, rfm_scatter_job
+from sales_pipeline.context import get_context, recency_reference_date
+from sales_pipeline.customer_index import DEFAULT_INDEX, write_index
+from sales_pipeline.dashboards import dashboard_mode, report_job, scatter_points, write_reports
+from sales_pipeline.rfm import rfm_from_summary, score_rfm, segment_rfm
+from sales_pipeline.schema import format_ids
 
 # Load data
-df = pd.read_csv('sales_data.csv')
-df['sale_date'] = pd.to_datetime(df['sale_date'])
+ctx = get_context()
 
 # Reference date (day after last transaction)
-reference_date = df['sale_date'].max() + pd.Timedelta(days=1)
+reference_date = recency_reference_date(ctx)
 
 print("=" * 70)
 print("RFM CUSTOMER SEGMENTATION ANALYSIS")
@@ -27,13 +28,7 @@ print("=" * 70)
 
 print("\n📊 Calculating RFM metrics...")
 
-rfm = df.groupby('customer_id').agg({
-    'sale_date': lambda x: (reference_date - x.max()).days,  # Recency
-    'transaction_id': 'count',  # Frequency
-    'revenue': 'sum'  # Monetary
-}).reset_index()
-
-rfm.columns = ['customer_id', 'recency', 'frequency', 'monetary']
+rfm = rfm_from_summary(ctx.customer_summary, reference_date)
 
 print(f"   ✅ Analyzed {len(rfm):,} customers")
 print(f"\n   Recency range: {rfm['recency'].min()}-{rfm['recency'].max()} days")
@@ -46,22 +41,7 @@ print(f"   Monetary range: ${rfm['monetary'].min():,.0f}-${rfm['monetary'].max()
 
 print("\n🎯 Calculating RFM scores (1-5 scale)...")
 
-# Recency: lower is better (bought recently)
-rfm['R_score'] = pd.qcut(rfm['recency'], q=5, labels=[5, 4, 3, 2, 1])
-
-# Frequency: higher is better
-rfm['F_score'] = pd.qcut(rfm['frequency'].rank(method='first'), q=5, labels=[1, 2, 3, 4, 5])
-
-# Monetary: higher is better
-rfm['M_score'] = pd.qcut(rfm['monetary'], q=5, labels=[1, 2, 3, 4, 5])
-
-# Convert to numeric
-rfm['R_score'] = rfm['R_score'].astype(int)
-rfm['F_score'] = rfm['F_score'].astype(int)
-rfm['M_score'] = rfm['M_score'].astype(int)
-
-# Combined RFM score
-rfm['RFM_score'] = rfm['R_score'] + rfm['F_score'] + rfm['M_score']
+rfm = score_rfm(rfm)
 
 print("   ✅ RFM scores calculated")
 
@@ -71,50 +51,8 @@ print("   ✅ RFM scores calculated")
 
 print("\n🏷️  Segmenting customers...")
 
-def segment_customer(row):
-    """
-    Assign customer segment based on RFM scores
-    """
-    r = row['R_score']
-    f = row['F_score']
-    m = row['M_score']
-    
-    # Champions: Best customers
-    if r >= 4 and f >= 4 and m >= 4:
-        return 'Champions'
-    
-    # Loyal Customers: Buy frequently, spend well
-    elif f >= 4 and m >= 4:
-        return 'Loyal Customers'
-    
-    # Potential Loyalists: Recent buyers with potential
-    elif r >= 4 and f >= 2:
-        return 'Potential Loyalists'
-    
-    # At Risk: Good customers who haven't bought recently
-    elif r <= 2 and f >= 3 and m >= 3:
-        return 'At Risk'
-    
-    # Can't Lose Them: High-value customers at risk
-    elif r <= 2 and m >= 4:
-        return "Can't Lose Them"
-    
-    # Hibernating: Inactive customers
-    elif r <= 2 and f <= 2:
-        return 'Hibernating'
-    
-    # New Customers: Recent first-time buyers
-    elif r >= 4 and f <= 2:
-        return 'New Customers'
-    
-    # Promising: New with potential
-    elif r >= 3 and f == 1:
-        return 'Promising'
-    
-    else:
-        return 'Others'
-
-rfm['segment'] = rfm.apply(segment_customer, axis=1)
+# One lookup per customer in the 125-entry (R, F, M) rule table
+rfm = segment_rfm(rfm)
 
 print("   ✅ Segmentation complete")
 
@@ -140,96 +78,31 @@ segment_analysis['Revenue %'] = (segment_analysis['Total Revenue'] / rfm['moneta
 print(segment_analysis.to_string())
 
 # ==========================================
-# VISUALIZATION 1: Customer Distribution
+# VISUALIZATIONS
 # ==========================================
 
 print("\n📊 Generating visualizations...")
 
 segment_counts = rfm['segment'].value_counts().sort_values(ascending=False)
-
-plt.figure(figsize=(14, 7))
-
-colors = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#6A994E', '#A7C957', '#81B29A', '#F2CC8F']
-bars = plt.barh(range(len(segment_counts)), 
-                segment_counts.values, 
-                color=colors[:len(segment_counts)],
-                edgecolor='black',
-                linewidth=1.2)
-
-plt.yticks(range(len(segment_counts)), segment_counts.index, fontsize=12)
-plt.xlabel('Number of Customers', fontsize=13, fontweight='bold')
-plt.title('Customer Distribution by RFM Segment', fontsize=16, fontweight='bold', pad=20)
-plt.grid(axis='x', alpha=0.3)
-
-for i, (segment, count) in enumerate(segment_counts.items()):
-    pct = (count / len(rfm)) * 100
-    plt.text(count, i, f' {count} ({pct:.1f}%)', 
-             va='center', fontsize=11, fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('rfm_customer_distribution.png', dpi=300, bbox_inches='tight')
-print("   ✅ Saved: rfm_customer_distribution.png")
-plt.close()
-
-# ==========================================
-# VISUALIZATION 2: Revenue by Segment
-# ==========================================
-
 segment_revenue = segment_analysis.sort_values('Total Revenue', ascending=False)
 
-plt.figure(figsize=(14, 7))
-
-bars = plt.barh(range(len(segment_revenue)), 
-                segment_revenue['Total Revenue'], 
-                color=colors[:len(segment_revenue)],
-                edgecolor='black',
-                linewidth=1.2)
-
-plt.yticks(range(len(segment_revenue)), segment_revenue.index, fontsize=12)
-plt.xlabel('Total Revenue ($)', fontsize=13, fontweight='bold')
-plt.title('Revenue Contribution by Customer Segment', fontsize=16, fontweight='bold', pad=20)
-plt.grid(axis='x', alpha=0.3)
-
-for i, (segment, row) in enumerate(segment_revenue.iterrows()):
-    plt.text(row['Total Revenue'], i, 
-             f" ${row['Total Revenue']/1000:.0f}K ({row['Revenue %']:.1f}%)", 
-             va='center', fontsize=11, fontweight='bold')
-
-plt.tight_layout()
-plt.savefig('rfm_revenue_by_segment.png', dpi=300, bbox_inches='tight')
-print("   ✅ Saved: rfm_revenue_by_segment.png")
-plt.close()
-
-# ==========================================
-# VISUALIZATION 3: Scatter Plot
-# ==========================================
-
-plt.figure(figsize=(14, 9))
-
-segments_unique = rfm['segment'].unique()
-colors_scatter = plt.cm.tab10(np.linspace(0, 1, len(segments_unique)))
-
-for i, segment in enumerate(segments_unique):
-    segment_data = rfm[rfm['segment'] == segment]
-    plt.scatter(segment_data['frequency'], 
-                segment_data['monetary'],
-                s=120, 
-                alpha=0.6, 
-                c=[colors_scatter[i]], 
-                label=segment,
-                edgecolors='black',
-                linewidths=0.5)
-
-plt.xlabel('Frequency (Number of Purchases)', fontsize=13, fontweight='bold')
-plt.ylabel('Monetary (Total Revenue $)', fontsize=13, fontweight='bold')
-plt.title('RFM Segmentation: Frequency vs Monetary Value', fontsize=16, fontweight='bold', pad=20)
-plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
-plt.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('rfm_scatter.png', dpi=300, bbox_inches='tight')
-print("   ✅ Saved: rfm_scatter.png")
-plt.close()
+# Each chart is a render job over small inputs (see sales_pipeline.charts)
+jobs = [
+    chart_job('rfm_customer_distribution', 'rfm_customer_distribution.png',
+              segment_counts=segment_counts, n_customers=len(rfm)),
+    chart_job('rfm_revenue_by_segment', 'rfm_revenue_by_segment.png',
+              segment_revenue=segment_revenue[['Total Revenue', 'Revenue %']]),
+    rfm_scatter_job('rfm_scatter.png', rfm[['frequency', 'monetary', 'segment']])
+]
+results = render_charts(jobs, run_name='05_rfm_analysis.py')
+
+# Interactive WebGL scatter, one marker per customer
+points, sampled_from = scatter_points(rfm, ctx.id_widths.get('customer_id'))
+results += write_reports([report_job('rfm_scatter', 'interactive_rfm_scatter.html', dashboard_mode(),
+                                     points=points, sampled_from=sampled_from)],
+                         run_name='05_rfm_analysis.py')
+for path, seconds, cached in results:
+    print(f"   ✅ {'Unchanged' if cached else 'Saved'}: {path} ({'cached' if cached else f'{seconds:.2f}s'})")
 
 # ==========================================
 # STRATEGIC RECOMMENDATIONS
@@ -269,9 +142,14 @@ print("\n" + "=" * 70)
 print("💾 SAVING RESULTS")
 print("=" * 70)
 
-rfm.to_csv('rfm_customer_segments.csv', index=False)
+rfm_export = rfm.assign(customer_id=format_ids(rfm['customer_id'], 'customer_id', ctx.id_widths.get('customer_id')))
+rfm_export.to_csv('rfm_customer_segments.csv', index=False)
 print("   ✅ Saved: rfm_customer_segments.csv")
 
+# Memory-mapped snapshot for sales_pipeline.lookup_service (replaced atomically)
+write_index(rfm, DEFAULT_INDEX, id_width=ctx.id_widths.get('customer_id'))
+print(f"   ✅ Published: {DEFAULT_INDEX}")
+
 segment_analysis.to_csv('rfm_segment_summary.csv')
 print("   ✅ Saved: rfm_segment_summary.csv")
 
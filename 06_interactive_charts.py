@@ -4,228 +4,72 @@ Author: Juan Esteban Agudelo Alonso
 Project: Sales Data Analysis Portfolio
 """
 
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import time
+
+from sales_pipeline.context import get_context, monthly_frame
+from sales_pipeline.dashboards import LIGHT, dashboard_mode, downsample, report_job, write_reports
+from sales_pipeline.timeseries import daily_series
 
 print("=" * 70)
 print("GENERATING INTERACTIVE PLOTLY VISUALIZATIONS")
 print("=" * 70)
 
 # Load data
-df = pd.read_csv('sales_data.csv')
-df['sale_date'] = pd.to_datetime(df['sale_date'])
-df['year_month'] = df['sale_date'].dt.to_period('M').astype(str)
-
-# ==========================================
-# CHART 1: Interactive Revenue Trend
-# ==========================================
+ctx = get_context()
 
-print("\n1. Creating interactive revenue trend...")
-
-monthly_revenue = df.groupby('year_month')['revenue'].sum().reset_index()
-
-fig1 = px.line(
-    monthly_revenue,
-    x='year_month',
-    y='revenue',
-    title='📈 Monthly Revenue Trend 2024 (Interactive)',
-    labels={'year_month': 'Month', 'revenue': 'Revenue ($)'},
-    markers=True
-)
-
-fig1.update_traces(
-    line_color='#2E86AB',
-    line_width=3,
-    marker=dict(size=12, line=dict(width=2, color='white'))
-)
-
-fig1.update_layout(
-    hovermode='x unified',
-    plot_bgcolor='white',
-    font=dict(size=12, family='Arial'),
-    title_font_size=20,
-    title_x=0.5,
-    hoverlabel=dict(bgcolor="white", font_size=14),
-    xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray'),
-    yaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
-)
-
-fig1.write_html('interactive_revenue_trend.html')
-print("   ✅ Saved: interactive_revenue_trend.html")
+# DASHBOARD_MODE=light shares one plotly.js bundle between the pages
+mode = dashboard_mode()
 
 # ==========================================
-# CHART 2: Interactive Top Products
+# CHART INPUTS
 # ==========================================
 
-print("2. Creating interactive top products chart...")
-
-top_10_products = df.groupby('product')['revenue'].sum().sort_values(ascending=False).head(10).reset_index()
-
-fig2 = px.bar(
-    top_10_products,
-    x='revenue',
-    y='product',
-    orientation='h',
-    title='🏆 Top 10 Products by Revenue (Interactive)',
-    labels={'revenue': 'Revenue ($)', 'product': 'Product'},
-    color='revenue',
-    color_continuous_scale='Viridis'
-)
-
-fig2.update_layout(
-    showlegend=False,
-    plot_bgcolor='white',
-    font=dict(size=12, family='Arial'),
-    title_font_size=20,
-    title_x=0.5,
-    hoverlabel=dict(bgcolor="white", font_size=14),
-    xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
-)
-
-fig2.write_html('interactive_top_products.html')
-print("   ✅ Saved: interactive_top_products.html")
+# Each report is a job over a few small aggregates (see sales_pipeline.dashboards)
+print("\n1. Preparing interactive revenue trends (monthly and daily)...")
 
-# ==========================================
-# CHART 3: Sunburst Chart
-# ==========================================
+trend = daily_series(ctx)
+monthly_revenue = monthly_frame(trend.monthly('revenue'))
 
-print("3. Creating interactive sunburst chart...")
+# One point per day: the series light mode downsamples before embedding
+daily_revenue = trend.frame('revenue', windows=(30,))[['revenue', 'avg_30d']].reset_index()
+if mode == LIGHT:
+    daily_revenue = downsample(daily_revenue, 'revenue')
 
-category_product = df.groupby(['product_category', 'product'])['revenue'].sum().reset_index()
+print("2. Preparing interactive top products chart...")
 
-fig3 = px.sunburst(
-    category_product,
-    path=['product_category', 'product'],
-    values='revenue',
-    title='🎯 Revenue Distribution: Categories → Products (Interactive)',
-    color='revenue',
-    color_continuous_scale='RdYlGn',
-    hover_data={'revenue': ':,.0f'}
-)
+top_10_products = ctx.product_revenue.head(10).reset_index()
 
-fig3.update_layout(
-    font=dict(size=12, family='Arial'),
-    title_font_size=20,
-    title_x=0.5
-)
+print("3. Preparing interactive sunburst chart...")
 
-fig3.write_html('interactive_category_sunburst.html')
-print("   ✅ Saved: interactive_category_sunburst.html")
+category_product = ctx.category_product_revenue
 
-# ==========================================
-# CHART 4: Treemap
-# ==========================================
-
-print("4. Creating interactive treemap...")
+print("4. Preparing interactive treemap...")
+print("5. Preparing combined interactive dashboard...")
 
-fig4 = px.treemap(
-    category_product,
-    path=['product_category', 'product'],
-    values='revenue',
-    title='📦 Revenue Treemap by Category and Product',
-    color='revenue',
-    color_continuous_scale='Blues',
-    hover_data={'revenue': ':,.0f'}
-)
+category_revenue = ctx.category_revenue.reset_index()
 
-fig4.update_layout(
-    font=dict(size=12, family='Arial'),
-    title_font_size=20,
-    title_x=0.5
-)
-
-fig4.write_html('interactive_treemap.html')
-print("   ✅ Saved: interactive_treemap.html")
+jobs = [
+    report_job('revenue_trend', 'interactive_revenue_trend.html', mode, monthly_revenue=monthly_revenue),
+    report_job('daily_revenue', 'interactive_daily_revenue.html', mode, daily_revenue=daily_revenue),
+    report_job('top_products', 'interactive_top_products.html', mode, top_10_products=top_10_products),
+    report_job('category_sunburst', 'interactive_category_sunburst.html', mode, category_product=category_product),
+    report_job('treemap', 'interactive_treemap.html', mode, category_product=category_product),
+    report_job('dashboard', 'interactive_dashboard.html', mode, monthly_revenue=monthly_revenue,
+               category_revenue=category_revenue, top_5_products=top_10_products.head(5))
+]
 
 # ==========================================
-# CHART 5: Combined Dashboard
+# WRITE
 # ==========================================
 
-print("5. Creating combined interactive dashboard...")
-
-fig_dashboard = make_subplots(
-    rows=2, cols=2,
-    subplot_titles=(
-        'Monthly Revenue Trend',
-        'Revenue by Category',
-        'Top 5 Products',
-        'Revenue Distribution'
-    ),
-    specs=[
-        [{"type": "scatter"}, {"type": "bar"}],
-        [{"type": "bar"}, {"type": "pie"}]
-    ],
-    vertical_spacing=0.12,
-    horizontal_spacing=0.10
-)
-
-# 1. Revenue trend
-fig_dashboard.add_trace(
-    go.Scatter(
-        x=monthly_revenue['year_month'],
-        y=monthly_revenue['revenue'],
-        mode='lines+markers',
-        name='Revenue',
-        line=dict(color='#2E86AB', width=3),
-        marker=dict(size=10)
-    ),
-    row=1, col=1
-)
-
-# 2. Revenue by category
-category_revenue = df.groupby('product_category')['revenue'].sum().sort_values(ascending=False).reset_index()
-fig_dashboard.add_trace(
-    go.Bar(
-        x=category_revenue['product_category'],
-        y=category_revenue['revenue'],
-        name='Category Revenue',
-        marker_color='#A23B72',
-        showlegend=False
-    ),
-    row=1, col=2
-)
-
-# 3. Top 5 products
-fig_dashboard.add_trace(
-    go.Bar(
-        y=top_10_products.head(5)['product'],
-        x=top_10_products.head(5)['revenue'],
-        orientation='h',
-        name='Top Products',
-        marker_color='#F18F01',
-        showlegend=False
-    ),
-    row=2, col=1
-)
-
-# 4. Pie chart
-fig_dashboard.add_trace(
-    go.Pie(
-        labels=category_revenue['product_category'],
-        values=category_revenue['revenue'],
-        name='Category Share',
-        marker=dict(colors=['#F18F01', '#C73E1D', '#6A994E', '#A7C957', '#2E86AB'])
-    ),
-    row=2, col=2
-)
-
-fig_dashboard.update_layout(
-    height=900,
-    title_text="📊 Sales Analysis Dashboard - 2024",
-    title_font_size=24,
-    title_x=0.5,
-    showlegend=False,
-    plot_bgcolor='white',
-    font=dict(size=11, family='Arial')
-)
-
-fig_dashboard.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
-fig_dashboard.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
-
-fig_dashboard.write_html('interactive_dashboard.html')
-print("   ✅ Saved: interactive_dashboard.html")
+print(f"\n🎨 Writing {len(jobs)} reports ({mode} mode)...")
+
+start = time.perf_counter()
+results = write_reports(jobs, run_name='06_interactive_charts.py')
+for path, seconds, cached in results:
+    print(f"   ✅ {'Unchanged' if cached else 'Saved'}: {path} ({'cached' if cached else f'{seconds:.2f}s'})")
+rendered = sum(not cached for _, _, cached in results)
+print(f"   Wall time: {time.perf_counter() - start:.2f}s ({rendered} written, {len(results) - rendered} unchanged)")
 
 # ==========================================
 # SUMMARY
@@ -236,6 +80,7 @@ print("✅ ALL INTERACTIVE VISUALIZATIONS CREATED!")
 print("=" * 70)
 print("\nGenerated files:")
 print("  📊 interactive_revenue_trend.html")
+print("  📊 interactive_daily_revenue.html")
 print("  📊 interactive_top_products.html")
 print("  📊 interactive_category_sunburst.html")
 print("  📊 interactive_treemap.html")
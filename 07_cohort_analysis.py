@@ -0,0 +1,122 @@
+"""
+Cohort Retention Analysis
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Groups customers by first-purchase month and tracks how many of
+             each cohort keep buying, and what they spend, month by month
+"""
+
+import pandas as pd
+
+from sales_pipeline.charts import chart_job, render_charts
+from sales_pipeline.cohorts import (RETENTION_MONTHS, average_retention, cohort_matrices, cohort_state,
+                                    retention_rates, revenue_per_customer)
+from sales_pipeline.context import get_context
+from sales_pipeline.dashboards import dashboard_mode, report_job, write_reports
+
+# Load data
+ctx = get_context()
+
+print("=" * 70)
+print("COHORT RETENTION ANALYSIS")
+print("=" * 70)
+
+# ==========================================
+# BUILD COHORTS
+# ==========================================
+
+print("\n👥 Building monthly cohorts...")
+
+# Refreshed incrementally: only transactions after the saved watermark are read
+state = cohort_state(ctx)
+customers, revenue = cohort_matrices(state)
+retention = retention_rates(customers)
+cohort_sizes = customers[0].astype(int)
+
+print(f"   ✅ {len(customers)} cohorts, {cohort_sizes.sum():,} customers acquired")
+print(f"   Data through {state['metadata']['watermark']} "
+      f"({customers.shape[1]} months since the first cohort)")
+
+# ==========================================
+# RETENTION BY COHORT
+# ==========================================
+
+print("\n" + "=" * 70)
+print("📊 RETENTION BY COHORT (% of customers buying n months after first purchase)")
+print("=" * 70)
+
+months = [0] + [m for m in RETENTION_MONTHS if m < customers.shape[1]]
+cohort_table = retention[months].round(1)
+cohort_table.columns = [f'Month {m}' for m in months]
+cohort_table.insert(0, 'Customers', cohort_sizes)
+print(cohort_table.to_string())
+
+# ==========================================
+# AVERAGE RETENTION CURVE
+# ==========================================
+
+print("\n" + "=" * 70)
+print("📉 AVERAGE RETENTION CURVE")
+print("=" * 70)
+
+curve = pd.DataFrame({
+    'Retained %': average_retention(customers),
+    'Revenue per Customer': revenue_per_customer(customers, revenue)
+})
+curve['Cumulative Revenue per Customer'] = curve['Revenue per Customer'].cumsum()
+print(curve.round(2).to_string())
+
+# ==========================================
+# VISUALIZATIONS
+# ==========================================
+
+print("\n📊 Generating visualizations...")
+
+results = render_charts([chart_job('cohort_retention', 'cohort_retention.png',
+                                   retention=retention, cohort_sizes=cohort_sizes)],
+                        run_name='07_cohort_analysis.py')
+results += write_reports([report_job('cohort_retention', 'interactive_cohort_retention.html', dashboard_mode(),
+                                     retention=retention, customers=customers, revenue=revenue)],
+                         run_name='07_cohort_analysis.py')
+for path, seconds, cached in results:
+    print(f"   ✅ {'Unchanged' if cached else 'Saved'}: {path} ({'cached' if cached else f'{seconds:.2f}s'})")
+
+# ==========================================
+# SAVE RESULTS
+# ==========================================
+
+print("\n" + "=" * 70)
+print("💾 SAVING RESULTS")
+print("=" * 70)
+
+retention.round(2).to_csv('cohort_retention.csv')
+print("   ✅ Saved: cohort_retention.csv")
+
+revenue.round(2).to_csv('cohort_revenue.csv')
+print("   ✅ Saved: cohort_revenue.csv")
+
+# ==========================================
+# EXECUTIVE SUMMARY
+# ==========================================
+
+print("\n" + "=" * 70)
+print("📈 EXECUTIVE SUMMARY")
+print("=" * 70)
+
+if customers.shape[1] > 1:
+    month_1 = retention[1].dropna()
+    print(f"\n🔁 Month-1 retention: {curve.loc[1, 'Retained %']:.1f}% on average "
+          f"(best cohort {month_1.idxmax()}: {month_1.max():.1f}%, worst {month_1.idxmin()}: {month_1.min():.1f}%)")
+    print("   → Second-purchase campaigns in the first 30 days")
+
+    newest = retention.index[-1]
+    print(f"\n🆕 Newest cohort ({newest}): {cohort_sizes.iloc[-1]:,} customers")
+    print("   → Compare its month-1 retention next month against the average above")
+
+print(f"\n💰 Revenue per acquired customer after {customers.shape[1] - 1} months: "
+      f"${curve['Cumulative Revenue per Customer'].iloc[-1]:,.2f}")
+print("   → Upper bound for acquisition cost per customer")
+
+print("\n" + "=" * 70)
+print("✅ COHORT ANALYSIS COMPLETE")
+print("=" * 70)
@@ -0,0 +1,398 @@
+"""
+Pipeline Scaling Benchmark
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Times every pipeline stage on generated datasets of growing size,
+             records peak memory, and appends the results to a history file
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --rows 10000 100000 1000000 10000000 100000000
+    python benchmarks/bench_pipeline.py --rows 1000000 --format csv --fail-on-regression
+
+Datasets are written by 01_generate_dataset.py (same seed, about three
+transactions per customer) and converted to the partitioned Parquet dataset
+unless --format csv. They are kept in --data-dir and reused on later runs.
+
+Each size runs in a fresh process so memory figures do not carry over. Stages:
+    load        read the dataset into the compact frame (AnalysisContext.df)
+    eda         base aggregates from the frame (compute_base_aggregates)
+    kpi         one streaming pass of the KPI engine over the source
+    rfm_score   RFM metrics from the customer summary plus quintile scores
+    segment     rule-table segmentation
+    charts      the seven static charts of 03 and 05, no artifact cache
+
+For every stage the wall time and the peak RSS reached during the stage are
+recorded. On Linux the peak is reset between stages (/proc/self/clear_refs);
+elsewhere it is the process peak so far. A size that runs out of memory is
+recorded up to the last stage it finished.
+
+Every run appends one JSON line per size to --history (default
+benchmarks/history.jsonl) with the commit, host and library versions. Each
+stage is compared with the previous run of the same size, format and host.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HISTORY_FILE = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+DATA_DIR = os.path.join('.pipeline_cache', 'bench')
+
+STAGES = ['load', 'eda', 'kpi', 'rfm_score', 'segment', 'charts']
+
+# A stage is flagged when it is this much slower than the previous run (and
+# slower by at least MIN_REGRESSION_SECONDS, so timer noise on tiny sizes is ignored)
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# ==========================================
+# MEMORY
+# ==========================================
+
+def reset_peak_rss():
+    """
+    Reset the process high-water mark; returns False where that is not possible
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+# ==========================================
+# DATASETS
+# ==========================================
+
+def dataset_paths(data_dir, rows, customers, seed):
+    name = f'sales_{rows}_{customers}_{seed}'
+    return os.path.join(data_dir, name + '.csv'), os.path.join(data_dir, name + '.parquet')
+
+
+def prepare_dataset(data_dir, rows, customers, seed, data_format):
+    """
+    Generate (and convert) the dataset unless it is already there; returns
+    (source, {step: seconds}) with only the steps that actually ran
+    """
+    from sales_pipeline.storage import convert_csv_to_parquet
+
+    os.makedirs(data_dir, exist_ok=True)
+    csv_path, parquet_path = dataset_paths(data_dir, rows, customers, seed)
+    timings = {}
+
+    if not os.path.exists(csv_path) and not (data_format == 'parquet' and os.path.isdir(parquet_path)):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, '01_generate_dataset.py'),
+                        '--rows', str(rows), '--customers', str(customers), '--seed', str(seed),
+                        '--output', csv_path + '.tmp'],
+                       check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        os.replace(csv_path + '.tmp', csv_path)
+        timings['generate'] = time.perf_counter() - start
+
+    if data_format == 'csv':
+        return csv_path, timings
+
+    if not os.path.isdir(parquet_path):
+        start = time.perf_counter()
+        convert_csv_to_parquet(csv_path, parquet_path + '.tmp')
+        os.replace(parquet_path + '.tmp', parquet_path)
+        timings['convert'] = time.perf_counter() - start
+    return parquet_path, timings
+
+
+# ==========================================
+# STAGES (run in a child process per size)
+# ==========================================
+
+def chart_jobs(aggregates, rfm, directory):
+    """
+    The chart jobs of 03_visualizations.py and 05_rfm_analysis.py, writing into directory
+    """
+    from sales_pipeline.charts import STATIC_STYLE, chart_job, rfm_scatter_job
+
+    monthly_revenue = aggregates['monthly_revenue'].reset_index()
+    monthly_revenue['year_month_str'] = monthly_revenue['year_month'].astype(str)
+    total_revenue = aggregates['total_revenue']
+    segment_revenue = rfm.groupby('segment')['monetary'].sum().sort_values(ascending=False) \
+        .rename('Total Revenue').to_frame()
+    segment_revenue['Revenue %'] = (segment_revenue['Total Revenue'] / rfm['monetary'].sum() * 100).round(1)
+
+    def path(name):
+        return os.path.join(directory, name)
+
+    return [
+        chart_job('revenue_over_time', path('revenue_over_time.png'), STATIC_STYLE,
+                  monthly_revenue=monthly_revenue[['year_month_str', 'revenue']]),
+        chart_job('top_products', path('top_products.png'), STATIC_STYLE,
+                  top_10_products=aggregates['product_revenue'].head(10), total_revenue=total_revenue),
+        chart_job('revenue_by_category', path('revenue_by_category.png'), STATIC_STYLE,
+                  category_revenue=aggregates['category_revenue'], total_revenue=total_revenue),
+        chart_job('top_customers', path('top_customers.png'), STATIC_STYLE,
+                  top_20_customers=aggregates['customer_revenue'].head(20), total_revenue=total_revenue),
+        chart_job('rfm_customer_distribution', path('rfm_customer_distribution.png'),
+                  segment_counts=rfm['segment'].value_counts(), n_customers=len(rfm)),
+        chart_job('rfm_revenue_by_segment', path('rfm_revenue_by_segment.png'),
+                  segment_revenue=segment_revenue),
+        rfm_scatter_job(path('rfm_scatter.png'), rfm[['frequency', 'monetary', 'segment']])
+    ]
+
+
+def measure_stages(source):
+    """
+    Run the stages on source, printing one JSON line per finished stage
+    """
+    import pandas as pd
+
+    from sales_pipeline.charts import render_jobs
+    from sales_pipeline.context import AnalysisContext, compute_base_aggregates
+    from sales_pipeline.kpis import stream_kpis
+    from sales_pipeline.rfm import rfm_from_summary, score_rfm, segment_rfm
+
+    state = {}
+
+    def load():
+        state['df'] = AnalysisContext(source, use_cache=False).df
+        return len(state['df'])
+
+    def eda():
+        state['aggregates'] = compute_base_aggregates(state['df'])
+        # Only the aggregates are needed from here on, as in the cached pipeline
+        del state['df']
+        return state['aggregates']['total_transactions']
+
+    def kpi():
+        return stream_kpis(source).kpis()['total_transactions']
+
+    def rfm_score():
+        aggregates = state['aggregates']
+        reference_date = pd.Timestamp(aggregates['last_date']) + pd.Timedelta(days=1)
+        state['rfm'] = score_rfm(rfm_from_summary(aggregates['customer_summary'], reference_date))
+        return len(state['rfm'])
+
+    def segment():
+        state['rfm'] = segment_rfm(state['rfm'])
+        return len(state['rfm'])
+
+    def charts():
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = chart_jobs(state['aggregates'], state['rfm'], directory)
+            render_jobs(jobs)
+        return len(jobs)
+
+    for name, stage in zip(STAGES, [load, eda, kpi, rfm_score, segment, charts]):
+        scope = 'stage' if reset_peak_rss() else 'process'
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        items = stage()
+        print(json.dumps({
+            'stage': name,
+            'seconds': round(time.perf_counter() - start, 4),
+            'cpu_seconds': round(time.process_time() - cpu_start, 4),
+            'items': int(items),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'peak_scope': scope
+        }), flush=True)
+
+
+def run_size(source):
+    """
+    Measure one dataset in a fresh process; returns (stages, error)
+    """
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', source],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=ROOT)
+    stages = {}
+    for line in result.stdout.splitlines():
+        if line.startswith('{'):
+            record = json.loads(line)
+            stages[record.pop('stage')] = record
+    error = None
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or [f'exit status {result.returncode}']
+        error = tail[0] if result.returncode > 0 else f'killed by signal {-result.returncode}'
+    return stages, error
+
+
+# ==========================================
+# HISTORY
+# ==========================================
+
+def environment():
+    from importlib.metadata import version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': version('pandas'),
+        'numpy': version('numpy'),
+        'pyarrow': version('pyarrow'),
+        'matplotlib': version('matplotlib')
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history, record):
+    """
+    The latest earlier record for the same size, format and host
+    """
+    for entry in reversed(history):
+        if (entry['rows'], entry['format'], entry['env']['host']) == \
+                (record['rows'], record['format'], record['env']['host']):
+            return entry
+    return None
+
+
+def regressions(record, previous):
+    """
+    {stage: slowdown ratio} for stages notably slower than in the previous run
+    """
+    if previous is None:
+        return {}
+    flagged = {}
+    for stage, now in record['stages'].items():
+        before = previous['stages'].get(stage)
+        if before and now['seconds'] > before['seconds'] * (1 + REGRESSION_TOLERANCE) \
+                and now['seconds'] - before['seconds'] > MIN_REGRESSION_SECONDS:
+            flagged[stage] = now['seconds'] / before['seconds']
+    return flagged
+
+
+def append_history(path, records):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+# ==========================================
+# MAIN
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every pipeline stage across dataset sizes.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--transactions-per-customer', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet',
+                        help='source the stages read (default: parquet)')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help=f'where generated datasets are kept (default: {DATA_DIR})')
+    parser.add_argument('--history', default=HISTORY_FILE,
+                        help='JSON-lines file the results are appended to (default: benchmarks/history.jsonl)')
+    parser.add_argument('--no-history', action='store_true', help='do not append this run to the history')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help=f'exit non-zero if a stage is over {REGRESSION_TOLERANCE:.0%} slower than last time')
+    parser.add_argument('--measure', metavar='SOURCE', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.measure:
+        measure_stages(args.measure)
+        return
+
+    print("=" * 70)
+    print("PIPELINE SCALING BENCHMARK")
+    print("=" * 70)
+
+    env = environment()
+    history = load_history(args.history)
+    data_dir = os.path.join(ROOT, args.data_dir)
+    run_at = datetime.datetime.now().isoformat(timespec='seconds')
+    print(f"\nCommit {env['commit']} on {env['host']} ({env['cpus']} CPUs), "
+          f"pandas {env['pandas']}, pyarrow {env['pyarrow']}, source: {args.format}")
+
+    records = []
+    any_regression = False
+    for rows in args.rows:
+        customers = max(1, rows // args.transactions_per_customer)
+        print(f"\n📦 {rows:,} rows, {customers:,} customers")
+        source, prepare = prepare_dataset(data_dir, rows, customers, args.seed, args.format)
+        for step, seconds in prepare.items():
+            print(f"   {step:<10} {seconds:9.2f}s")
+
+        stages, error = run_size(source)
+        record = {
+            'run_at': run_at,
+            'rows': rows,
+            'customers': customers,
+            'format': args.format,
+            'env': env,
+            'prepare': {step: round(seconds, 4) for step, seconds in prepare.items()},
+            'stages': stages,
+            'total_seconds': round(sum(stage['seconds'] for stage in stages.values()), 4),
+            'peak_rss_mb': max((stage['peak_rss_mb'] for stage in stages.values()), default=None),
+            'error': error
+        }
+        flagged = regressions(record, previous_run(history, record))
+        any_regression |= bool(flagged)
+        records.append(record)
+
+        print(f"   {'stage':<10} {'seconds':>9} {'ns/row':>9} {'peak RSS':>10}")
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            measured = stages[stage]
+            note = f"   ⚠️  {flagged[stage]:.2f}x slower than last run" if stage in flagged else ''
+            print(f"   {stage:<10} {measured['seconds']:9.2f} {measured['seconds'] / rows * 1e9:9.0f} "
+                  f"{measured['peak_rss_mb']:8,.0f} MB{note}")
+        if error:
+            print(f"   ❌ stopped after {len(stages)} of {len(STAGES)} stages: {error}")
+
+    if not args.no_history:
+        append_history(args.history, records)
+        print(f"\n💾 Appended {len(records)} results to {args.history}")
+
+    print("\n📈 Seconds per stage by size")
+    print(f"   {'rows':>12} " + ' '.join(f'{stage:>10}' for stage in STAGES) + f" {'peak RSS':>10}")
+    for record in records:
+        cells = [f"{record['stages'][stage]['seconds']:10.2f}" if stage in record['stages'] else f"{'-':>10}"
+                 for stage in STAGES]
+        peak = f"{record['peak_rss_mb']:7,.0f} MB" if record['peak_rss_mb'] else f"{'-':>10}"
+        print(f"   {record['rows']:>12,} " + ' '.join(cells) + f" {peak}")
+
+    if any_regression and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+RFM Engine Benchmark
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Times the original row-wise RFM path (groupby lambda + apply)
+             against the vectorized engine and checks both give the same labels
+
+Usage:
+    python benchmarks/bench_rfm.py
+    python benchmarks/bench_rfm.py --customers 10000 100000 1000000 --transactions-per-customer 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sales_pipeline.rfm import compute_rfm, score_rfm, segment_customer, segment_rfm  # noqa: E402
+
+
+def synthetic_transactions(n_customers, per_customer, seed=42):
+    """
+    Transactions in the compact schema with roughly per_customer purchases each
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_customers * per_customer
+    return pd.DataFrame({
+        'transaction_id': np.arange(1, n_rows + 1, dtype=np.uint32),
+        'sale_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D'),
+        'customer_id': rng.integers(1, n_customers + 1, n_rows).astype(np.uint32),
+        'revenue': (rng.choice([19, 29, 49, 449, 699, 999, 1899], n_rows)
+                    * rng.choice([1, 2, 3], n_rows, p=[0.7, 0.2, 0.1]) * 100).astype(np.int32)
+    })
+
+
+def legacy_rfm(df):
+    """
+    The pre-engine path from 05_rfm_analysis.py: lambda recency and row-wise apply
+    """
+    reference_date = df['sale_date'].max() + pd.Timedelta(days=1)
+    rfm = df.groupby('customer_id').agg({
+        'sale_date': lambda x: (reference_date - x.max()).days,
+        'transaction_id': 'count',
+        'revenue': 'sum'
+    }).reset_index()
+    rfm.columns = ['customer_id', 'recency', 'frequency', 'monetary']
+    rfm['monetary'] = rfm['monetary'] // 100
+    rfm = score_rfm(rfm)
+    rfm['segment'] = rfm.apply(
+        lambda row: segment_customer(row['R_score'], row['F_score'], row['M_score']), axis=1)
+    return rfm
+
+
+def engine_rfm(df):
+    return segment_rfm(score_rfm(compute_rfm(df)))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark row-wise vs vectorized RFM.')
+    parser.add_argument('--customers', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--transactions-per-customer', type=int, default=3)
+    parser.add_argument('--skip-legacy-above', type=int, default=200_000,
+                        help='only time the engine for customer counts above this')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("RFM ENGINE BENCHMARK")
+    print("=" * 70)
+    print(f"\n{'Customers':>12} {'Legacy (s)':>12} {'Engine (s)':>12} {'Speedup':>9}  Labels")
+
+    for n_customers in args.customers:
+        df = synthetic_transactions(n_customers, args.transactions_per_customer)
+        engine, engine_s = timed(engine_rfm, df)
+
+        if n_customers > args.skip_legacy_above:
+            print(f"{n_customers:>12,} {'-':>12} {engine_s:>12.2f} {'-':>9}  -")
+            continue
+
+        legacy, legacy_s = timed(legacy_rfm, df)
+        same = (legacy['segment'].to_numpy() == engine['segment'].to_numpy()).all() and \
+            legacy[['recency', 'frequency', 'monetary']].equals(engine[['recency', 'frequency', 'monetary']])
+        print(f"{n_customers:>12,} {legacy_s:>12.2f} {engine_s:>12.2f} {legacy_s / engine_s:>8.1f}x  "
+              f"{'✅ identical' if same else '❌ MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
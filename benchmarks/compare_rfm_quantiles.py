@@ -0,0 +1,117 @@
+"""
+Exact vs Sketch RFM Quintiles
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Scores customers with exact pd.qcut quintiles and with merged KLL
+             sketches, then reports how many R/F/M scores and segments agree,
+             the observed rank error of the quintile boundaries and the
+             sketch memory
+
+Usage:
+    python benchmarks/compare_rfm_quantiles.py                         # the sales dataset
+    python benchmarks/compare_rfm_quantiles.py --customers 100000 1000000 --k 200 800
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_rfm import synthetic_transactions  # noqa: E402
+from sales_pipeline.quantiles import rank_error_bound  # noqa: E402
+from sales_pipeline.rfm import (QUINTILES, compute_rfm, merge_sketches, rfm_sketches,  # noqa: E402
+                                score_rfm, score_rfm_streaming, segment_rfm)
+from sales_pipeline.storage import load_sales  # noqa: E402
+
+
+def partitions(rfm, n_partitions):
+    return [rfm.iloc[idx] for idx in np.array_split(np.arange(len(rfm)), n_partitions)]
+
+
+def sketch_rfm(rfm, k, n_partitions):
+    """
+    Sketch each partition separately, merge, then score partition by partition
+    """
+    parts = partitions(rfm, n_partitions)
+    sketches = None
+    for i, part in enumerate(parts):
+        partial = rfm_sketches(part, k, seed=i)
+        sketches = partial if sketches is None else merge_sketches(sketches, partial)
+    scored = pd.concat([segment_rfm(chunk) for chunk in score_rfm_streaming(parts, sketches)])
+    return scored, sketches
+
+
+def boundary_rank_error(values, sketch):
+    """
+    Largest distance between a requested quintile and the true rank range of
+    the sketch's boundary estimate (inner boundaries only)
+    """
+    sorted_values = np.sort(values)
+    estimates = sketch.quantile(QUINTILES[1:-1])
+    low = np.searchsorted(sorted_values, estimates, side='left') / len(values)
+    high = np.searchsorted(sorted_values, estimates, side='right') / len(values)
+    q = QUINTILES[1:-1]
+    return float(np.max(np.maximum(low - q, 0) + np.maximum(q - high, 0)))
+
+
+def compare(label, rfm, k, n_partitions):
+    start = time.perf_counter()
+    exact = segment_rfm(score_rfm(rfm))
+    exact_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx, sketches = sketch_rfm(rfm, k, n_partitions)
+    approx_s = time.perf_counter() - start
+
+    agree = {column: (approx[column].to_numpy() == exact[column].to_numpy()).mean() * 100
+             for column in ['R_score', 'F_score', 'M_score', 'segment']}
+    error = max(boundary_rank_error(rfm[metric].to_numpy(), sketches[metric])
+                for metric in ['recency', 'monetary'])
+    memory = sum(sketch.nbytes for sketch in sketches.values())
+
+    print(f"{label:>12} {k:>6} {exact_s:>9.2f} {approx_s:>9.2f} "
+          f"{agree['R_score']:>7.2f}% {agree['F_score']:>7.2f}% {agree['M_score']:>7.2f}% "
+          f"{agree['segment']:>8.2f}% {error * 100:>7.3f}% {rank_error_bound(k) * 100:>6.2f}% "
+          f"{memory / 1024:>8.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare exact and sketch-based RFM quintile scoring.')
+    parser.add_argument('--source', help='sales dataset to compare on (default: sales_data.parquet or sales_data.csv)')
+    parser.add_argument('--customers', type=int, nargs='*', default=[],
+                        help='also compare on synthetic data with these customer counts')
+    parser.add_argument('--transactions-per-customer', type=int, default=3)
+    parser.add_argument('--k', type=int, nargs='+', default=[200], help='sketch sizes to try')
+    parser.add_argument('--partitions', type=int, default=4,
+                        help='sketch this many partitions separately and merge them')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("EXACT VS SKETCH RFM QUINTILES")
+    print("=" * 70)
+    print(f"\n{'Customers':>12} {'k':>6} {'Exact(s)':>9} {'Sketch(s)':>9} "
+          f"{'R agree':>8} {'F agree':>8} {'M agree':>8} {'Segment':>9} {'RankErr':>8} {'Bound':>7} {'Mem(KB)':>8}")
+
+    rfm = compute_rfm(load_sales(args.source))
+    datasets = [(f"{len(rfm):,}", rfm)]
+    datasets += [(f"{n:,}", compute_rfm(synthetic_transactions(n, args.transactions_per_customer)))
+                 for n in args.customers]
+    for label, rfm in datasets:
+        for k in args.k:
+            compare(label, rfm, k, args.partitions)
+
+    print("\nRankErr is the worst observed rank error of the R and M quintile boundaries;")
+    print("Bound is the published 99% KLL bound for that k.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Reporting Pipeline Runner
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Runs the analysis scripts in one process on a single load of the data
+
+Usage:
+    python run_pipeline.py
+    python run_pipeline.py --stages kpi rfm
+    python run_pipeline.py --source sales_data.parquet --no-cache
+
+Same as `python -m sales_pipeline run` (see sales_pipeline/cli.py).
+"""
+
+import argparse
+
+from sales_pipeline.cli import STAGES, print_summary, run_stages
+from sales_pipeline.context import CACHE_FILE
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the reporting stages on one load of the sales data.')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+                        help='stages to run, in order (default: all)')
+    parser.add_argument('--source',
+                        help='sales_data.parquet directory or CSV file (default: Parquet if present, else CSV)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'aggregate the raw rows, ignoring the aggregate cache ({CACHE_FILE}) and the cube')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    ctx, timings = run_stages(args.stages, args.source, use_cache=not args.no_cache)
+    print_summary(ctx, timings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""
+Shared building blocks for the sales analysis scripts
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+
+The numbered scripts (01_generate_dataset.py ... 07_cohort_analysis.py)
+stay the entry points; the modules in this package hold the pieces they share.
+Submodules are imported explicitly so that a script only pays for what it uses.
+"""
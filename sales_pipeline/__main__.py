@@ -0,0 +1,3 @@
+from sales_pipeline.cli import main
+
+main()
@@ -0,0 +1,232 @@
+"""
+Product Affinity Analysis
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Which products are bought by the same customers: co-occurrence,
+             support, confidence, lift and "also bought" lists from a sparse
+             customer × product matrix
+
+Usage:
+    python -m sales_pipeline.affinity                          # top pairs by lift
+    python -m sales_pipeline.affinity --product "iPad Air"     # also bought with one product
+    python -m sales_pipeline.affinity --min-customers 50 --top 10 --output product_affinity.csv
+
+The sales data is streamed once into a binary customer × product matrix
+(scipy.sparse CSR): row c has a 1 in column p if customer c ever bought
+product p. Only the distinct (customer, product) pairs are held, never the
+transactions. The product × product co-occurrence matrix is then one sparse
+product, C = Xᵀ X: C[i, j] is the number of customers who bought both i and
+j, and the diagonal C[i, i] the number who bought i at all. With N customers:
+
+    support(i → j)     C[i, j] / N
+    confidence(i → j)  C[i, j] / C[i, i]      share of i's buyers who also bought j
+    lift(i → j)        C[i, j] * N / (C[i, i] * C[j, j])
+
+Lift above 1 means the pair is bought together more often than if the two
+products were independent. Pairs with fewer than --min-customers shared
+customers are left out; small counts make lift noisy.
+
+The cost of Xᵀ X grows with the sum over customers of (products per
+customer)², not with customers × products, so it scales to millions of
+customers. C has at most products² entries (25 million for 5,000 SKUs).
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+
+from sales_pipeline.storage import default_source, iter_batches
+
+MIN_PAIR_CUSTOMERS = 5
+TOP_K = 5
+
+
+# ==========================================
+# CUSTOMER × PRODUCT MATRIX
+# ==========================================
+
+def distinct(values):
+    """
+    Sorted distinct values (sort and compare neighbours; faster here than
+    np.unique on large int64 arrays)
+    """
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+class CustomerProductMatrix:
+    """
+    Distinct (customer, product) pairs collected batch by batch, turned into
+    a binary CSR matrix by matrix()
+    """
+
+    def __init__(self):
+        self.products = []
+        self._codes = {}
+        self._pairs = []
+
+    def product_codes(self, column):
+        """
+        Global product codes for a product column (dictionary-encoded or plain strings)
+        """
+        if not pa.types.is_dictionary(column.type):
+            column = column.dictionary_encode()
+        names = column.dictionary.to_pylist()
+        for name in names:
+            if name not in self._codes:
+                self._codes[name] = len(self.products)
+                self.products.append(name)
+        mapping = np.array([self._codes[name] for name in names], dtype=np.int64)
+        return mapping[column.indices.to_numpy(zero_copy_only=False)]
+
+    def update(self, batch):
+        """
+        Add a record batch with customer_id and product columns
+        """
+        # Rows without a customer or a product belong to no pair
+        valid = pc.and_(pc.is_valid(batch.column('customer_id')), pc.is_valid(batch.column('product')))
+        if not pc.all(valid).as_py():
+            batch = batch.filter(valid)
+        customers = batch.column('customer_id').to_numpy(zero_copy_only=False).astype(np.int64)
+        products = self.product_codes(batch.column('product'))
+        # Customer and product code packed in one int64, deduplicated per batch
+        self._pairs.append(distinct(customers << 32 | products))
+        if len(self._pairs) > 64:
+            self._pairs = [distinct(np.concatenate(self._pairs))]
+        return self
+
+    def matrix(self):
+        """
+        (CSR matrix of customers × products, customer keys of the rows)
+        """
+        pairs = distinct(np.concatenate(self._pairs)) if self._pairs else np.zeros(0, dtype=np.int64)
+        # Pairs are sorted by customer, so each new customer starts a new row
+        customer = pairs >> 32
+        starts = np.r_[True, customer[1:] != customer[:-1]] if len(pairs) else np.zeros(0, dtype=bool)
+        customer_keys, rows = customer[starts], np.cumsum(starts) - 1
+        columns = pairs & 0xFFFFFFFF
+        matrix = sp.csr_matrix((np.ones(len(pairs), dtype=np.int32), (rows, columns)),
+                               shape=(len(customer_keys), len(self.products)))
+        return matrix, customer_keys
+
+
+def customer_product_matrix(source=None, batch_size=1_000_000):
+    """
+    Binary customer × product CSR matrix from one pass over the source;
+    returns (matrix, customer keys, product names)
+    """
+    builder = CustomerProductMatrix()
+    for batch, _ in iter_batches(source, ['customer_id', 'product'], batch_size):
+        builder.update(batch)
+    matrix, customer_keys = builder.matrix()
+    return matrix, customer_keys, builder.products
+
+
+# ==========================================
+# AFFINITY
+# ==========================================
+
+def co_occurrence(matrix):
+    """
+    Products × products CSR matrix of customers who bought both
+    """
+    return (matrix.T @ matrix).tocsr()
+
+
+def product_pairs(matrix, products, min_customers=MIN_PAIR_CUSTOMERS):
+    """
+    One row per ordered pair (product → also_bought) with at least
+    min_customers shared customers: customers, support, confidence, lift
+    """
+    n_customers = matrix.shape[0]
+    cooccurrence = co_occurrence(matrix).tocoo()
+    buyers = cooccurrence.diagonal() if cooccurrence.shape[0] else np.zeros(0)
+    keep = (cooccurrence.row != cooccurrence.col) & (cooccurrence.data >= min_customers)
+    first, second = cooccurrence.row[keep], cooccurrence.col[keep]
+    both = cooccurrence.data[keep].astype(np.int64)
+
+    names = np.asarray(products, dtype=object)
+    pairs = pd.DataFrame({
+        'product': names[first],
+        'also_bought': names[second],
+        'customers': both,
+        'support': both / n_customers,
+        'confidence': both / buyers[first],
+        'lift': both * n_customers / (buyers[first].astype(np.float64) * buyers[second])
+    })
+    return pairs.sort_values(['lift', 'customers'], ascending=False, ignore_index=True)
+
+
+def also_bought(pairs, k=TOP_K, by='confidence'):
+    """
+    The k strongest pairs per product (by confidence unless told otherwise),
+    ranked without a per-product loop
+    """
+    ranked = pairs.sort_values(['product', by, 'lift'], ascending=[True, False, False], ignore_index=True)
+    rank = ranked.groupby('product', sort=False).cumcount()
+    ranked.insert(1, 'rank', rank + 1)
+    return ranked[rank < k].reset_index(drop=True)
+
+
+def product_affinity(source=None, min_customers=MIN_PAIR_CUSTOMERS, k=TOP_K):
+    """
+    (pairs, also-bought lists, matrix, customer keys) for the source
+    """
+    matrix, customer_keys, products = customer_product_matrix(source)
+    pairs = product_pairs(matrix, products, min_customers)
+    return pairs, also_bought(pairs, k), matrix, customer_keys
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Find the products bought by the same customers.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--min-customers', type=int, default=MIN_PAIR_CUSTOMERS,
+                        help=f'minimum customers who bought both products (default: {MIN_PAIR_CUSTOMERS})')
+    parser.add_argument('--top', type=int, default=TOP_K,
+                        help=f'also-bought products per product (default: {TOP_K})')
+    parser.add_argument('--product', help='show the also-bought list of one product')
+    parser.add_argument('--output', metavar='PATH', help='write the also-bought lists as CSV')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    source = args.source or default_source()
+
+    print("=" * 70)
+    print("PRODUCT AFFINITY ANALYSIS")
+    print("=" * 70)
+
+    pairs, lists, matrix, _ = product_affinity(source, args.min_customers, args.top)
+    density = matrix.nnz / max(matrix.shape[0] * matrix.shape[1], 1)
+    print(f"\n🧺 {matrix.shape[0]:,} customers × {matrix.shape[1]:,} products "
+          f"({matrix.nnz:,} customer-product pairs, {density:.2%} dense)")
+    print(f"   {len(pairs):,} product pairs bought by at least {args.min_customers} of the same customers")
+
+    pd.set_option('display.width', 120)
+    if args.product:
+        selected = lists[lists['product'] == args.product]
+        if selected.empty:
+            print(f"\n⚠️  No pairs for {args.product!r}")
+        else:
+            print(f"\nCustomers who bought {args.product} also bought:")
+            print(selected.drop(columns='product').round(3).to_string(index=False))
+    else:
+        print("\nStrongest pairs by lift:")
+        print(pairs.head(args.top * 2).round(3).to_string(index=False))
+
+    if args.output:
+        lists.to_csv(args.output, index=False)
+        print(f"\n💾 Also-bought lists saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
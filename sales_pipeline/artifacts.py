@@ -0,0 +1,214 @@
+"""
+Artifact Cache
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Skips re-rendering charts and HTML reports whose inputs have not
+             changed, and keeps a manifest of hits, misses and render times
+
+Every artifact (a PNG or HTML file) is keyed on a content hash of:
+    - the aggregates it is drawn from (values, index, column names, dtypes)
+    - its rendering parameters (chart name, style, dpi, ...)
+    - the source of the function that draws it, of the module-level helpers
+      it calls, and the module-level constants they read (palettes, sizes, ...)
+    - the plotting library versions
+
+If the key matches the one recorded in the manifest and the file on disk is
+the one that was written (same size and modification time), the artifact is
+a hit and is left alone. Otherwise it is rendered and recorded as a miss.
+
+The manifest lives in .pipeline_cache/artifacts.json. Set ARTIFACT_CACHE=0
+to render everything regardless (misses are still recorded).
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = os.path.join('.pipeline_cache', 'artifacts.json')
+CACHE_ENV = 'ARTIFACT_CACHE'
+
+# Run summaries kept in the manifest
+MAX_RUNS = 50
+
+
+# ==========================================
+# KEYS
+# ==========================================
+
+def _feed(h, value):
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        h.update(type(value).__name__.encode())
+        h.update(repr(value.shape).encode())
+        if isinstance(value, pd.DataFrame):
+            h.update(repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()]).encode())
+        else:
+            h.update(repr((value.name, str(value.dtype))).encode())
+        if not isinstance(value, pd.Index):
+            h.update(repr((value.index.names, str(value.index.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(repr(key).encode())
+            _feed(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(f'{type(value).__name__}[{len(value)}]'.encode())
+        for item in value:
+            _feed(h, item)
+    else:
+        h.update(repr(value).encode())
+
+
+def _names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _names(const)
+    return names
+
+
+def _dependencies(function, seen=None):
+    """
+    {name: source or value} of the module-level functions and constants
+    function reads, followed through the functions of its own module
+    """
+    seen = {} if seen is None else seen
+    for name in sorted(_names(function.__code__)):
+        if name in seen or name not in function.__globals__:
+            continue
+        value = function.__globals__[name]
+        if inspect.isfunction(value):
+            if value.__module__ == function.__module__:
+                seen[name] = inspect.getsource(value)
+                _dependencies(value, seen)
+        elif not (inspect.ismodule(value) or inspect.isclass(value) or callable(value)):
+            seen[name] = value
+    return seen
+
+
+def artifact_key(function, params, inputs):
+    """
+    Content hash for an artifact drawn by function from inputs with params
+    """
+    h = hashlib.sha256()
+    h.update(inspect.getsource(function).encode())
+    _feed(h, _dependencies(function))
+    _feed(h, params)
+    _feed(h, inputs)
+    return h.hexdigest()
+
+
+# ==========================================
+# MANIFEST
+# ==========================================
+
+class ArtifactCache:
+    """
+    The manifest of rendered artifacts; call save() once the run is done
+    """
+
+    def __init__(self, manifest=MANIFEST_FILE, enabled=None):
+        self.path = manifest
+        self.enabled = os.environ.get(CACHE_ENV, '1') != '0' if enabled is None else enabled
+        self.artifacts = self._load().get('artifacts', {})
+        self.updated = {}
+        self.hits = []
+        self.misses = []
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def fresh(self, path, key):
+        """
+        True when path holds the artifact rendered for key
+        """
+        entry = self.artifacts.get(path)
+        if not self.enabled or entry is None or entry['key'] != key:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return stat.st_size == entry['bytes'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def hit(self, path):
+        entry = dict(self.artifacts[path])
+        entry['hits'] = entry.get('hits', 0) + 1
+        entry['last_run'] = 'hit'
+        self.artifacts[path] = self.updated[path] = entry
+        self.hits.append(path)
+
+    def record(self, path, key, seconds):
+        """
+        Record a freshly rendered artifact
+        """
+        stat = os.stat(path)
+        previous = self.artifacts.get(path, {})
+        entry = {
+            'key': key,
+            'bytes': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'render_seconds': round(seconds, 4),
+            'rendered_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'hits': previous.get('hits', 0),
+            'misses': previous.get('misses', 0) + 1,
+            'last_run': 'miss'
+        }
+        self.artifacts[path] = self.updated[path] = entry
+        self.misses.append(path)
+
+    def save(self, run_name):
+        """
+        Merge this run's entries into the manifest on disk and log a run summary
+        """
+        manifest = self._load()
+        manifest.setdefault('artifacts', {}).update(self.updated)
+        manifest.setdefault('runs', []).append({
+            'run': run_name,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'hits': len(self.hits),
+            'misses': len(self.misses),
+            'render_seconds': round(sum(self.artifacts[path]['render_seconds'] for path in self.misses), 4),
+            'saved_seconds': round(sum(self.artifacts[path]['render_seconds'] for path in self.hits), 4)
+        })
+        manifest['runs'] = manifest['runs'][-MAX_RUNS:]
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def render_cached(jobs, render, cache, run_name):
+    """
+    Render the jobs whose artifacts are stale and skip the rest.
+
+    Each job is a dict with at least 'path' and 'key'; render takes the list
+    of stale jobs and returns [(path, seconds)]. Returns [(path, seconds,
+    cached)] in job order, with seconds of 0 for cached artifacts.
+    """
+    stale = [job for job in jobs if not cache.fresh(job['path'], job['key'])]
+    rendered = dict(render(stale)) if stale else {}
+
+    results = []
+    for job in jobs:
+        if job['path'] in rendered:
+            cache.record(job['path'], job['key'], rendered[job['path']])
+            results.append((job['path'], rendered[job['path']], False))
+        else:
+            cache.hit(job['path'])
+            results.append((job['path'], 0.0, True))
+    cache.save(run_name)
+    return results
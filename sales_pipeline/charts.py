@@ -0,0 +1,498 @@
+"""
+Static Chart Rendering
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: The static PNG charts of 03_visualizations.py,
+             05_rfm_analysis.py and 07_cohort_analysis.py as independent
+             render jobs, run in a pool of worker processes
+
+Each job is a dict naming the chart, the output file, the style to render
+with and the small pre-aggregated inputs the chart needs (a few Series or a
+compact frame), so shipping it to a worker costs next to nothing. Jobs
+render with the Agg backend inside their own rc context, which is what makes
+the images identical whether they are drawn in a worker or in-process.
+
+Rasterizing at dpi=300 dominates the time of each chart, so charts render
+in parallel, one per worker. Set CHART_WORKERS=1 to render sequentially in
+the calling process.
+
+Charts whose inputs and rendering parameters are unchanged since they were
+last drawn are not rendered again (see sales_pipeline.artifacts).
+matplotlib and seaborn are imported only once a chart is actually drawn, so
+a run where every chart is cached never loads them.
+
+The RFM scatter draws one marker per customer up to SCATTER_POINT_LIMIT
+customers. Beyond that it switches to a density image: customers are binned
+into a fixed pixel grid in the calling process, and the job only draws the
+resulting image. Its cost then depends on the grid size, not the customer
+count. RFM_SCATTER=points or RFM_SCATTER=density forces either path.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.artifacts import ArtifactCache, artifact_key, render_cached
+from sales_pipeline.instrument import stage
+
+DPI = 300
+WORKERS_ENV = 'CHART_WORKERS'
+
+SCATTER_ENV = 'RFM_SCATTER'
+SCATTER_POINT_LIMIT = 100_000
+# (rows, columns) of the density image, about a quarter of the plot area at 300 dpi
+DENSITY_BINS = (560, 880)
+
+# Cohorts up to which every heatmap cell is labelled with its percentage
+COHORT_LABEL_LIMIT = 24
+
+# The style 03_visualizations.py renders with; the RFM charts use the defaults
+STATIC_STYLE = {'style': 'seaborn-v0_8-whitegrid', 'palette': 'husl'}
+
+SEGMENT_COLORS = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#6A994E', '#A7C957', '#81B29A', '#F2CC8F']
+CATEGORY_COLORS = ['#F18F01', '#C73E1D', '#6A994E', '#A7C957', '#2E86AB']
+
+
+# ==========================================
+# SALES CHARTS (03_visualizations.py)
+# ==========================================
+
+def revenue_over_time(plt, path, monthly_revenue):
+    """
+    monthly_revenue: frame with year_month_str and revenue, one row per month
+    """
+    plt.figure(figsize=(16, 7))
+    plt.plot(monthly_revenue['year_month_str'],
+             monthly_revenue['revenue'],
+             marker='o',
+             linewidth=3,
+             markersize=12,
+             color='#2E86AB',
+             label='Monthly Revenue')
+
+    plt.fill_between(range(len(monthly_revenue)),
+                     monthly_revenue['revenue'],
+                     alpha=0.2,
+                     color='#2E86AB')
+
+    plt.title('Monthly Revenue Trend - 2024',
+              fontsize=18,
+              fontweight='bold',
+              pad=20)
+    plt.xlabel('Month', fontsize=14, fontweight='bold')
+    plt.ylabel('Revenue ($)', fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(True, alpha=0.3)
+    plt.legend(fontsize=12)
+
+    for i, row in monthly_revenue.iterrows():
+        plt.text(i, row['revenue'],
+                 f"${row['revenue']/1000:.0f}K",
+                 ha='center',
+                 va='bottom',
+                 fontsize=10,
+                 fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def top_products(plt, path, top_10_products, total_revenue):
+    plt.figure(figsize=(14, 9))
+
+    colors = plt.cm.viridis(np.linspace(0.2, 0.9, len(top_10_products)))
+
+    bars = plt.barh(range(len(top_10_products)),
+                    top_10_products.values,
+                    color=colors,
+                    edgecolor='black',
+                    linewidth=1.5)
+
+    plt.yticks(range(len(top_10_products)), top_10_products.index, fontsize=12)
+    plt.xlabel('Revenue ($)', fontsize=14, fontweight='bold')
+    plt.title('Top 10 Products by Revenue',
+              fontsize=18,
+              fontweight='bold',
+              pad=20)
+    plt.grid(axis='x', alpha=0.3)
+
+    for i, (product, revenue) in enumerate(top_10_products.items()):
+        pct = (revenue / total_revenue) * 100
+        plt.text(revenue, i,
+                 f' ${revenue/1000:.0f}K ({pct:.1f}%)',
+                 va='center',
+                 fontsize=11,
+                 fontweight='bold')
+
+    # Highlight top 3
+    for i in range(3):
+        bars[i].set_color('#FF6B6B')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def revenue_by_category(plt, path, category_revenue, total_revenue):
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 7))
+
+    # Bar chart
+    ax1.bar(range(len(category_revenue)),
+            category_revenue.values,
+            color=CATEGORY_COLORS,
+            edgecolor='black',
+            linewidth=1.5)
+
+    ax1.set_xticks(range(len(category_revenue)))
+    ax1.set_xticklabels(category_revenue.index, rotation=45, ha='right', fontsize=12)
+    ax1.set_ylabel('Revenue ($)', fontsize=13, fontweight='bold')
+    ax1.set_title('Revenue by Product Category', fontsize=15, fontweight='bold')
+    ax1.grid(axis='y', alpha=0.3)
+
+    for i, (category, revenue) in enumerate(category_revenue.items()):
+        pct = (revenue / total_revenue) * 100
+        ax1.text(i, revenue,
+                 f'${revenue/1000:.0f}K\n({pct:.1f}%)',
+                 ha='center',
+                 va='bottom',
+                 fontsize=11,
+                 fontweight='bold')
+
+    # Pie chart
+    ax2.pie(category_revenue.values,
+            labels=category_revenue.index,
+            autopct='%1.1f%%',
+            startangle=90,
+            colors=CATEGORY_COLORS,
+            textprops={'fontsize': 12, 'fontweight': 'bold'},
+            wedgeprops={'edgecolor': 'black', 'linewidth': 1.5})
+
+    ax2.set_title('Revenue Distribution by Category', fontsize=15, fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def top_customers(plt, path, top_20_customers, total_revenue):
+    plt.figure(figsize=(16, 8))
+
+    bars = plt.bar(range(len(top_20_customers)),
+                   top_20_customers.values,
+                   color='#2D6A4F',
+                   alpha=0.8,
+                   edgecolor='black',
+                   linewidth=1.2)
+
+    for i in range(3):
+        bars[i].set_color('#FF6B6B')
+
+    plt.xlabel('Customer Rank', fontsize=14, fontweight='bold')
+    plt.ylabel('Total Revenue ($)', fontsize=14, fontweight='bold')
+    plt.title('Top 20 Customers by Revenue',
+              fontsize=18,
+              fontweight='bold',
+              pad=20)
+    plt.xticks(range(len(top_20_customers)), range(1, 21))
+    plt.grid(axis='y', alpha=0.3)
+
+    top_20_pct = (top_20_customers.sum() / total_revenue) * 100
+    plt.text(0.5, 0.95,
+             f'Top 20 customers = {top_20_pct:.1f}% of total revenue',
+             transform=plt.gca().transAxes,
+             fontsize=13,
+             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.7),
+             verticalalignment='top',
+             fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+# ==========================================
+# RFM CHARTS (05_rfm_analysis.py)
+# ==========================================
+
+def rfm_customer_distribution(plt, path, segment_counts, n_customers):
+    plt.figure(figsize=(14, 7))
+
+    plt.barh(range(len(segment_counts)),
+             segment_counts.values,
+             color=SEGMENT_COLORS[:len(segment_counts)],
+             edgecolor='black',
+             linewidth=1.2)
+
+    plt.yticks(range(len(segment_counts)), segment_counts.index, fontsize=12)
+    plt.xlabel('Number of Customers', fontsize=13, fontweight='bold')
+    plt.title('Customer Distribution by RFM Segment', fontsize=16, fontweight='bold', pad=20)
+    plt.grid(axis='x', alpha=0.3)
+
+    for i, (segment, count) in enumerate(segment_counts.items()):
+        pct = (count / n_customers) * 100
+        plt.text(count, i, f' {count} ({pct:.1f}%)',
+                 va='center', fontsize=11, fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def rfm_revenue_by_segment(plt, path, segment_revenue):
+    """
+    segment_revenue: frame indexed by segment with Total Revenue and Revenue %
+    """
+    plt.figure(figsize=(14, 7))
+
+    plt.barh(range(len(segment_revenue)),
+             segment_revenue['Total Revenue'],
+             color=SEGMENT_COLORS[:len(segment_revenue)],
+             edgecolor='black',
+             linewidth=1.2)
+
+    plt.yticks(range(len(segment_revenue)), segment_revenue.index, fontsize=12)
+    plt.xlabel('Total Revenue ($)', fontsize=13, fontweight='bold')
+    plt.title('Revenue Contribution by Customer Segment', fontsize=16, fontweight='bold', pad=20)
+    plt.grid(axis='x', alpha=0.3)
+
+    for i, (segment, row) in enumerate(segment_revenue.iterrows()):
+        plt.text(row['Total Revenue'], i,
+                 f" ${row['Total Revenue']/1000:.0f}K ({row['Revenue %']:.1f}%)",
+                 va='center', fontsize=11, fontweight='bold')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def rfm_scatter(plt, path, points):
+    """
+    points: frame with frequency, monetary and segment, one row per customer
+    """
+    plt.figure(figsize=(14, 9))
+
+    segments_unique = points['segment'].unique()
+    colors_scatter = plt.cm.tab10(np.linspace(0, 1, len(segments_unique)))
+
+    for i, segment in enumerate(segments_unique):
+        segment_data = points[points['segment'] == segment]
+        plt.scatter(segment_data['frequency'],
+                    segment_data['monetary'],
+                    s=120,
+                    alpha=0.6,
+                    c=[colors_scatter[i]],
+                    label=segment,
+                    edgecolors='black',
+                    linewidths=0.5)
+
+    plt.xlabel('Frequency (Number of Purchases)', fontsize=13, fontweight='bold')
+    plt.ylabel('Monetary (Total Revenue $)', fontsize=13, fontweight='bold')
+    plt.title('RFM Segmentation: Frequency vs Monetary Value', fontsize=16, fontweight='bold', pad=20)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
+    plt.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def rfm_density(plt, path, image, extent, segments, colors, n_customers):
+    """
+    Pre-binned version of rfm_scatter for large customer tables: image is
+    an RGBA pixel grid from density_image
+    """
+    from matplotlib.patches import Patch
+
+    plt.figure(figsize=(14, 9))
+    plt.imshow(image, extent=extent, origin='lower', aspect='auto', interpolation='nearest')
+
+    handles = [Patch(facecolor=color, edgecolor='black', linewidth=0.5, label=segment)
+               for segment, color in zip(segments, colors)]
+    plt.xlabel('Frequency (Number of Purchases)', fontsize=13, fontweight='bold')
+    plt.ylabel('Monetary (Total Revenue $)', fontsize=13, fontweight='bold')
+    plt.title(f'RFM Segmentation: Frequency vs Monetary Value (density of {n_customers:,} customers)',
+              fontsize=16, fontweight='bold', pad=20)
+    plt.legend(handles=handles, bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
+    plt.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+def density_image(points, bins=DENSITY_BINS):
+    """
+    Bin customers into a rows x columns grid and shade each pixel: the color
+    of the segment with most customers in it, opacity rising with the log
+    of the count. Returns the rfm_density inputs.
+    """
+    import matplotlib
+
+    rows, columns = bins
+    codes, segments = pd.factorize(points['segment'])
+    # The same colors rfm_scatter gives each segment (order of first appearance)
+    colors = matplotlib.colormaps['tab10'](np.linspace(0, 1, len(segments)))
+
+    def pixel(values, n):
+        low, high = float(values.min()), float(values.max())
+        if np.all(values == np.round(values)) and high - low < n:
+            # Integer axis (frequency): one band per value, centered on it
+            low, high = low - 0.5, high + 0.5
+            n = int(high - low)
+        elif high == low:
+            low, high = low - 0.5, high + 0.5
+        index = ((values - low) / (high - low) * n).astype(np.int64)
+        return np.clip(index, 0, n - 1), n, (low, high)
+
+    x, columns, (x_low, x_high) = pixel(points['frequency'].to_numpy(dtype=np.float64), columns)
+    y, rows, (y_low, y_high) = pixel(points['monetary'].to_numpy(dtype=np.float64), rows)
+    counts = np.bincount((codes * rows + y) * columns + x, minlength=len(segments) * rows * columns) \
+        .reshape(len(segments), rows, columns)
+
+    total = counts.sum(axis=0)
+    image = colors[counts.argmax(axis=0)]
+    image[..., 3] = np.where(total > 0, 0.35 + 0.65 * np.log1p(total) / np.log1p(total.max()), 0)
+    return {
+        'image': (image * 255).round().astype(np.uint8),
+        'extent': (x_low, x_high, y_low, y_high),
+        'segments': list(segments),
+        'colors': [tuple(color) for color in colors],
+        'n_customers': len(points)
+    }
+
+
+def rfm_scatter_job(path, points):
+    """
+    rfm_scatter for up to SCATTER_POINT_LIMIT customers, rfm_density above
+    (or as RFM_SCATTER says)
+    """
+    mode = os.environ.get(SCATTER_ENV, 'auto')
+    if mode not in ('auto', 'points', 'density'):
+        raise ValueError(f"{SCATTER_ENV} must be 'auto', 'points' or 'density', not {mode!r}")
+    if mode == 'density' or (mode == 'auto' and len(points) > SCATTER_POINT_LIMIT):
+        return chart_job('rfm_density', path, **density_image(points))
+    return chart_job('rfm_scatter', path, points=points)
+
+
+# ==========================================
+# COHORT CHARTS (07_cohort_analysis.py)
+# ==========================================
+
+def cohort_retention(plt, path, retention, cohort_sizes):
+    """
+    retention: frame of % retained, one row per cohort month and one column
+    per month since acquisition (NaN where not observed yet)
+    """
+    values = retention.to_numpy(dtype=np.float64)
+    later = values[:, 1:]
+    # Month 0 is 100% by definition; the color scale follows the later months
+    vmax = np.nanmax(later) if later.size and not np.isnan(later).all() else 100
+
+    plt.figure(figsize=(14, max(6, 0.4 * len(retention) + 2)))
+    image = plt.imshow(np.ma.masked_invalid(values), cmap='YlGnBu', vmin=0, vmax=vmax,
+                       aspect='auto', interpolation='nearest')
+    plt.colorbar(image, label='Customers Retained (%)')
+
+    labels = [f'{cohort}  (n={size:,})' for cohort, size in zip(retention.index.astype(str), cohort_sizes)]
+    plt.yticks(range(len(retention)), labels, fontsize=10)
+    plt.xticks(range(retention.shape[1]), retention.columns, fontsize=10)
+    plt.xlabel('Months Since First Purchase', fontsize=13, fontweight='bold')
+    plt.ylabel('Cohort (First Purchase Month)', fontsize=13, fontweight='bold')
+    plt.title('Customer Retention by Monthly Cohort', fontsize=16, fontweight='bold', pad=20)
+
+    if len(retention) <= COHORT_LABEL_LIMIT:
+        for row, column in zip(*np.nonzero(~np.isnan(values))):
+            value = values[row, column]
+            plt.text(column, row, f'{value:.0f}%', ha='center', va='center', fontsize=8,
+                     color='white' if value > 0.6 * vmax else 'black')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
+
+
+CHARTS = {
+    'revenue_over_time': revenue_over_time,
+    'top_products': top_products,
+    'revenue_by_category': revenue_by_category,
+    'top_customers': top_customers,
+    'rfm_customer_distribution': rfm_customer_distribution,
+    'rfm_revenue_by_segment': rfm_revenue_by_segment,
+    'rfm_scatter': rfm_scatter,
+    'rfm_density': rfm_density,
+    'cohort_retention': cohort_retention
+}
+
+
+# ==========================================
+# RUNNING JOBS
+# ==========================================
+
+def chart_job(chart, path, style=None, **data):
+    params = {'chart': chart, 'style': style, 'dpi': DPI,
+              'matplotlib': version('matplotlib'), 'seaborn': version('seaborn')}
+    return {'chart': chart, 'path': path, 'style': style, 'data': data,
+            'key': artifact_key(CHARTS[chart], params, data)}
+
+
+def render_job(job):
+    """
+    Render one job from a clean rc state; returns (path, seconds)
+    """
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rows = sum(len(value) for value in job['data'].values() if isinstance(value, (pd.Series, pd.DataFrame)))
+    with stage(f"chart.{job['chart']}", rows=rows, path=job['path']), matplotlib.rc_context():
+        matplotlib.rc_file_defaults()
+        if job['style']:
+            import seaborn as sns
+            plt.style.use(job['style']['style'])
+            sns.set_palette(job['style']['palette'])
+        CHARTS[job['chart']](plt, job['path'], **job['data'])
+    return job['path'], time.perf_counter() - start
+
+
+def chart_workers(n_jobs):
+    """
+    Worker processes to use: CHART_WORKERS if set, else one per job up to
+    the CPU count
+    """
+    if os.environ.get(WORKERS_ENV):
+        return max(1, int(os.environ[WORKERS_ENV]))
+    return max(1, min(n_jobs, os.cpu_count() or 1))
+
+
+def render_jobs(jobs, workers=None):
+    """
+    Render every job; returns [(path, seconds)] in job order.
+
+    Workers are forked so they start with the caller's modules already
+    imported; where fork is unavailable the jobs run in-process.
+    """
+    workers = workers or chart_workers(len(jobs))
+    if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [render_job(job) for job in jobs]
+    # Import the plotting stack once, before forking, instead of in every worker
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(render_job, jobs))
+
+
+def render_charts(jobs, workers=None, cache=None, run_name='charts'):
+    """
+    Render the jobs whose charts are out of date; returns [(path, seconds,
+    cached)] in job order
+    """
+    cache = cache or ArtifactCache()
+    return render_cached(jobs, lambda stale: render_jobs(stale, workers), cache, run_name)
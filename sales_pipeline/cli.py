@@ -0,0 +1,212 @@
+"""
+Sales Pipeline Command Line
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: One entry point for the analysis stages, loading only what the
+             stage being run needs
+
+Usage:
+    python -m sales_pipeline kpi                          # one stage
+    python -m sales_pipeline rfm --source sales_data.parquet
+    python -m sales_pipeline run                          # every stage on one load of the data
+    python -m sales_pipeline run --stages kpi rfm --no-cache
+    python -m sales_pipeline startup                      # check the import-time budgets
+    python -m sales_pipeline run --trace trace.jsonl      # JSON-lines timing per stage
+
+The stages are the numbered scripts (02_data_analysis.py ...
+07_cohort_analysis.py), run in this process with runpy. Nothing heavy is
+imported up front: pandas comes in with the stage, and matplotlib, seaborn
+and plotly only when a chart or report is actually rendered. The data-only
+stages (eda, kpi) never load them.
+
+`startup` runs `--help` and the data-only stages under `python -X importtime`
+(best of three) and fails if their imports take longer than the budgets in
+STARTUP_BUDGETS, or if they pull in a plotting library.
+
+--trace and --profile set PIPELINE_TRACE and PIPELINE_PROFILE for the run
+(see sales_pipeline/instrument.py).
+"""
+
+import argparse
+import os
+import runpy
+import subprocess
+import sys
+import time
+
+from sales_pipeline.instrument import PROFILE_ENV, PROFILERS, TRACE_ENV, stage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    'eda': '02_data_analysis.py',
+    'charts': '03_visualizations.py',
+    'kpi': '04_kpi_calculations.py',
+    'rfm': '05_rfm_analysis.py',
+    'interactive': '06_interactive_charts.py',
+    'cohorts': '07_cohort_analysis.py'
+}
+
+# Libraries the budgeted commands must not import
+PLOTTING_MODULES = ('matplotlib', 'seaborn', 'plotly')
+
+# Import time budgets in ms per command (python -X importtime, best of STARTUP_RUNS).
+# pandas and pyarrow alone take about 0.6 s.
+STARTUP_BUDGETS = {
+    '--help': 100,
+    'eda': 1000,
+    'kpi': 1000
+}
+STARTUP_RUNS = 3
+
+
+# ==========================================
+# STAGES
+# ==========================================
+
+def reset_plot_state():
+    """
+    Undo style changes a previous stage made (e.g. plt.style.use / sns.set_palette),
+    so each script renders exactly as it does when run on its own
+    """
+    if 'matplotlib' in sys.modules:
+        import matplotlib
+        import matplotlib.pyplot as plt
+        plt.close('all')
+        matplotlib.rc_file_defaults()
+
+
+def run_stages(stages, source=None, use_cache=True):
+    """
+    Run the stages in order on one shared load of the data; returns
+    (context, [(stage, seconds)])
+    """
+    from sales_pipeline.context import AnalysisContext, use_context
+
+    ctx = use_context(AnalysisContext(source, use_cache=use_cache))
+    timings = []
+    for name in stages:
+        reset_plot_state()
+        start = time.perf_counter()
+        with stage(f'pipeline.{name}', script=STAGES[name]):
+            runpy.run_path(os.path.join(ROOT, STAGES[name]), run_name='__main__')
+        timings.append((name, time.perf_counter() - start))
+    return ctx, timings
+
+
+def print_summary(ctx, timings):
+    print("\n" + "=" * 70)
+    print("🚀 PIPELINE SUMMARY")
+    print("=" * 70)
+    print(f"\nSource: {ctx.source}")
+    print(f"Data scans: {ctx.scans}")
+    for name, seconds in timings:
+        print(f"   {name:<12} {STAGES[name]:<28} {seconds:6.2f}s")
+
+
+# ==========================================
+# STARTUP BUDGET
+# ==========================================
+
+def import_times(report):
+    """
+    Total import time in ms and the modules imported, from -X importtime output
+    """
+    total = 0
+    modules = set()
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules.add(name.strip())
+        # Nested imports are indented and already counted in their parent
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1000, modules
+
+
+def measure_startup(command, runs=STARTUP_RUNS):
+    """
+    (best import time in ms, plotting modules imported) for one command
+    """
+    best, plotting = None, set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'sales_pipeline', command],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"'{command}' failed:\n{result.stderr[-2000:]}")
+        ms, modules = import_times(result.stderr)
+        best = ms if best is None else min(best, ms)
+        plotting |= {module for module in modules if module.split('.')[0] in PLOTTING_MODULES}
+    return best, plotting
+
+
+def check_startup(budgets=STARTUP_BUDGETS, runs=STARTUP_RUNS):
+    """
+    Measure each command against its budget; returns True if all pass
+    """
+    print("=" * 70)
+    print("⏱️  STARTUP IMPORT-TIME BUDGETS")
+    print("=" * 70)
+    print(f"\nBest of {runs} runs of python -X importtime -m sales_pipeline <command>\n")
+
+    passed = True
+    for command, budget in budgets.items():
+        ms, plotting = measure_startup(command, runs)
+        ok = ms <= budget and not plotting
+        passed &= ok
+        print(f"   {'✅' if ok else '❌'} {command:<8} {ms:8.1f} ms   (budget {budget:,} ms)")
+        if plotting:
+            print(f"      imports plotting libraries: {', '.join(sorted(plotting))}")
+
+    print(f"\n{'✅ Within budget' if passed else '❌ Over budget'}")
+    return passed
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sales_pipeline',
+                                     description='Run the sales analysis stages.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    data_options = argparse.ArgumentParser(add_help=False)
+    data_options.add_argument('--source',
+                              help='sales_data.parquet directory or CSV file (default: Parquet if present, else CSV)')
+    data_options.add_argument('--no-cache', action='store_true',
+                              help='aggregate the raw rows, ignoring the aggregate cache and the cube')
+    data_options.add_argument('--trace', metavar='PATH',
+                              help='append a JSON line per instrumented stage to PATH')
+    data_options.add_argument('--profile', choices=PROFILERS,
+                              help='profile each stage script (with --trace)')
+
+    for stage, script in STAGES.items():
+        commands.add_parser(stage, parents=[data_options], help=f'run {script}')
+    run = commands.add_parser('run', parents=[data_options], help='run several stages on one load of the data')
+    run.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+                     help='stages to run, in order (default: all)')
+    startup = commands.add_parser('startup', help='check the import-time budgets')
+    startup.add_argument('--runs', type=int, default=STARTUP_RUNS,
+                         help=f'runs per command, the best one counts (default: {STARTUP_RUNS})')
+    args = parser.parse_args(argv)
+    if getattr(args, 'profile', None) and not args.trace:
+        parser.error('--profile needs --trace')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == 'startup':
+        sys.exit(0 if check_startup(runs=args.runs) else 1)
+
+    if args.trace:
+        os.environ[TRACE_ENV] = os.path.abspath(args.trace)
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+    stages = args.stages if args.command == 'run' else [args.command]
+    ctx, timings = run_stages(stages, args.source, use_cache=not args.no_cache)
+    if args.command == 'run':
+        print_summary(ctx, timings)
@@ -0,0 +1,352 @@
+"""
+Cohort Retention
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Customers grouped by the month of their first purchase, with
+             cohort × months-since-acquisition retention and revenue
+             matrices kept up to date as new months land
+
+Usage:
+    python -m sales_pipeline.cohorts                     # merge new days from the main dataset
+    python -m sales_pipeline.cohorts --delta day.csv     # merge a separate batch
+    python -m sales_pipeline.cohorts --rebuild           # rebuild from full history regardless
+
+Months are integer period codes (months since 1970-01, the pandas Period
+ordinal), and each customer's cohort is the code of its first purchase
+month. Month codes are stored relative to the first month in the data, so a
+cohort and its age are plain array indices:
+
+    customers[c, a]   distinct customers of cohort c who bought a months after acquiring
+    revenue[c, a]     their revenue in that month (cents)
+
+Both matrices are filled with one np.bincount over cohort * n + age: the
+customer matrix over the distinct (customer, month) pairs, the revenue
+matrix over the transactions weighted by revenue. There is no loop over
+cohorts or months. customers[c, 0] is the cohort size, so retention is the
+customer matrix divided by its first column.
+
+The state (matrices, first month per integer customer key, and the customers
+already counted in the latest month) is saved with a watermark, the last
+sale_date merged, like the cube. A refresh reads only the rows dated after
+the watermark and adds their counts to the matrices. Like the cube, it first
+checks that the source was only appended to in whole days since the last
+refresh (storage.appended_only), and starts over from the full history when
+it was rewritten.
+"""
+
+import argparse
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.instrument import stage
+from sales_pipeline.schema import CENTS_PER_DOLLAR
+from sales_pipeline.storage import (appended_only, as_date, default_source, fingerprint_digest, load_sales,
+                                    source_fingerprint)
+
+DEFAULT_STATE = os.path.join('.pipeline_cache', 'cohorts.npz')
+SOURCE_COLUMNS = ['sale_date', 'customer_id', 'revenue']
+
+# Bits for the month index in a packed (customer, month) pair: 5,000 years of months
+MONTH_BITS = 16
+RETENTION_MONTHS = (1, 3, 6, 12)
+
+
+# ==========================================
+# BUILD AND MERGE
+# ==========================================
+
+def empty_state():
+    return {
+        # Cohort (month index) per integer customer key, -1 before the first purchase
+        'first_month': np.zeros(0, dtype=np.int32),
+        'customers': np.zeros((0, 0), dtype=np.int64),
+        'revenue': np.zeros((0, 0), dtype=np.int64),
+        # Sorted keys of the customers already counted in the latest month
+        'open_customers': np.zeros(0, dtype=np.int64),
+        'metadata': {'source': None, 'fingerprint': None, 'manifest': None, 'watermark': None,
+                     'origin': None, 'open_month': None, 'rows': 0}
+    }
+
+
+def month_codes(dates):
+    """
+    Integer month codes (months since 1970-01) of a datetime column
+    """
+    return dates.to_numpy().astype('datetime64[M]').astype(np.int64)
+
+
+def distinct(values):
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def reserve(state, months, keys):
+    """
+    Grow the matrices to months × months and first_month to keys entries
+    """
+    size = len(state['customers'])
+    if months > size:
+        for name in ('customers', 'revenue'):
+            grown = np.zeros((months, months), dtype=np.int64)
+            grown[:size, :size] = state[name]
+            state[name] = grown
+    first_month = state['first_month']
+    if keys > len(first_month):
+        state['first_month'] = np.concatenate([first_month, np.full(keys - len(first_month), -1, dtype=np.int32)])
+
+
+def merge_transactions(state, df):
+    """
+    Add the transactions dated after the watermark to the matrices and
+    advance it; returns rows merged
+    """
+    metadata = state['metadata']
+    if metadata['watermark'] is not None:
+        df = df[df['sale_date'] > pd.Timestamp(metadata['watermark'])]
+    if df.empty:
+        return 0
+
+    # Transactions without a customer ID belong to no cohort
+    customers = df[df['customer_id'].notna()]
+    if len(customers):
+        add_transactions(state, customers)
+    metadata['watermark'] = str(df['sale_date'].max().date())
+    metadata['rows'] += len(df)
+    return len(df)
+
+
+def add_transactions(state, df):
+    """
+    Count transactions of customers with an ID into the matrices
+    """
+    metadata = state['metadata']
+    codes = month_codes(df['sale_date'])
+    if metadata['origin'] is None:
+        metadata['origin'] = int(codes.min())
+    month = codes - metadata['origin']
+    customer = df['customer_id'].to_numpy(np.int64)
+    n = int(month.max()) + 1
+    reserve(state, n, int(customer.max()) + 1)
+    first_month = state['first_month']
+
+    # Distinct (customer, month) pairs, sorted by customer and then month
+    pairs = distinct(customer << MONTH_BITS | month)
+    pair_customer, pair_month = pairs >> MONTH_BITS, pairs & ((1 << MONTH_BITS) - 1)
+
+    # A customer's first pair is its earliest month in the batch; it only
+    # becomes the cohort for customers not seen before
+    starts = np.r_[True, pair_customer[1:] != pair_customer[:-1]]
+    new = starts & (first_month[pair_customer] < 0)
+    first_month[pair_customer[new]] = pair_month[new]
+
+    # Customers who already bought in the latest merged month were counted there
+    active = np.ones(len(pairs), dtype=bool)
+    if metadata['open_month'] is not None:
+        open_customers = state['open_customers']
+        latest = np.flatnonzero(pair_month == metadata['open_month'])
+        position = np.searchsorted(open_customers, pair_customer[latest])
+        position[position == len(open_customers)] = 0
+        if len(open_customers):
+            active[latest[open_customers[position] == pair_customer[latest]]] = False
+
+    cohort = first_month[pair_customer[active]].astype(np.int64)
+    state['customers'] += np.bincount(cohort * n + pair_month[active] - cohort,
+                                      minlength=n * n).reshape(n, n)
+
+    # Float weights are exact for totals below 2**53 cents
+    cohort = first_month[customer].astype(np.int64)
+    revenue = np.bincount(cohort * n + month - cohort, weights=df['revenue'].to_numpy(np.float64),
+                          minlength=n * n)
+    state['revenue'] += revenue.round().astype(np.int64).reshape(n, n)
+
+    latest_customers = pair_customer[pair_month == n - 1]
+    if metadata['open_month'] == n - 1:
+        latest_customers = distinct(np.concatenate([state['open_customers'], latest_customers]))
+    state['open_customers'] = latest_customers
+    metadata['open_month'] = n - 1
+
+
+# ==========================================
+# PERSISTENCE
+# ==========================================
+
+def load_state(path=DEFAULT_STATE):
+    if not os.path.exists(path):
+        return empty_state()
+    with np.load(path) as saved:
+        state = {name: saved[name] for name in ('first_month', 'customers', 'revenue', 'open_customers')}
+        state['metadata'] = json.loads(str(saved['metadata']))
+    return state
+
+
+def save_state(state, path=DEFAULT_STATE):
+    """
+    Write the state to a temporary file and rename it into place
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, first_month=state['first_month'], customers=state['customers'],
+                 revenue=state['revenue'], open_customers=state['open_customers'],
+                 metadata=np.array(json.dumps(state['metadata'])))
+    os.replace(tmp_path, path)
+
+
+def state_is_current(state, source, fingerprint):
+    metadata = state['metadata']
+    return metadata['source'] == source and metadata['fingerprint'] == fingerprint_digest(fingerprint)
+
+
+def refresh_state(state, source, fingerprint, path=DEFAULT_STATE, df=None):
+    """
+    Bring the state up to date with source and persist it; returns (state,
+    rows merged).
+
+    df, when the caller already holds the full frame, is used instead of
+    reading the new rows again. Unless the source was only appended to since
+    the last refresh (a different source, a regenerated file, a changed older
+    partition), the state is rebuilt from the full history.
+    """
+    appended, manifest = appended_only(source, fingerprint, state['metadata'], df)
+    if not appended:
+        state = empty_state()
+    if df is None:
+        watermark = state['metadata']['watermark']
+        start = None if watermark is None else as_date(watermark) + datetime.timedelta(days=1)
+        df = load_sales(source, columns=SOURCE_COLUMNS, start=start)
+    merged = merge_transactions(state, df)
+    state['metadata'].update(source=source, fingerprint=fingerprint_digest(fingerprint), manifest=manifest)
+    save_state(state, path)
+    return state, merged
+
+
+def cohort_state(ctx, path=DEFAULT_STATE):
+    """
+    Cohort state for an AnalysisContext: refreshed from the saved state, or
+    built from the loaded frame when the context does not use the cache
+    """
+    if not ctx.use_cache:
+        state = empty_state()
+        with stage('cohorts.build', rows=len(ctx.df)):
+            merge_transactions(state, ctx.df)
+        return state
+    state = load_state(path)
+    fingerprint = source_fingerprint(ctx.source)
+    if not state_is_current(state, ctx.source, fingerprint):
+        if ctx._df is None:
+            # Only the rows after the watermark are read, unless history was rewritten
+            ctx.scans += 1
+        with stage('cohorts.refresh', source=ctx.source):
+            state, _ = refresh_state(state, ctx.source, fingerprint, path, df=ctx._df)
+    return state
+
+
+# ==========================================
+# REPORTING
+# ==========================================
+
+def cohort_matrices(state):
+    """
+    (customers, revenue) frames with one row per cohort month and one column
+    per month since acquisition, revenue in dollars. Cells past the latest
+    month are NaN, and months without new customers have no row.
+    """
+    n = len(state['customers'])
+    origin = state['metadata']['origin'] or 0
+    index = pd.PeriodIndex.from_ordinals(origin + np.arange(n), freq='M', name='cohort')
+    columns = pd.RangeIndex(n, name='months_since_acquisition')
+    # Cohort c has been observed for n - c months
+    observed = np.add.outer(np.arange(n), np.arange(n)) < n
+
+    customers = pd.DataFrame(np.where(observed, state['customers'], np.nan), index=index, columns=columns)
+    revenue = pd.DataFrame(np.where(observed, state['revenue'] / CENTS_PER_DOLLAR, np.nan),
+                           index=index, columns=columns)
+    acquired = state['customers'][:, 0] > 0 if n else np.zeros(0, dtype=bool)
+    return customers[acquired], revenue[acquired]
+
+
+def retention_rates(customers):
+    """
+    % of each cohort still buying n months after acquisition
+    """
+    return customers.div(customers[0], axis=0) * 100
+
+
+def observed_customers(customers):
+    """
+    Customers acquired by the cohorts observed n months after acquisition
+    """
+    sizes = customers.notna().mul(customers[0], axis=0).sum()
+    return sizes.where(sizes > 0)
+
+
+def average_retention(customers):
+    """
+    Retention curve over all cohorts, weighted by cohort size
+    """
+    return customers.sum() / observed_customers(customers) * 100
+
+
+def revenue_per_customer(customers, revenue):
+    """
+    Revenue per acquired customer n months after acquisition, over all cohorts
+    """
+    return revenue.sum() / observed_customers(customers)
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Refresh the cohort retention matrices.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--delta', help='CSV or Parquet batch of new transactions to merge')
+    parser.add_argument('--state', default=DEFAULT_STATE, help=f'state file (default: {DEFAULT_STATE})')
+    parser.add_argument('--rebuild', action='store_true', help='discard the state and rebuild from full history')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    source = args.source or default_source()
+
+    print("=" * 70)
+    print("COHORT RETENTION REFRESH")
+    print("=" * 70)
+
+    state = empty_state() if args.rebuild else load_state(args.state)
+    print(f"\n👥 State: {len(state['customers']):,} months, "
+          f"watermark {state['metadata']['watermark'] or '(none)'}")
+
+    if args.delta:
+        merged = merge_transactions(state, load_sales(args.delta, columns=SOURCE_COLUMNS))
+        # The main source no longer describes the state; the next refresh re-checks it
+        state['metadata']['fingerprint'] = None
+        save_state(state, args.state)
+    elif state_is_current(state, source, source_fingerprint(source)):
+        print("   ✅ Cohorts are current with the source")
+        merged = None
+    else:
+        state, merged = refresh_state(state, source, source_fingerprint(source), args.state)
+
+    if merged is not None:
+        print(f"   ✅ Merged {merged:,} transactions → {len(state['customers']):,} months, "
+              f"watermark {state['metadata']['watermark'] or '(none)'}")
+        print(f"\n💾 Saved: {args.state}")
+
+    customers, _ = cohort_matrices(state)
+    if customers.empty:
+        return
+    pd.set_option('display.width', 120)
+    print("\nRetention by cohort (% of customers buying n months after acquisition):")
+    months = [0] + [m for m in RETENTION_MONTHS if m < customers.shape[1]]
+    print(retention_rates(customers)[months].round(1).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Shared Analysis Context
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Loads the sales data once and computes the base aggregates that
+             the EDA, KPI, RFM and chart scripts all start from
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.cube import cube_aggregates, cube_is_current, load_cube, refresh_cube
+from sales_pipeline.instrument import stage
+from sales_pipeline.schema import CENTS_PER_DOLLAR, to_dollars
+from sales_pipeline.storage import default_source, load_sales, source_fingerprint
+
+CACHE_DIR = '.pipeline_cache'
+CACHE_FILE = os.path.join(CACHE_DIR, 'base_aggregates.pkl')
+
+# Bump when the set or shape of base aggregates changes so stale caches are ignored
+CACHE_VERSION = 3
+
+
+# ==========================================
+# BASE AGGREGATES
+# ==========================================
+
+def compute_base_aggregates(df):
+    """
+    Every aggregate more than one stage needs, computed from a single frame.
+
+    Sums run on the int32 cents column (pandas widens them to int64); money
+    aggregates are converted to dollars on the way out.
+    """
+    rows = len(df)
+    with stage('groupby.customer_summary', rows=rows):
+        customer_summary = df.groupby('customer_id').agg(
+            frequency=('transaction_id', 'count'),
+            monetary=('revenue', 'sum'),
+            last_purchase=('sale_date', 'max')
+        )
+        customer_summary['monetary'] = to_dollars(customer_summary['monetary'])
+
+    with stage('aggregate.totals', rows=rows):
+        aggregates = {
+            'total_revenue': to_dollars(df['revenue'].sum()),
+            'total_transactions': len(df),
+            'unique_customers': len(customer_summary),
+            'unique_products': df['product'].nunique(),
+            'n_categories': df['product_category'].nunique(),
+            'first_date': df['sale_date'].min(),
+            'last_date': df['sale_date'].max(),
+            'revenue_mean': df['revenue'].mean() / CENTS_PER_DOLLAR,
+            'revenue_median': df['revenue'].median() / CENTS_PER_DOLLAR,
+            'quantity_mean': df['quantity'].mean(),
+            'single_item_transactions': int((df['quantity'] == 1).sum())
+        }
+    with stage('groupby.monthly_revenue', rows=rows):
+        aggregates['monthly_revenue'] = to_dollars(df.groupby('year_month')['revenue'].sum())
+    with stage('groupby.daily_totals', rows=rows):
+        # Revenue stays in cents here: sales_pipeline/timeseries.py sums it over windows
+        aggregates['daily_totals'] = df.groupby('sale_date').agg(
+            revenue=('revenue', 'sum'),
+            transactions=('transaction_id', 'count'),
+            customers=('customer_id', 'nunique')
+        ).astype(np.int64)
+    with stage('groupby.product_revenue', rows=rows):
+        aggregates['product_revenue'] = to_dollars(df.groupby('product', observed=True)['revenue'].sum()).sort_values(ascending=False)
+    with stage('groupby.category_revenue', rows=rows):
+        aggregates['category_revenue'] = to_dollars(df.groupby('product_category', observed=True)['revenue'].sum()).sort_values(ascending=False)
+    with stage('groupby.category_product_revenue', rows=rows):
+        aggregates['category_product_revenue'] = to_dollars(df.groupby(['product_category', 'product'], observed=True)['revenue'].sum()).reset_index()
+
+    aggregates['customer_summary'] = customer_summary
+    aggregates['customer_revenue'] = customer_summary['monetary'].sort_values(ascending=False)
+    aggregates['id_widths'] = df.attrs.get('id_widths', {})
+    return aggregates
+
+
+# ==========================================
+# CONTEXT
+# ==========================================
+
+class AnalysisContext:
+    """
+    One load of the sales data plus its base aggregates.
+
+    The raw frame is only read when a stage actually needs row-level data.
+    Aggregates come from the cache file when it matches the source, and
+    otherwise from the materialized cube (sales_pipeline/cube.py), which is
+    refreshed with only the rows added since it was last built.
+    """
+
+    def __init__(self, source=None, use_cache=True):
+        self.source = source or default_source()
+        self.use_cache = use_cache
+        self.scans = 0
+        self._df = None
+        self._aggregates = None
+
+    @property
+    def df(self):
+        if self._df is None:
+            df = load_sales(self.source)
+            with stage('load.year_month', rows=len(df)):
+                df['year_month'] = df['sale_date'].dt.to_period('M')
+            self._df = df
+            self.scans += 1
+        return self._df
+
+    @property
+    def aggregates(self):
+        if self._aggregates is None:
+            self._aggregates = self._load_cached() if self.use_cache else None
+            if self._aggregates is None:
+                self._aggregates = self._cube_aggregates() if self.use_cache \
+                    else compute_base_aggregates(self.df)
+                if self.use_cache:
+                    self._save_cached()
+        return self._aggregates
+
+    def _cube_aggregates(self):
+        cube = load_cube()
+        fingerprint = source_fingerprint(self.source)
+        if not cube_is_current(cube, self.source, fingerprint):
+            if self._df is None:
+                # Only the rows after the cube's watermark are read, unless
+                # history was rewritten and the cube is rebuilt
+                self.scans += 1
+            with stage('cube.refresh', source=self.source):
+                cube, _ = refresh_cube(cube, self.source, fingerprint, df=self._df)
+        with stage('cube.aggregates'):
+            return cube_aggregates(cube)
+
+    def __getattr__(self, name):
+        # Expose each base aggregate as an attribute, e.g. ctx.monthly_revenue
+        if name.startswith('_'):
+            raise AttributeError(name)
+        aggregates = self.aggregates
+        if name in aggregates:
+            return aggregates[name]
+        raise AttributeError(name)
+
+    def _load_cached(self):
+        if not os.path.exists(CACHE_FILE):
+            return None
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if cached.get('version') != CACHE_VERSION or \
+                cached.get('fingerprint') != source_fingerprint(self.source):
+            return None
+        return cached['aggregates']
+
+    def _save_cached(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        payload = {
+            'version': CACHE_VERSION,
+            'fingerprint': source_fingerprint(self.source),
+            'aggregates': self._aggregates
+        }
+        tmp_path = CACHE_FILE + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, CACHE_FILE)
+
+
+_contexts = {}
+_active = None
+
+
+def use_context(ctx):
+    """
+    Make ctx the context returned by get_context() for the rest of the process
+    """
+    global _active
+    _active = ctx
+    _contexts[ctx.source] = ctx
+    return ctx
+
+
+def get_context(source=None, use_cache=True):
+    """
+    Shared context for the current process.
+
+    Scripts call this instead of loading the data themselves, so running
+    several stages in one process (see run_pipeline.py) scans the data once.
+    """
+    if source is None and _active is not None:
+        return _active
+    source = source or default_source()
+    if source not in _contexts:
+        _contexts[source] = AnalysisContext(source, use_cache=use_cache)
+    return _contexts[source]
+
+
+def monthly_frame(monthly_revenue):
+    """
+    Monthly revenue as a two-column frame with string months ('2024-01')
+    """
+    frame = monthly_revenue.reset_index()
+    frame['year_month'] = frame['year_month'].astype(str)
+    return frame
+
+
+def recency_reference_date(ctx):
+    """
+    Day after the last transaction, the anchor for recency
+    """
+    return pd.Timestamp(ctx.last_date) + pd.Timedelta(days=1)
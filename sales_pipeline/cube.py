@@ -0,0 +1,315 @@
+"""
+Materialized Sales Cube
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Persisted pre-aggregates the reporting stages read instead of
+             the raw transactions, refreshed incrementally as new days arrive
+
+Usage:
+    python -m sales_pipeline.cube                     # refresh from the main dataset
+    python -m sales_pipeline.cube --delta day.csv     # merge one day's batch
+    python -m sales_pipeline.cube --rebuild           # rebuild from full history regardless
+
+The cube holds four tables:
+    daily         one row per (sale_date, product_category, product) with
+                  transactions, quantity, single-item transactions and revenue
+    day_customers distinct customers per sale_date
+    customers     one row per customer: frequency, monetary (cents), last purchase
+    order_values  transactions per distinct order value (cents), for an exact median
+
+Like the incremental RFM state, the cube keeps a watermark (the last sale_date
+merged): a refresh reads just the rows dated after the watermark, which on
+the Parquet dataset prunes every older month partition. That is only right
+when history was appended to in whole days, so a refresh first checks that
+the source only gained rows since the last one (storage.appended_only): no
+older partition changed, a CSV kept its earlier bytes, and the rows up to
+the watermark still add up to the rows merged. Otherwise, e.g. after the
+dataset was regenerated, the cube is rebuilt from the full history. A batch
+merged with --delta that the main source does not also contain is dropped
+by the next refresh from that source.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.rfm_incremental import STATE_COLUMNS, empty_state, merge_state, summarize_delta
+from sales_pipeline.schema import CENTS_PER_DOLLAR, to_dollars
+from sales_pipeline.storage import (appended_only, as_date, default_source, fingerprint_digest, load_sales,
+                                    source_fingerprint)
+
+DEFAULT_CUBE = os.path.join('.pipeline_cache', 'cube')
+METADATA_FILE = 'cube.json'
+
+CUBE_KEYS = ['sale_date', 'product_category', 'product']
+MEASURES = ['transactions', 'quantity', 'single_item', 'revenue']
+SOURCE_COLUMNS = ['transaction_id', 'sale_date', 'product', 'product_category',
+                  'customer_id', 'quantity', 'revenue']
+
+
+# ==========================================
+# BUILD AND MERGE
+# ==========================================
+
+def empty_cube():
+    daily = pd.DataFrame({
+        'sale_date': pd.Series(dtype='datetime64[ms]'),
+        'product_category': pd.Series(dtype='category'),
+        'product': pd.Series(dtype='category'),
+        **{measure: pd.Series(dtype=np.int64) for measure in MEASURES}
+    })
+    day_customers = pd.Series(dtype=np.int64, name='customers',
+                              index=pd.DatetimeIndex([], dtype='datetime64[ms]', name='sale_date'))
+    order_values = pd.Series(dtype=np.int64, name='transactions',
+                             index=pd.Index([], dtype=np.int32, name='revenue'))
+    metadata = {'watermark': None, 'source': None, 'fingerprint': None, 'manifest': None,
+                'id_widths': {}, 'rows': 0}
+    return {'daily': daily, 'day_customers': day_customers, 'customers': empty_state(),
+            'order_values': order_values, 'metadata': metadata}
+
+
+def aggregate_transactions(df):
+    """
+    Cube tables for a frame of transactions in the compact schema
+    """
+    measures = pd.DataFrame({
+        'transactions': 1,
+        'quantity': df['quantity'].astype(np.int64),
+        'single_item': (df['quantity'] == 1).astype(np.int64),
+        'revenue': df['revenue'].astype(np.int64)
+    }, index=df.index)
+    # Rows with a missing product or category keep a cell, so the totals still count them
+    daily = measures.groupby([df[key] for key in CUBE_KEYS], observed=True, dropna=False).sum().reset_index()
+    day_customers = df.groupby('sale_date')['customer_id'].nunique().astype(np.int64).rename('customers')
+    order_values = df['revenue'].value_counts().sort_index().rename('transactions')
+    return {'daily': daily, 'day_customers': day_customers, 'customers': summarize_delta(df),
+            'order_values': order_values}
+
+
+def _align_categories(frames, column):
+    # Keep the existing category order and append new categories as they appear
+    categories = []
+    for frame in frames:
+        categories += [c for c in frame[column].cat.categories if c not in set(categories)]
+    return [frame[column].cat.set_categories(categories) for frame in frames]
+
+
+def merge_cube(cube, partial):
+    """
+    Fold the tables from aggregate_transactions into the cube
+    """
+    frames = [cube['daily'], partial['daily']]
+    for column in ['product_category', 'product']:
+        for frame, aligned in zip(frames, _align_categories(frames, column)):
+            frame[column] = aligned
+    daily = pd.concat(frames, ignore_index=True)
+    cube['daily'] = daily.groupby(CUBE_KEYS, observed=True, dropna=False)[MEASURES].sum().reset_index()
+
+    # Days are merged whole (see the watermark), so distinct counts per day just add up
+    cube['day_customers'] = cube['day_customers'].add(partial['day_customers'], fill_value=0) \
+        .astype(np.int64).rename('customers')
+    cube['customers'] = merge_state(cube['customers'], partial['customers']).sort_index()
+    cube['order_values'] = cube['order_values'].add(partial['order_values'], fill_value=0) \
+        .astype(np.int64).rename('transactions')
+    return cube
+
+
+def apply_transactions(cube, df):
+    """
+    Merge transactions dated after the watermark and advance it; returns rows merged
+    """
+    metadata = cube['metadata']
+    if metadata['watermark'] is not None:
+        df = df[df['sale_date'] > pd.Timestamp(metadata['watermark'])]
+    if df.empty:
+        return 0
+
+    merge_cube(cube, aggregate_transactions(df))
+    for column, width in df.attrs.get('id_widths', {}).items():
+        metadata['id_widths'][column] = max(metadata['id_widths'].get(column, 0), width)
+    metadata['watermark'] = str(df['sale_date'].max().date())
+    metadata['rows'] += len(df)
+    return len(df)
+
+
+# ==========================================
+# PERSISTENCE
+# ==========================================
+
+def load_cube(path=DEFAULT_CUBE):
+    if not os.path.exists(os.path.join(path, METADATA_FILE)) or \
+            not os.path.exists(os.path.join(path, 'day_customers.parquet')):
+        # Missing, or written before day_customers existed: rebuild from the source
+        return empty_cube()
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    daily = pd.read_parquet(os.path.join(path, 'daily.parquet'))
+    # An empty categorical comes back from Parquet as a null column
+    daily = daily.astype({'product_category': 'category', 'product': 'category'})
+    customers = pd.read_parquet(os.path.join(path, 'customers.parquet')).set_index('customer_id')
+    order_values = pd.read_parquet(os.path.join(path, 'order_values.parquet')).set_index('revenue')
+    day_customers = pd.read_parquet(os.path.join(path, 'day_customers.parquet')).set_index('sale_date')
+    return {
+        'daily': daily,
+        'day_customers': day_customers['customers'],
+        'customers': customers[STATE_COLUMNS],
+        'order_values': order_values['transactions'],
+        'metadata': metadata
+    }
+
+
+def save_cube(cube, path=DEFAULT_CUBE):
+    """
+    Write all tables to a fresh directory and swap it in, so readers never see
+    tables from two different refreshes
+    """
+    tmp_path, old_path = path + '.tmp', path + '.old'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    cube['daily'].to_parquet(os.path.join(tmp_path, 'daily.parquet'), index=False)
+    cube['customers'].reset_index().to_parquet(os.path.join(tmp_path, 'customers.parquet'), index=False)
+    cube['order_values'].reset_index().to_parquet(os.path.join(tmp_path, 'order_values.parquet'), index=False)
+    cube['day_customers'].reset_index().to_parquet(os.path.join(tmp_path, 'day_customers.parquet'), index=False)
+    with open(os.path.join(tmp_path, METADATA_FILE), 'w') as f:
+        json.dump(cube['metadata'], f, indent=2)
+
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def cube_is_current(cube, source, fingerprint):
+    metadata = cube['metadata']
+    return metadata['source'] == source and metadata['fingerprint'] == fingerprint_digest(fingerprint)
+
+
+def refresh_cube(cube, source, fingerprint, df=None, path=DEFAULT_CUBE):
+    """
+    Bring the cube up to date with source and persist it; returns (cube, rows merged).
+
+    df, when the caller already holds the full frame, is used instead of
+    reading the new rows again. Unless the source was only appended to since
+    the last refresh (a different source, a regenerated file, a changed older
+    partition), the cube is rebuilt from the full history.
+    """
+    appended, manifest = appended_only(source, fingerprint, cube['metadata'], df)
+    if not appended:
+        cube = empty_cube()
+    watermark = cube['metadata']['watermark']
+    if df is None:
+        start = None if watermark is None else as_date(watermark) + datetime.timedelta(days=1)
+        df = load_sales(source, columns=SOURCE_COLUMNS, start=start)
+    merged = apply_transactions(cube, df)
+    cube['metadata'].update(source=source, fingerprint=fingerprint_digest(fingerprint), manifest=manifest)
+    save_cube(cube, path)
+    return cube, merged
+
+
+# ==========================================
+# REPORTING AGGREGATES
+# ==========================================
+
+def order_value_median(order_values):
+    """
+    Exact median transaction value (cents) from the order-value histogram;
+    NaN when there are no orders, like the median of an empty column
+    """
+    n = int(order_values.sum())
+    if n == 0:
+        return np.nan
+    cumulative = order_values.cumsum().to_numpy()
+    values = order_values.index.to_numpy()
+    middle = np.searchsorted(cumulative, [(n - 1) // 2, n // 2], side='right')
+    return values[middle].astype(np.float64).mean()
+
+
+def cube_aggregates(cube):
+    """
+    The base aggregates of sales_pipeline.context.compute_base_aggregates,
+    read from the cube instead of the raw rows
+    """
+    daily = cube['daily']
+    customers = cube['customers']
+    transactions = int(daily['transactions'].sum())
+    revenue_cents = int(daily['revenue'].sum())
+
+    customer_summary = pd.DataFrame({
+        'frequency': customers['frequency'],
+        'monetary': to_dollars(customers['monetary_cents']),
+        'last_purchase': customers['last_purchase']
+    })
+    year_month = daily['sale_date'].dt.to_period('M').rename('year_month')
+    daily_totals = daily.groupby('sale_date')[['revenue', 'transactions']].sum()
+    daily_totals['customers'] = cube['day_customers'].reindex(daily_totals.index, fill_value=0)
+
+    return {
+        'total_revenue': to_dollars(revenue_cents),
+        'total_transactions': transactions,
+        'unique_customers': len(customer_summary),
+        'unique_products': daily['product'].nunique(),
+        'n_categories': daily['product_category'].nunique(),
+        'first_date': daily['sale_date'].min(),
+        'last_date': daily['sale_date'].max(),
+        # An empty cube has no orders to average: NaN, as pandas gives for an empty column
+        'revenue_mean': revenue_cents / transactions / CENTS_PER_DOLLAR if transactions else np.nan,
+        'revenue_median': order_value_median(cube['order_values']) / CENTS_PER_DOLLAR,
+        'quantity_mean': daily['quantity'].sum() / transactions if transactions else np.nan,
+        'single_item_transactions': int(daily['single_item'].sum()),
+        'monthly_revenue': to_dollars(daily.groupby(year_month)['revenue'].sum()),
+        'daily_totals': daily_totals.astype(np.int64),
+        'product_revenue': to_dollars(daily.groupby('product', observed=True)['revenue'].sum()).sort_values(ascending=False),
+        'category_revenue': to_dollars(daily.groupby('product_category', observed=True)['revenue'].sum()).sort_values(ascending=False),
+        'category_product_revenue': to_dollars(daily.groupby(['product_category', 'product'], observed=True)['revenue'].sum()).reset_index(),
+        'customer_summary': customer_summary,
+        'customer_revenue': customer_summary['monetary'].sort_values(ascending=False),
+        'id_widths': dict(cube['metadata']['id_widths'])
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Refresh the materialized sales cube.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--delta', help='CSV or Parquet batch of new transactions to merge')
+    parser.add_argument('--cube', default=DEFAULT_CUBE, help=f'cube directory (default: {DEFAULT_CUBE})')
+    parser.add_argument('--rebuild', action='store_true', help='discard the cube and rebuild from full history')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    source = args.source or default_source()
+
+    print("=" * 70)
+    print("SALES CUBE REFRESH")
+    print("=" * 70)
+
+    cube = empty_cube() if args.rebuild else load_cube(args.cube)
+    print(f"\n📦 Cube: {len(cube['daily']):,} cells, {len(cube['customers']):,} customers, "
+          f"watermark {cube['metadata']['watermark'] or '(none)'}")
+
+    if args.delta:
+        merged = apply_transactions(cube, load_sales(args.delta, columns=SOURCE_COLUMNS))
+        # The main source no longer describes the cube; the next refresh re-checks it
+        cube['metadata']['fingerprint'] = None
+        save_cube(cube, args.cube)
+    elif cube_is_current(cube, source, source_fingerprint(source)):
+        print("   ✅ Cube is current with the source")
+        return
+    else:
+        cube, merged = refresh_cube(cube, source, source_fingerprint(source), path=args.cube)
+
+    print(f"   ✅ Merged {merged:,} transactions → {len(cube['daily']):,} cells, "
+          f"{len(cube['customers']):,} customers, watermark {cube['metadata']['watermark'] or '(none)'}")
+    print(f"   Rows summarized: {cube['metadata']['rows']:,} "
+          f"({cube['metadata']['rows'] / max(len(cube['daily']), 1):,.1f} transactions per cell)")
+    print(f"\n💾 Saved: {args.cube}/")
+
+if __name__ == '__main__':
+    main()
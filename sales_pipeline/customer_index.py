@@ -0,0 +1,254 @@
+"""
+RFM Customer Index
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Read-optimized, memory-mapped snapshot of the RFM segments for
+             single-customer lookups without loading rfm_customer_segments.csv
+
+Usage:
+    python -m sales_pipeline.customer_index                       # rebuild from the segments CSV
+    python -m sales_pipeline.customer_index --lookup CUST0042
+    python -m sales_pipeline.customer_index --benchmark 100000    # random lookups vs reading the CSV
+
+File layout (little-endian):
+    magic      8 bytes, b'RFMIDX01'
+    length     uint32, size of the JSON header that follows
+    header     JSON: customer count, ID width, segment names, record fields
+    padding    up to the next 8-byte boundary
+    ids        sorted customer_id keys, uint32 × count
+    padding    up to the next 8-byte boundary
+    records    fixed-width records in the same order as ids (see RECORD)
+
+A lookup is a binary search of the ids block (O(log n)) followed by a read
+of one record, both straight from the mapped file; nothing is parsed or
+copied at open time beyond the header. 05_rfm_analysis.py publishes a new
+snapshot by writing a temporary file and renaming it over the old one, so a
+reader either sees the old file or the new one, never a partial write.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.rfm import SEGMENTS
+from sales_pipeline.schema import CENTS_PER_DOLLAR, ID_COLUMNS, customer_key, format_ids, parse_ids, to_dollars
+
+DEFAULT_SEGMENTS = 'rfm_customer_segments.csv'
+DEFAULT_INDEX = 'rfm_customer_segments.idx'
+
+MAGIC = b'RFMIDX01'
+
+# One 24-byte record per customer; segment is the position in SEGMENTS
+RECORD = np.dtype([
+    ('recency', '<u4'),
+    ('frequency', '<u4'),
+    ('monetary_cents', '<i8'),
+    ('R_score', 'u1'),
+    ('F_score', 'u1'),
+    ('M_score', 'u1'),
+    ('RFM_score', 'u1'),
+    ('segment', 'u1')
+], align=True)
+
+# The same layout for struct, to unpack one record without a numpy scalar
+RECORD_STRUCT = struct.Struct('<IIqBBBBB3x')
+
+
+def _aligned(offset):
+    return (offset + 7) // 8 * 8
+
+
+# ==========================================
+# WRITE
+# ==========================================
+
+def index_arrays(rfm):
+    """
+    (ids, records) sorted by customer_id for a scored and segmented RFM frame.
+
+    customer_id may hold the integer keys or 'CUST0001'-style labels.
+    """
+    ids = rfm['customer_id']
+    if not pd.api.types.is_integer_dtype(ids):
+        ids = parse_ids(ids, 'customer_id')
+    ids = np.asarray(ids, dtype=np.uint32)
+    order = np.argsort(ids, kind='stable')
+
+    records = np.zeros(len(rfm), dtype=RECORD)
+    records['recency'] = rfm['recency'].to_numpy()
+    records['frequency'] = rfm['frequency'].to_numpy()
+    records['monetary_cents'] = np.round(rfm['monetary'].to_numpy(dtype=np.float64) * CENTS_PER_DOLLAR)
+    for column in ['R_score', 'F_score', 'M_score', 'RFM_score']:
+        records[column] = rfm[column].to_numpy()
+    records['segment'] = pd.Categorical(rfm['segment'], categories=SEGMENTS).codes
+    return ids[order], records[order]
+
+
+def write_index(rfm, path=DEFAULT_INDEX, id_width=None):
+    """
+    Publish an RFM snapshot as a customer index, atomically replacing any
+    previous file at path
+    """
+    ids, records = index_arrays(rfm)
+    header = json.dumps({
+        'customers': len(ids),
+        'id_width': id_width,
+        'segments': SEGMENTS,
+        'fields': list(RECORD.names),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+        f.write(ids.tobytes())
+        f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# ==========================================
+# READ
+# ==========================================
+
+class CustomerIndex:
+    """
+    Read-only view of an index file; ids and records are numpy arrays over
+    the mapped pages, not copies
+    """
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies this snapshot; a published replacement is a different file
+        self.version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a customer index file")
+        length, = struct.unpack_from('<I', self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._map[start:start + length])
+        count = self.header['customers']
+        ids_offset = _aligned(start + length)
+        records_offset = _aligned(ids_offset + count * 4)
+
+        self.ids = np.frombuffer(self._map, dtype='<u4', count=count, offset=ids_offset)
+        self.records = np.frombuffer(self._map, dtype=RECORD, count=count, offset=records_offset)
+        self._records_offset = records_offset
+        self.segments = self.header['segments']
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, customer_id):
+        """
+        Position of an integer customer key, or None
+        """
+        i = int(np.searchsorted(self.ids, customer_id))
+        if i < len(self.ids) and self.ids[i] == customer_id:
+            return i
+        return None
+
+    def lookup(self, customer):
+        """
+        The customer's row of rfm_customer_segments.csv as a dict, or None.
+        customer is a 'CUST0042' label or the integer key.
+        """
+        key = customer_key(customer)
+        i = None if key is None else self.find(key)
+        if i is None:
+            return None
+        recency, frequency, monetary_cents, r, f, m, rfm_score, segment = RECORD_STRUCT.unpack_from(
+            self._map, self._records_offset + i * RECORD.itemsize)
+        return {
+            'customer_id': ID_COLUMNS['customer_id'] + str(key).zfill(self.header['id_width'] or 4),
+            'recency': recency,
+            'frequency': frequency,
+            'monetary': to_dollars(monetary_cents),
+            'R_score': r,
+            'F_score': f,
+            'M_score': m,
+            'RFM_score': rfm_score,
+            'segment': self.segments[segment]
+        }
+
+    def close(self):
+        # Views over the map must be gone before it can be closed
+        self.ids = self.records = None
+        self._map.close()
+
+
+def build_from_csv(segments=DEFAULT_SEGMENTS, path=DEFAULT_INDEX):
+    """
+    Index an existing segments CSV; returns the number of customers
+    """
+    rfm = pd.read_csv(segments)
+    width = int(rfm['customer_id'].str.len().max()) - len(ID_COLUMNS['customer_id'])
+    write_index(rfm, path, id_width=width)
+    return len(rfm)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the memory-mapped RFM customer index.')
+    parser.add_argument('--segments', default=DEFAULT_SEGMENTS, help=f'segments CSV (default: {DEFAULT_SEGMENTS})')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f'index file (default: {DEFAULT_INDEX})')
+    parser.add_argument('--lookup', nargs='+', help='customer IDs to look up instead of rebuilding')
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help='time N random lookups against reading the CSV for each one')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("RFM CUSTOMER INDEX")
+    print("=" * 70)
+
+    if not args.lookup and not args.benchmark:
+        start = time.perf_counter()
+        count = build_from_csv(args.segments, args.index)
+        print(f"\n📇 Indexed {count:,} customers from {args.segments} in {time.perf_counter() - start:.2f}s")
+        print(f"💾 Saved: {args.index} ({os.path.getsize(args.index) / 1024:,.1f} KB)")
+        return
+
+    index = CustomerIndex(args.index)
+    print(f"\n📇 {args.index}: {len(index):,} customers, snapshot {index.header['created']}")
+
+    for customer in args.lookup or []:
+        print(f"\n🔎 {customer}: {json.dumps(index.lookup(customer))}")
+
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        customers = format_ids(pd.Series(rng.choice(index.ids, args.benchmark)), 'customer_id',
+                               index.header['id_width'])
+        start = time.perf_counter()
+        for customer in customers:
+            index.lookup(customer)
+        per_lookup = (time.perf_counter() - start) / args.benchmark
+
+        start = time.perf_counter()
+        rfm = pd.read_csv(args.segments)
+        rfm[rfm['customer_id'] == customers.iloc[0]].to_dict('records')
+        per_read = time.perf_counter() - start
+
+        print(f"\n⏱️  Index lookup: {per_lookup * 1e6:,.1f} µs "
+              f"({1 / per_lookup:,.0f} lookups/s over {args.benchmark:,})")
+        print(f"   Reading the CSV per lookup: {per_read * 1000:,.1f} ms ({per_read / per_lookup:,.0f}x slower)")
+
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,493 @@
+"""
+Interactive Dashboards
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: The Plotly charts of 06_interactive_charts.py (and the WebGL RFM
+             scatter of 05_rfm_analysis.py and the cohort heatmap of
+             07_cohort_analysis.py), built from small aggregates and written
+             as HTML reports
+
+Like the static charts, each report is a job keyed on a hash of its inputs
+and parameters; reports whose key has not changed are left as they are (see
+sales_pipeline.artifacts). Plotly is only imported when something has to be
+rendered, so a run where nothing changed stays cheap.
+
+Output modes (DASHBOARD_MODE):
+    standalone  every page embeds the full plotly.js bundle (~4.8 MB each)
+                and opens on its own; the default
+    light       plotly.js is written once as plotly.min.js next to the pages,
+                which load it with a <script src>; trace data is rounded to
+                cents and long series are downsampled before embedding, so
+                each page is a few KB and the bundle is fetched (and cached by
+                the browser) once
+"""
+
+import os
+import time
+from importlib.metadata import version
+
+import numpy as np
+
+from sales_pipeline.artifacts import ArtifactCache, artifact_key, render_cached
+from sales_pipeline.instrument import stage
+from sales_pipeline.schema import format_ids
+
+MODE_ENV = 'DASHBOARD_MODE'
+STANDALONE = 'standalone'
+LIGHT = 'light'
+
+PLOTLY_BUNDLE = 'plotly.min.js'
+
+# Points kept per time series in light mode
+MAX_POINTS = 1000
+
+# Customers drawn in the WebGL RFM scatter; larger tables are sampled
+SCATTER_POINT_LIMIT = 1_000_000
+
+CATEGORY_COLORS = ['#F18F01', '#C73E1D', '#6A994E', '#A7C957', '#2E86AB']
+
+
+# ==========================================
+# FIGURES
+# ==========================================
+
+def revenue_trend(monthly_revenue):
+    """
+    monthly_revenue: frame with year_month (string) and revenue
+    """
+    import plotly.express as px
+
+    fig1 = px.line(
+        monthly_revenue,
+        x='year_month',
+        y='revenue',
+        title='📈 Monthly Revenue Trend 2024 (Interactive)',
+        labels={'year_month': 'Month', 'revenue': 'Revenue ($)'},
+        markers=True
+    )
+
+    fig1.update_traces(
+        line_color='#2E86AB',
+        line_width=3,
+        marker=dict(size=12, line=dict(width=2, color='white'))
+    )
+
+    fig1.update_layout(
+        hovermode='x unified',
+        plot_bgcolor='white',
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5,
+        hoverlabel=dict(bgcolor="white", font_size=14),
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray'),
+        yaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    )
+    return fig1
+
+
+def daily_revenue(daily_revenue):
+    """
+    daily_revenue: frame with sale_date, revenue and avg_30d (in light mode
+    downsampled to MAX_POINTS rows, see downsample)
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure([
+        go.Scatter(x=daily_revenue['sale_date'], y=daily_revenue['revenue'], name='Daily revenue',
+                   mode='lines', line=dict(color='#A9CCE3', width=1)),
+        go.Scatter(x=daily_revenue['sale_date'], y=daily_revenue['avg_30d'], name='30-day average',
+                   mode='lines', line=dict(color='#2E86AB', width=3))
+    ])
+
+    fig.update_layout(
+        title='📅 Daily Revenue with 30-Day Average (Interactive)',
+        xaxis_title='Date',
+        yaxis_title='Revenue ($)',
+        hovermode='x unified',
+        plot_bgcolor='white',
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5,
+        hoverlabel=dict(bgcolor="white", font_size=14),
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray'),
+        yaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    )
+    return fig
+
+
+def top_products(top_10_products):
+    """
+    top_10_products: frame with product and revenue
+    """
+    import plotly.express as px
+
+    fig2 = px.bar(
+        top_10_products,
+        x='revenue',
+        y='product',
+        orientation='h',
+        title='🏆 Top 10 Products by Revenue (Interactive)',
+        labels={'revenue': 'Revenue ($)', 'product': 'Product'},
+        color='revenue',
+        color_continuous_scale='Viridis'
+    )
+
+    fig2.update_layout(
+        showlegend=False,
+        plot_bgcolor='white',
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5,
+        hoverlabel=dict(bgcolor="white", font_size=14),
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    )
+    return fig2
+
+
+def category_sunburst(category_product):
+    """
+    category_product: frame with product_category, product and revenue
+    """
+    import plotly.express as px
+
+    fig3 = px.sunburst(
+        category_product,
+        path=['product_category', 'product'],
+        values='revenue',
+        title='🎯 Revenue Distribution: Categories → Products (Interactive)',
+        color='revenue',
+        color_continuous_scale='RdYlGn',
+        hover_data={'revenue': ':,.0f'}
+    )
+
+    fig3.update_layout(
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5
+    )
+    return fig3
+
+
+def treemap(category_product):
+    import plotly.express as px
+
+    fig4 = px.treemap(
+        category_product,
+        path=['product_category', 'product'],
+        values='revenue',
+        title='📦 Revenue Treemap by Category and Product',
+        color='revenue',
+        color_continuous_scale='Blues',
+        hover_data={'revenue': ':,.0f'}
+    )
+
+    fig4.update_layout(
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5
+    )
+    return fig4
+
+
+def dashboard(monthly_revenue, category_revenue, top_5_products):
+    """
+    The combined 2x2 dashboard: trend, category bars, top 5 products, category share
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig_dashboard = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=(
+            'Monthly Revenue Trend',
+            'Revenue by Category',
+            'Top 5 Products',
+            'Revenue Distribution'
+        ),
+        specs=[
+            [{"type": "scatter"}, {"type": "bar"}],
+            [{"type": "bar"}, {"type": "pie"}]
+        ],
+        vertical_spacing=0.12,
+        horizontal_spacing=0.10
+    )
+
+    # 1. Revenue trend
+    fig_dashboard.add_trace(
+        go.Scatter(
+            x=monthly_revenue['year_month'],
+            y=monthly_revenue['revenue'],
+            mode='lines+markers',
+            name='Revenue',
+            line=dict(color='#2E86AB', width=3),
+            marker=dict(size=10)
+        ),
+        row=1, col=1
+    )
+
+    # 2. Revenue by category
+    fig_dashboard.add_trace(
+        go.Bar(
+            x=category_revenue['product_category'],
+            y=category_revenue['revenue'],
+            name='Category Revenue',
+            marker_color='#A23B72',
+            showlegend=False
+        ),
+        row=1, col=2
+    )
+
+    # 3. Top 5 products
+    fig_dashboard.add_trace(
+        go.Bar(
+            y=top_5_products['product'],
+            x=top_5_products['revenue'],
+            orientation='h',
+            name='Top Products',
+            marker_color='#F18F01',
+            showlegend=False
+        ),
+        row=2, col=1
+    )
+
+    # 4. Pie chart
+    fig_dashboard.add_trace(
+        go.Pie(
+            labels=category_revenue['product_category'],
+            values=category_revenue['revenue'],
+            name='Category Share',
+            marker=dict(colors=CATEGORY_COLORS)
+        ),
+        row=2, col=2
+    )
+
+    fig_dashboard.update_layout(
+        height=900,
+        title_text="📊 Sales Analysis Dashboard - 2024",
+        title_font_size=24,
+        title_x=0.5,
+        showlegend=False,
+        plot_bgcolor='white',
+        font=dict(size=11, family='Arial')
+    )
+
+    fig_dashboard.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    fig_dashboard.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    return fig_dashboard
+
+
+def rfm_scatter(points, sampled_from=None):
+    """
+    Frequency vs monetary, one WebGL marker per customer and one trace per segment.
+
+    points: frame with customer_id (labels), frequency, monetary and segment
+    """
+    import plotly.graph_objects as go
+
+    title = '💎 RFM Segmentation: Frequency vs Monetary Value (Interactive)'
+    if sampled_from:
+        title += f'<br><sup>random sample of {len(points):,} of {sampled_from:,} customers</sup>'
+
+    fig = go.Figure()
+    for segment, group in points.groupby('segment', sort=False):
+        fig.add_trace(go.Scattergl(
+            x=group['frequency'],
+            y=group['monetary'],
+            customdata=group['customer_id'],
+            mode='markers',
+            name=segment,
+            marker=dict(size=7, opacity=0.6, line=dict(width=0.5, color='black')),
+            hovertemplate='%{customdata}<br>Frequency: %{x}<br>Monetary: $%{y:,.0f}<extra>%{fullData.name}</extra>'
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title='Frequency (Number of Purchases)',
+        yaxis_title='Monetary (Total Revenue $)',
+        legend_title_text='Segment',
+        plot_bgcolor='white',
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5,
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray'),
+        yaxis=dict(showgrid=True, gridwidth=1, gridcolor='lightgray')
+    )
+    return fig
+
+
+def scatter_points(rfm, id_width=None, limit=SCATTER_POINT_LIMIT):
+    """
+    rfm_scatter inputs for a segmented RFM frame: (points, sampled_from)
+    """
+    points = rfm[['customer_id', 'frequency', 'monetary', 'segment']]
+    sampled_from = None
+    if len(points) > limit:
+        sampled_from = len(points)
+        points = points.sample(limit, random_state=0)
+    points = points.assign(customer_id=format_ids(points['customer_id'], 'customer_id', id_width))
+    return points, sampled_from
+
+
+def cohort_retention(retention, customers, revenue):
+    """
+    Retention heatmap with the customers and revenue of each cell on hover.
+
+    retention, customers, revenue: frames with one row per cohort month and
+    one column per month since acquisition (NaN where not observed yet)
+    """
+    import plotly.graph_objects as go
+
+    later = retention.to_numpy(dtype=np.float64)[:, 1:]
+    zmax = np.nanmax(later) if later.size and not np.isnan(later).all() else 100
+
+    fig = go.Figure(go.Heatmap(
+        z=retention.round(1).to_numpy(),
+        x=list(retention.columns),
+        y=list(retention.index.astype(str)),
+        customdata=np.dstack([customers.to_numpy(), revenue.round(2).to_numpy()]),
+        colorscale='YlGnBu',
+        zmin=0,
+        zmax=zmax,
+        colorbar=dict(title='Retained %'),
+        hovertemplate='Cohort %{y}, month %{x}<br>Retained: %{z:.1f}%<br>'
+                      'Customers: %{customdata[0]:,}<br>Revenue: $%{customdata[1]:,.0f}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title='👥 Customer Retention by Monthly Cohort (Interactive)',
+        xaxis_title='Months Since First Purchase',
+        yaxis_title='Cohort (First Purchase Month)',
+        plot_bgcolor='white',
+        font=dict(size=12, family='Arial'),
+        title_font_size=20,
+        title_x=0.5,
+        xaxis=dict(dtick=1),
+        yaxis=dict(type='category', autorange='reversed')
+    )
+    return fig
+
+
+FIGURES = {
+    'revenue_trend': revenue_trend,
+    'daily_revenue': daily_revenue,
+    'top_products': top_products,
+    'category_sunburst': category_sunburst,
+    'treemap': treemap,
+    'dashboard': dashboard,
+    'rfm_scatter': rfm_scatter,
+    'cohort_retention': cohort_retention
+}
+
+
+# ==========================================
+# LIGHT MODE
+# ==========================================
+
+def dashboard_mode():
+    mode = os.environ.get(MODE_ENV, STANDALONE)
+    if mode not in (STANDALONE, LIGHT):
+        raise ValueError(f"{MODE_ENV} must be '{STANDALONE}' or '{LIGHT}', not {mode!r}")
+    return mode
+
+
+def lttb_indices(y, max_points):
+    """
+    Positions kept by largest-triangle-three-buckets downsampling: the first
+    and last point plus, per bucket, the point forming the largest triangle
+    with the previously kept point and the next bucket's average. Peaks and
+    dips survive, unlike with plain striding or bucket means.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = [0]
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = (stop + next_stop - 1) / 2
+        next_y = y[stop:next_stop].mean()
+        a = kept[-1]
+        x = np.arange(start, stop)
+        area = np.abs((a - next_x) * (y[start:stop] - y[a]) - (a - x) * (next_y - y[a]))
+        kept.append(start + int(np.argmax(area)))
+    kept.append(n - 1)
+    return np.array(kept)
+
+
+def downsample(frame, column, max_points=MAX_POINTS):
+    """
+    At most max_points rows of a time-ordered frame, chosen on column
+    """
+    if len(frame) <= max_points:
+        return frame
+    return frame.iloc[lttb_indices(frame[column].to_numpy(), max_points)].reset_index(drop=True)
+
+
+def compact_figure(fig):
+    """
+    Round float trace data to cents, so it embeds as short numbers (or
+    smaller typed arrays) in the page JSON
+    """
+    for trace in fig.data:
+        for attribute in ['x', 'y', 'values']:
+            values = getattr(trace, attribute, None)
+            if values is not None and np.asarray(values).dtype.kind == 'f':
+                setattr(trace, attribute, np.round(np.asarray(values), 2))
+        marker = getattr(trace, 'marker', None)
+        colors = getattr(marker, 'colors', None) if marker is not None else None
+        if colors is not None and np.asarray(colors).dtype.kind == 'f':
+            marker.colors = np.round(np.asarray(colors), 2)
+    return fig
+
+
+def write_bundle(path):
+    from plotly.offline import get_plotlyjs
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(get_plotlyjs())
+
+
+# ==========================================
+# RUNNING JOBS
+# ==========================================
+
+def report_job(figure, path, mode=STANDALONE, **data):
+    params = {'figure': figure, 'mode': mode, 'plotly': version('plotly')}
+    if mode == LIGHT:
+        params['max_points'] = MAX_POINTS
+    return {'figure': figure, 'path': path, 'mode': mode, 'data': data,
+            'key': artifact_key(FIGURES[figure], params, data)}
+
+
+def bundle_job(directory='.'):
+    return {'figure': None, 'path': os.path.join(directory, PLOTLY_BUNDLE), 'mode': LIGHT,
+            'key': artifact_key(write_bundle, {'plotly': version('plotly')}, {})}
+
+
+def render_job(job):
+    start = time.perf_counter()
+    rows = sum(len(value) for value in job.get('data', {}).values() if hasattr(value, 'columns'))
+    with stage(f"report.{job['figure'] or 'bundle'}", rows=rows, path=job['path'], mode=job['mode']):
+        if job['figure'] is None:
+            write_bundle(job['path'])
+        elif job['mode'] == LIGHT:
+            fig = compact_figure(FIGURES[job['figure']](**job['data']))
+            # A relative src, so the pages and the bundle can be moved together
+            fig.write_html(job['path'], include_plotlyjs=PLOTLY_BUNDLE)
+        else:
+            FIGURES[job['figure']](**job['data']).write_html(job['path'])
+    return job['path'], time.perf_counter() - start
+
+
+def write_reports(jobs, cache=None, run_name='dashboards'):
+    """
+    Write the reports whose inputs changed; returns [(path, seconds, cached)]
+    in job order, led by the shared plotly.js bundle when any job is in light mode
+    """
+    cache = cache or ArtifactCache()
+    light = [job for job in jobs if job['mode'] == LIGHT]
+    if light:
+        jobs = [bundle_job(os.path.dirname(light[0]['path']))] + jobs
+    return render_cached(jobs, lambda stale: [render_job(job) for job in stale], cache, run_name)
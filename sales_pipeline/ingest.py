@@ -0,0 +1,475 @@
+"""
+Streaming Ingestion Service
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Long-running asyncio service that tails new transactions,
+             validates them and keeps KPIs and per-customer RFM state live
+
+Usage:
+    python -m sales_pipeline.ingest --watch live_sales.csv       # an append-only CSV file
+    python -m sales_pipeline.ingest --watch incoming/            # a directory of batch files
+    python -m sales_pipeline.ingest --watch incoming/ --port 9000 --rejects rejects.jsonl
+
+Sources:
+    file        Lines appended to the CSV (header first) are read on every
+                poll, up to the last complete line. A truncated or replaced
+                file is read again from the top.
+    directory   Each new *.csv file is read once, in name order. Write files
+                elsewhere (or under a dot/.tmp name) and rename them into
+                place, so a half-written batch is never picked up.
+
+Every batch goes through the checks of sales_pipeline/validate.py, row by row:
+    missing_values              any empty field
+    invalid_id                  transaction or customer id without a numeric part
+    out_of_range                quantity outside 1-255, or a negative or oversized
+                                unit_price / revenue (they are stored as uint8
+                                and int32 cents)
+    revenue_mismatch            revenue != quantity * unit_price (in cents)
+    duplicate_transaction_id    seen earlier in the batch or in any earlier batch
+Rejected rows are counted and, with --rejects, appended to a JSON-lines
+file with their reason. A batch that cannot be parsed at all is rejected whole,
+and so is one that fails with any unexpected error, so ingestion keeps going.
+
+Valid rows update the streaming KPI engine (sales_pipeline/kpis.py) and the
+per-customer RFM state (sales_pipeline/rfm_incremental.py), both in memory.
+Batches are applied on the event loop between requests, so every snapshot
+sees whole batches only. --max-batch-bytes bounds how much of a growing
+file one batch takes, which keeps ingest latency well under a second.
+
+Endpoints:
+    GET /health                 batches, rows, rejects and ingest latency
+    GET /kpis                   the running KPI values
+    GET /segments               customers and revenue per RFM segment
+    GET /customers/CUST0042     one customer's RFM row
+    GET /snapshot               all of the above except single customers
+
+Segments are scored on demand (exact quintiles over every customer) and
+reused until the next batch arrives.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from sales_pipeline.instrument import stage
+from sales_pipeline.kpis import KPI_COLUMNS, CustomerBitmap, StreamingKPIs
+from sales_pipeline.lookup_service import DEFAULT_HOST, serve_connection
+from sales_pipeline.rfm_incremental import DELTA_COLUMNS, empty_state, merge_state, score_state, summarize_delta
+from sales_pipeline.schema import CENTS_PER_DOLLAR, COLUMNS, ID_COLUMNS, customer_key, format_ids
+from sales_pipeline.storage import null_convert_options, typed_batch
+from sales_pipeline.validate import id_keys
+
+DEFAULT_PORT = 8766
+POLL_INTERVAL = 0.25
+MAX_BATCH_BYTES = 8 << 20
+LATENCY_TARGET = 1.0
+
+REJECT_REASONS = ['missing_values', 'invalid_id', 'out_of_range', 'revenue_mismatch', 'duplicate_transaction_id',
+                  'unparseable_batch', 'failed_batch']
+
+# Accepted raw values: what fits uint8 quantities and int32 cents
+VALUE_RANGES = {
+    'quantity': (1, np.iinfo(np.uint8).max),
+    'unit_price': (0, np.iinfo(np.int32).max / CENTS_PER_DOLLAR),
+    'revenue': (0, np.iinfo(np.int32).max / CENTS_PER_DOLLAR)
+}
+
+
+# ==========================================
+# SOURCES
+# ==========================================
+
+def parse_csv(data, column_names=None):
+    """
+    Raw Arrow table from CSV bytes or a path; the error instead if it cannot be parsed
+    """
+    source = pa.BufferReader(data) if isinstance(data, bytes) else data
+    read_options = pacsv.ReadOptions(column_names=column_names)
+    try:
+        table = pacsv.read_csv(source, read_options=read_options, convert_options=null_convert_options)
+    except (pa.ArrowInvalid, OSError) as error:
+        return error
+    missing = [column for column in COLUMNS if column not in table.column_names]
+    if missing:
+        return ValueError(f"missing columns: {', '.join(missing)}")
+    return table.select(COLUMNS)
+
+
+class FileTail:
+    """
+    Complete lines appended to a CSV file since the last poll
+    """
+
+    def __init__(self, path, max_bytes=MAX_BATCH_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.inode = None
+        self.offset = 0
+        self.header = None
+
+    def poll(self):
+        """
+        (label, raw table or parse error) for the new lines, or None
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # New, replaced or truncated file: start from its header
+            self.inode, self.offset, self.header = stat.st_ino, 0, None
+        if stat.st_size == self.offset:
+            return None
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(min(stat.st_size - self.offset, self.max_bytes))
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            # Only a partial line so far
+            return None
+        start_offset = self.offset
+        self.offset += end
+        data = data[:end]
+
+        if self.header is None:
+            header, _, data = data.partition(b'\n')
+            self.header = header.decode('utf-8').strip().split(',')
+            if not data:
+                return None
+        return f"{os.path.basename(self.path)}@{start_offset}", parse_csv(data, self.header)
+
+
+class BatchDirectory:
+    """
+    CSV batch files dropped into a directory, each read once in name order
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+
+    def poll(self):
+        for name in sorted(os.listdir(self.path)):
+            if name in self.done or name.startswith('.') or not name.endswith('.csv'):
+                continue
+            self.done.add(name)
+            return name, parse_csv(os.path.join(self.path, name))
+        return None
+
+
+def open_source(path, max_bytes=MAX_BATCH_BYTES):
+    return BatchDirectory(path) if os.path.isdir(path) else FileTail(path, max_bytes)
+
+
+# ==========================================
+# LIVE STATE
+# ==========================================
+
+def jsonable(value):
+    if isinstance(value, pd.Series):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (np.floating, float)):
+        return round(float(value), 2)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class IngestService:
+    """
+    Running KPIs and RFM state, updated one validated batch at a time
+    """
+
+    def __init__(self, distinct='bitmap', rejects_path=None):
+        self.distinct = distinct
+        self.kpis = StreamingKPIs(distinct)
+        self.state = empty_state()
+        self.metadata = {'watermark': None, 'id_widths': {}, 'rows_merged': 0}
+        self.transaction_ids = CustomerBitmap()
+        self.rejects_path = rejects_path
+        self.rejected = dict.fromkeys(REJECT_REASONS, 0)
+        self.batches = 0
+        self.rows = 0
+        self.latencies = deque(maxlen=1000)
+        self.last_batch_at = None
+        self.requests = 0
+        self._scored = None
+
+    def validate(self, raw):
+        """
+        (typed batch of the valid rows, reject reason per raw row or None)
+        """
+        n_rows = raw.num_rows
+        reasons = np.full(n_rows, None, dtype=object)
+
+        missing = np.zeros(n_rows, dtype=bool)
+        for column in raw.columns:
+            missing |= column.is_null().to_numpy(zero_copy_only=False)
+        reasons[missing] = 'missing_values'
+        invalid = np.zeros(n_rows, dtype=bool)
+        for column in ID_COLUMNS:
+            invalid_ids = id_keys(raw.column(column))[1]
+            if invalid_ids is not None:
+                invalid |= invalid_ids & ~missing
+        reasons[invalid] = 'invalid_id'
+        out_of_range = np.zeros(n_rows, dtype=bool)
+        for column, (low, high) in VALUE_RANGES.items():
+            values = raw.column(column).to_numpy(zero_copy_only=False)
+            with np.errstate(invalid='ignore'):
+                out_of_range |= ~((values >= low) & (values <= high))
+        out_of_range &= ~missing & ~invalid
+        reasons[out_of_range] = 'out_of_range'
+        complete = np.flatnonzero(~missing & ~invalid & ~out_of_range)
+        if not len(complete):
+            return None, reasons
+
+        table = raw.take(pa.array(complete)).combine_chunks()
+        batch = typed_batch(table.to_batches()[0], self.metadata['id_widths'])
+
+        quantity = batch.column('quantity').to_numpy().astype(np.int64)
+        unit_price = batch.column('unit_price').to_numpy().astype(np.int64)
+        revenue_ok = quantity * unit_price == batch.column('revenue').to_numpy()
+
+        ids = batch.column('transaction_id').to_numpy().astype(np.int64)
+        repeated = np.ones(len(ids), dtype=bool)
+        repeated[np.unique(ids, return_index=True)[1]] = False
+        duplicate = repeated | self.transaction_ids.contains(ids)
+
+        reasons[complete[~revenue_ok]] = 'revenue_mismatch'
+        reasons[complete[revenue_ok & duplicate]] = 'duplicate_transaction_id'
+        valid = revenue_ok & ~duplicate
+        return batch.filter(pa.array(valid)), reasons
+
+    def apply(self, label, raw, started):
+        """
+        Validate and merge one batch; returns a summary for the log
+        """
+        with stage('ingest.batch', source=label) as record:
+            if isinstance(raw, Exception):
+                return self.reject_batch(label, 'unparseable_batch', raw, started)
+
+            batch, reasons = self.validate(raw)
+            rejected = pd.notna(reasons)
+            if rejected.any():
+                for reason, count in zip(*np.unique(reasons[rejected].astype(str), return_counts=True)):
+                    self.rejected[reason] += int(count)
+                self.write_rejects(label, [{'reason': reason, **row} for reason, row in
+                                           zip(reasons[rejected], raw.filter(pa.array(rejected)).to_pylist())])
+
+            if batch is not None and batch.num_rows:
+                # Everything that can fail runs before the service state changes,
+                # so a failed batch leaves nothing half-applied
+                ids = batch.column('transaction_id').to_numpy()
+                batch_kpis = StreamingKPIs(self.distinct).update(batch.select(KPI_COLUMNS))
+                partial = summarize_delta(batch.select(DELTA_COLUMNS).to_pandas(date_as_object=False))
+                last_date = str(pc.max(batch.column('sale_date')).as_py())
+
+                self.state = merge_state(self.state, partial)
+                self.kpis.merge(batch_kpis)
+                self.transaction_ids.update(ids)
+                self.metadata['watermark'] = max(filter(None, [self.metadata['watermark'], last_date]))
+                self.metadata['rows_merged'] += batch.num_rows
+                self._scored = None
+
+            valid_rows = 0 if batch is None else batch.num_rows
+            record['rows'] = raw.num_rows
+            self.batches += 1
+            self.rows += valid_rows
+            self.last_batch_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            seconds = time.perf_counter() - started
+            self.latencies.append(seconds)
+            return {'label': label, 'rows': valid_rows, 'rejected': int(rejected.sum()),
+                    'error': None, 'seconds': seconds}
+
+    def reject_batch(self, label, reason, error, started):
+        """
+        Count and log a whole batch as rejected; returns the summary for the log
+        """
+        self.rejected[reason] += 1
+        self.write_rejects(label, [{'reason': reason, 'error': str(error)}])
+        return {'label': label, 'rows': 0, 'rejected': None, 'error': str(error),
+                'seconds': time.perf_counter() - started}
+
+    def write_rejects(self, label, rows):
+        if not self.rejects_path or not rows:
+            return
+        with open(self.rejects_path, 'a') as f:
+            for row in rows:
+                f.write(json.dumps({'batch': label, **row}, default=str) + '\n')
+
+    def scored(self):
+        """
+        Scored and segmented RFM frame for the current state (None until scorable)
+        """
+        if self._scored is None and len(self.state):
+            try:
+                self._scored = score_state(self.state, self.metadata).set_index('customer_id')
+            except ValueError:
+                # Too few distinct values yet for five quintiles
+                return None
+        return self._scored
+
+    def health(self):
+        latencies = list(self.latencies)
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'rejected': self.rejected,
+            'customers': len(self.state),
+            'last_sale_date': self.metadata['watermark'],
+            'last_batch_at': self.last_batch_at,
+            'latency_s': {
+                'last': round(latencies[-1], 4) if latencies else None,
+                'p50': round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+                'max': round(max(latencies), 4) if latencies else None
+            },
+            'requests': self.requests
+        }
+
+    def kpi_snapshot(self):
+        if not self.kpis.transactions:
+            return {}
+        return jsonable(self.kpis.kpis())
+
+    def segment_snapshot(self):
+        rfm = self.scored()
+        if rfm is None:
+            return {'error': 'not enough customers to score yet'}
+        segments = rfm.groupby('segment').agg(customers=('recency', 'size'), revenue=('monetary', 'sum'))
+        return {segment: {'customers': int(row['customers']), 'revenue': round(float(row['revenue']), 2)}
+                for segment, row in segments.sort_values('revenue', ascending=False).iterrows()}
+
+    def customer(self, label):
+        rfm = self.scored()
+        key = customer_key(label)
+        if key is None or rfm is None or key not in rfm.index:
+            return None
+        row = rfm.loc[key]
+        width = self.metadata['id_widths'].get('customer_id')
+        return {'customer_id': format_ids(pd.Series([key]), 'customer_id', width).iloc[0],
+                **{column: jsonable(row[column]) for column in rfm.columns}}
+
+    def handle(self, method, target):
+        """
+        (status, body) for one request
+        """
+        self.requests += 1
+        if method != 'GET':
+            return 405, {'error': 'only GET is supported'}
+        path = target.split('?', 1)[0].rstrip('/')
+        if path == '/health':
+            return 200, self.health()
+        if path == '/kpis':
+            return 200, self.kpi_snapshot()
+        if path == '/segments':
+            return 200, self.segment_snapshot()
+        if path == '/snapshot':
+            return 200, {'health': self.health(), 'kpis': self.kpi_snapshot(), 'segments': self.segment_snapshot()}
+        if path.startswith('/customers/'):
+            customer = path[len('/customers/'):]
+            row = self.customer(customer)
+            if row is None:
+                return 404, {'error': f'customer {customer} not found'}
+            return 200, row
+        return 404, {'error': f'no such endpoint: {path}'}
+
+
+# ==========================================
+# SERVICE
+# ==========================================
+
+async def ingest_forever(service, source, interval=POLL_INTERVAL):
+    while True:
+        started = time.perf_counter()
+        polled = source.poll()
+        if polled is None:
+            await asyncio.sleep(interval)
+            continue
+
+        try:
+            result = service.apply(*polled, started)
+        except Exception as error:
+            # A bad batch must not end ingestion while the server keeps
+            # answering from a frozen snapshot
+            result = service.reject_batch(polled[0], 'failed_batch', repr(error), started)
+        if result['error']:
+            print(f"   ❌ {result['label']}: rejected whole batch ({result['error']})", flush=True)
+        else:
+            slow = f" ⚠️  over {LATENCY_TARGET:.0f}s" if result['seconds'] > LATENCY_TARGET else ''
+            print(f"   ✅ {result['label']}: {result['rows']:,} rows, {result['rejected']:,} rejected, "
+                  f"{result['seconds'] * 1000:.0f} ms{slow}", flush=True)
+        # Let waiting requests in between two batches
+        await asyncio.sleep(0)
+
+
+async def serve(service, source, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, interval=POLL_INTERVAL):
+    def handler(reader, writer):
+        return serve_connection(service, reader, writer)
+
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        address = unix_path
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        address = f"http://{host}:{port}"
+
+    print(f"\n🚀 Snapshots on {address}", flush=True)
+    ingester = asyncio.create_task(ingest_forever(service, source, interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        ingester.cancel()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest new transactions continuously and serve live KPIs and RFM.')
+    parser.add_argument('--watch', required=True, help='append-only CSV file or directory of CSV batch files')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a local Unix socket instead of TCP')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help=f'seconds between polls when idle (default: {POLL_INTERVAL})')
+    parser.add_argument('--max-batch-bytes', type=int, default=MAX_BATCH_BYTES,
+                        help=f'most bytes of a growing file taken per batch (default: {MAX_BATCH_BYTES})')
+    parser.add_argument('--distinct', choices=['bitmap', 'hll'], default='bitmap',
+                        help='unique customers: exact bitmap or HyperLogLog (default: bitmap)')
+    parser.add_argument('--rejects', metavar='PATH', help='append rejected rows to this JSON-lines file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("STREAMING INGESTION SERVICE")
+    print("=" * 70)
+
+    service = IngestService(args.distinct, args.rejects)
+    source = open_source(args.watch, args.max_batch_bytes)
+    kind = 'directory' if isinstance(source, BatchDirectory) else 'file'
+    print(f"\n👀 Watching {kind} {args.watch} every {args.interval}s")
+    try:
+        asyncio.run(serve(service, source, args.host, args.port, args.unix, args.interval))
+    except KeyboardInterrupt:
+        health = service.health()
+        print(f"\n👋 Stopped after {health['batches']:,} batches, {health['rows']:,} rows, "
+              f"{sum(health['rejected'].values()):,} rejected")
+
+
+if __name__ == '__main__':
+    main()
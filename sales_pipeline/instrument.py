@@ -0,0 +1,238 @@
+"""
+Stage Instrumentation
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Structured timing for the pipeline stages: wall time, CPU time,
+             rows processed and memory delta, written as JSON lines
+
+Usage:
+    PIPELINE_TRACE=trace.jsonl python -m sales_pipeline run
+    python -m sales_pipeline run --trace trace.jsonl --profile cprofile
+    python -m sales_pipeline.instrument trace.jsonl            # per-stage totals
+
+Instrumented stages:
+    pipeline.<stage>        one analysis script (eda, charts, kpi, rfm, interactive)
+    load.read               CSV or Parquet source to Arrow (CSV dates are parsed here)
+    load.to_pandas          Arrow table to the compact pandas frame
+    load.year_month         the month period derived from sale_date
+    cube.refresh            merging new rows into the cube
+    cube.aggregates         base aggregates from the cube
+    groupby.<aggregate>     each groupby of compute_base_aggregates
+    rfm.metrics / rfm.score / rfm.segment
+    chart.<chart>           drawing and savefig of one static chart
+    report.<figure>         building and write_html of one Plotly report
+    ingest.batch            validating and merging one batch in the ingestion service
+    validate                one pass of the data-quality validator
+
+Nothing is recorded unless PIPELINE_TRACE names a file. Each finished stage
+then appends one line to it, from every process (chart workers included):
+
+    {"ts": ..., "run": ..., "pid": ..., "stage": "groupby.customer_summary",
+     "parent": "pipeline.eda", "wall_s": ..., "cpu_s": ..., "rows": ...,
+     "rss_start_mb": ..., "rss_end_mb": ..., "mem_delta_mb": ..., "status": "ok"}
+
+Stages can add their own fields (source, path, ...). Memory is the resident
+set size from /proc; where that is not available the memory fields are null.
+
+PIPELINE_PROFILE=cprofile (or pyinstrument, when installed) also profiles
+the outermost stage running in each process. The profile is written to
+.pipeline_cache/profiles/ and named in the record's "profile" field; nested
+stages are part of their parent's profile.
+"""
+
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+
+TRACE_ENV = 'PIPELINE_TRACE'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+RUN_ENV = 'PIPELINE_RUN_ID'
+
+PROFILERS = ('cprofile', 'pyinstrument')
+PROFILE_DIR = os.path.join('.pipeline_cache', 'profiles')
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Names of the stages open in this process, innermost last
+_open_stages = []
+
+
+# ==========================================
+# MEASUREMENTS
+# ==========================================
+
+def rss_mb():
+    """
+    Current resident set size in MB, or None where /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except OSError:
+        return None
+
+
+def run_id():
+    """
+    Id shared by every record of one run; worker processes inherit it
+    """
+    if RUN_ENV not in os.environ:
+        os.environ[RUN_ENV] = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    return os.environ[RUN_ENV]
+
+
+def start_profiler(kind):
+    if kind == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise ImportError(f"{PROFILE_ENV}=pyinstrument needs the pyinstrument package "
+                          "(pip install pyinstrument)") from None
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def stop_profiler(kind, profiler, name):
+    """
+    Stop the profiler and write its output; returns the file written
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{run_id()}-{name}-{os.getpid()}")
+    if kind == 'cprofile':
+        profiler.disable()
+        path = base + '.prof'
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = base + '.html'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    return path
+
+
+def write_record(path, record):
+    # One write on an O_APPEND descriptor, so lines from several processes never interleave
+    line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+# ==========================================
+# STAGES
+# ==========================================
+
+@contextmanager
+def stage(name, rows=None, **fields):
+    """
+    Time the block as one stage and record it when PIPELINE_TRACE is set.
+
+    Yields the record so the block can fill in what is only known at the
+    end, e.g. record['rows'] = len(result).
+    """
+    record = {'rows': rows, **fields}
+    trace = os.environ.get(TRACE_ENV)
+    if not trace:
+        yield record
+        return
+
+    kind = os.environ.get(PROFILE_ENV)
+    if kind and kind not in PROFILERS:
+        raise ValueError(f"{PROFILE_ENV} must be one of {', '.join(PROFILERS)}, not {kind!r}")
+    profiler = start_profiler(kind) if kind and not _open_stages else None
+
+    parent = _open_stages[-1] if _open_stages else None
+    _open_stages.append(name)
+    rss_start = rss_mb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield record
+    except BaseException as error:
+        status = 'error'
+        record['error'] = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        rss_end = rss_mb()
+        _open_stages.pop()
+        if profiler is not None:
+            record['profile'] = stop_profiler(kind, profiler, name)
+        write_record(trace, {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'run': run_id(),
+            'pid': os.getpid(),
+            'stage': name,
+            'parent': parent,
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rss_start_mb': None if rss_start is None else round(rss_start, 2),
+            'rss_end_mb': None if rss_end is None else round(rss_end, 2),
+            'mem_delta_mb': None if rss_start is None or rss_end is None else round(rss_end - rss_start, 2),
+            'status': status,
+            **record
+        })
+
+
+# ==========================================
+# SUMMARY
+# ==========================================
+
+def read_trace(path, run=None):
+    """
+    Records of one run (the latest in the file by default)
+    """
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return []
+    run = run or records[-1]['run']
+    return [record for record in records if record['run'] == run]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize a stage trace written with PIPELINE_TRACE.')
+    parser.add_argument('trace', help='JSON-lines trace file')
+    parser.add_argument('--run', help='run id to summarize (default: the latest)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    records = read_trace(args.trace, args.run)
+    if not records:
+        print(f"No records in {args.trace}")
+        return
+
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record['stage'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                    'rows': 0, 'mem_delta_mb': 0.0})
+        total['calls'] += 1
+        total['wall_s'] += record['wall_s']
+        total['cpu_s'] += record['cpu_s']
+        total['rows'] += record['rows'] or 0
+        total['mem_delta_mb'] += record['mem_delta_mb'] or 0
+
+    print("=" * 70)
+    print(f"STAGE TRACE: run {records[0]['run']}")
+    print("=" * 70)
+    print(f"\n{'Stage':<36} {'Calls':>5} {'Wall (s)':>9} {'CPU (s)':>8} {'Rows':>12} {'Mem Δ (MB)':>11}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall_s']):
+        print(f"{name:<36} {total['calls']:>5} {total['wall_s']:>9.3f} {total['cpu_s']:>8.3f} "
+              f"{total['rows']:>12,} {total['mem_delta_mb']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
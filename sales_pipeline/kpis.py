@@ -0,0 +1,347 @@
+"""
+Streaming KPI Engine
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Computes the 04_kpi_calculations.py KPI summary in one pass over
+             record batches, so the history never has to fit in memory
+
+Usage:
+    python -m sales_pipeline.kpis                              # KPI summary table
+    python -m sales_pipeline.kpis --distinct hll --check       # compare with the in-memory KPIs
+
+Sums and counts are exact (integer cents). Unique customers come from an exact
+bitmap over the integer customer keys (one bit per key up to the largest seen)
+or, with distinct='hll', a HyperLogLog with 2^14 registers: 16 KB and a
+standard error of 1.04 / sqrt(2^14) ≈ 0.8%. The median order value comes from
+a KLL sketch (sales_pipeline/quantiles.py). Every accumulator can be merged,
+so partitions can be processed separately and combined.
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sales_pipeline.context import compute_base_aggregates
+from sales_pipeline.quantiles import KLLSketch
+from sales_pipeline.schema import CENTS_PER_DOLLAR, to_dollars
+from sales_pipeline.storage import PARTITION_COLUMN, iter_batches, load_sales
+
+KPI_COLUMNS = ['product_category', 'customer_id', 'quantity', 'revenue', PARTITION_COLUMN]
+
+HLL_PRECISION = 14
+MEDIAN_SKETCH_K = 1000
+
+
+# ==========================================
+# SUMMARY TABLE
+# ==========================================
+
+def kpi_summary_table(total_revenue, total_transactions, unique_customers, aov,
+                      avg_customer_value, avg_items_per_transaction, single_item_pct, avg_growth):
+    """
+    The KPI summary table printed at the end of 04_kpi_calculations.py
+    """
+    return pd.DataFrame({
+        'KPI': [
+            'Total Revenue',
+            'Total Transactions',
+            'Unique Customers',
+            'Average Order Value',
+            'Avg Customer Value',
+            'Avg Items/Transaction',
+            'Single-Item Transaction %',
+            'Avg Monthly Growth %'
+        ],
+        'Value': [
+            f'${total_revenue:,.2f}',
+            f'{total_transactions:,}',
+            f'{unique_customers:,}',
+            f'${aov:,.2f}',
+            f'${avg_customer_value:,.2f}',
+            f'{avg_items_per_transaction:.2f}',
+            f'{single_item_pct:.1f}%',
+            f'{avg_growth:.2f}%'
+        ],
+        'Business Use': [
+            'Overall performance benchmark',
+            'Volume indicator',
+            'Market penetration metric',
+            'Upselling target',
+            'CAC comparison baseline',
+            'Cross-sell effectiveness',
+            'Bundling opportunity indicator',
+            'Growth momentum tracker'
+        ]
+    })
+
+
+def derive_kpis(kpis):
+    """
+    Ratios and growth built from the base KPI values (in-memory or streamed)
+    """
+    monthly_growth = kpis['monthly_revenue'].pct_change() * 100
+    return {
+        **kpis,
+        'avg_customer_value': kpis['total_revenue'] / kpis['unique_customers'],
+        'single_item_pct': kpis['single_item_transactions'] / kpis['total_transactions'] * 100,
+        'monthly_growth': monthly_growth,
+        'avg_growth': monthly_growth.mean()
+    }
+
+
+def summary_from_kpis(kpis):
+    kpis = derive_kpis(kpis)
+    return kpi_summary_table(
+        kpis['total_revenue'], kpis['total_transactions'], kpis['unique_customers'],
+        kpis['revenue_mean'], kpis['avg_customer_value'], kpis['quantity_mean'],
+        kpis['single_item_pct'], kpis['avg_growth'])
+
+
+# ==========================================
+# DISTINCT COUNTERS
+# ==========================================
+
+class CustomerBitmap:
+    """
+    Exact distinct count of integer keys: one bit per possible key
+    """
+
+    def __init__(self):
+        self.bits = np.zeros(0, dtype=np.uint8)
+
+    def update(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return self
+        needed = int(keys.max()) // 8 + 1
+        if needed > len(self.bits):
+            # Grow geometrically so a rising key range is not reallocated every batch
+            grown = np.zeros(max(needed, 2 * len(self.bits)), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        np.bitwise_or.at(self.bits, keys >> 3, (1 << (keys & 7)).astype(np.uint8))
+        return self
+
+    def contains(self, keys):
+        """
+        Boolean array: which keys have been seen
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        found = np.zeros(len(keys), dtype=bool)
+        in_range = keys >> 3 < len(self.bits)
+        found[in_range] = (self.bits[keys[in_range] >> 3] >> (keys[in_range] & 7)) & 1 == 1
+        return found
+
+    def merge(self, other):
+        if len(other.bits) > len(self.bits):
+            self.bits, other_bits = other.bits.copy(), self.bits
+        else:
+            other_bits = other.bits
+        self.bits[:len(other_bits)] |= other_bits
+        return self
+
+    def count(self):
+        return int(np.unpackbits(self.bits).sum())
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+def hash64(keys):
+    """
+    SplitMix64 finalizer: well-mixed 64-bit hashes of integer keys
+    """
+    z = np.asarray(keys).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count in constant memory (2^precision one-byte registers)
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, keys):
+        if not len(keys):
+            return self
+        hashes = hash64(keys)
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Position of the leftmost 1 bit in the suffix; suffixes < 2^53 convert to float exactly
+        bit_length = np.frexp(suffix.astype(np.float64))[1]
+        np.maximum.at(self.registers, index, (suffix_bits - bit_length + 1).astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLogs with different precision "
+                             f"({self.precision} vs {other.precision})")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting over the empty registers
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
+
+
+# ==========================================
+# STREAMING ENGINE
+# ==========================================
+
+class StreamingKPIs:
+    """
+    One-pass accumulator for the KPI summary; feed it Arrow record batches
+    with KPI_COLUMNS and read the result with kpis()
+    """
+
+    def __init__(self, distinct='bitmap', median_k=MEDIAN_SKETCH_K):
+        self.transactions = 0
+        self.revenue_cents = 0
+        self.quantity = 0
+        self.single_item = 0
+        self.monthly_cents = {}
+        self.category_cents = {}
+        self.customers = HyperLogLog() if distinct == 'hll' else CustomerBitmap()
+        self.order_values = KLLSketch(median_k)
+
+    def update(self, batch):
+        revenue = batch.column('revenue')
+        quantity = batch.column('quantity')
+        self.transactions += batch.num_rows
+        self.revenue_cents += pc.sum(revenue).as_py() or 0
+        self.quantity += pc.sum(quantity).as_py() or 0
+        self.single_item += pc.sum(pc.equal(quantity, 1)).as_py() or 0
+        # Missing customer IDs are not a customer, as in pandas nunique
+        self.customers.update(pc.drop_null(batch.column('customer_id')).to_numpy())
+        self.order_values.update(revenue.to_numpy())
+
+        table = pa.Table.from_batches([batch])
+        for key, totals in [(PARTITION_COLUMN, self.monthly_cents),
+                            ('product_category', self.category_cents)]:
+            grouped = table.group_by(key).aggregate([('revenue', 'sum')]).to_pydict()
+            for group, cents in zip(grouped[key], grouped['revenue_sum']):
+                totals[group] = totals.get(group, 0) + cents
+        return self
+
+    def merge(self, other):
+        self.transactions += other.transactions
+        self.revenue_cents += other.revenue_cents
+        self.quantity += other.quantity
+        self.single_item += other.single_item
+        for totals, other_totals in [(self.monthly_cents, other.monthly_cents),
+                                     (self.category_cents, other.category_cents)]:
+            for group, cents in other_totals.items():
+                totals[group] = totals.get(group, 0) + cents
+        self.customers.merge(other.customers)
+        self.order_values.merge(other.order_values)
+        return self
+
+    def kpis(self):
+        """
+        The KPI values 04_kpi_calculations.py reads from the analysis context
+        """
+        monthly = pd.Series(self.monthly_cents, dtype=np.int64).sort_index()
+        monthly.index = pd.PeriodIndex(monthly.index, freq='M', name='year_month')
+        category = pd.Series(self.category_cents, dtype=np.int64)
+        category.index.name = 'product_category'
+        return {
+            'total_revenue': to_dollars(self.revenue_cents),
+            'total_transactions': self.transactions,
+            'unique_customers': self.customers.count(),
+            'revenue_mean': self.revenue_cents / self.transactions / CENTS_PER_DOLLAR,
+            'revenue_median': float(self.order_values.quantile(0.5)) / CENTS_PER_DOLLAR,
+            'quantity_mean': self.quantity / self.transactions,
+            'single_item_transactions': self.single_item,
+            'monthly_revenue': to_dollars(monthly.rename('revenue')),
+            'category_revenue': to_dollars(category.rename('revenue')).sort_values(ascending=False)
+        }
+
+
+def stream_kpis(source=None, distinct='bitmap', batch_size=1_000_000):
+    """
+    KPI values from one pass over the source, one record batch at a time
+    """
+    engine = StreamingKPIs(distinct)
+    for batch, _ in iter_batches(source, KPI_COLUMNS, batch_size):
+        engine.update(batch)
+    return engine
+
+
+# ==========================================
+# CHECK AGAINST THE IN-MEMORY KPIS
+# ==========================================
+
+def compare_kpis(streamed, exact):
+    """
+    Rows of (KPI, streamed, in-memory, relative difference)
+    """
+    streamed, exact = derive_kpis(streamed), derive_kpis(exact)
+    rows = []
+    for key in ['total_revenue', 'total_transactions', 'unique_customers', 'revenue_mean',
+                'revenue_median', 'avg_customer_value', 'quantity_mean', 'single_item_pct', 'avg_growth']:
+        a, b = float(streamed[key]), float(exact[key])
+        rows.append((key, a, b, abs(a - b) / abs(b) if b else abs(a)))
+    for key in ['monthly_revenue', 'category_revenue']:
+        a, b = streamed[key], exact[key].reindex(streamed[key].index)
+        rows.append((key, float(a.sum()), float(b.sum()), float((a - b).abs().max() / b.abs().max())))
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compute the KPI summary in one streaming pass.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--distinct', choices=['bitmap', 'hll'], default='bitmap',
+                        help='unique customers: exact bitmap or HyperLogLog (default: bitmap)')
+    parser.add_argument('--batch-size', type=int, default=1_000_000)
+    parser.add_argument('--check', action='store_true',
+                        help='also load the data in memory and compare every KPI')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("STREAMING KPI ENGINE")
+    print("=" * 70)
+
+    engine = stream_kpis(args.source, args.distinct, args.batch_size)
+    streamed = engine.kpis()
+    print(f"\n📦 {engine.transactions:,} transactions in one pass "
+          f"(customers: {args.distinct}, {engine.customers.nbytes / 1024:,.1f} KB; "
+          f"median sketch: {engine.order_values.nbytes / 1024:,.1f} KB)\n")
+    print(summary_from_kpis(streamed).to_string(index=False))
+
+    if args.check:
+        df = load_sales(args.source)
+        df['year_month'] = df['sale_date'].dt.to_period('M')
+        exact = compute_base_aggregates(df)
+
+        print(f"\n{'KPI':<26} {'Streaming':>18} {'In-memory':>18} {'Rel. diff':>10}")
+        for key, a, b, diff in compare_kpis(streamed, exact):
+            print(f"{key:<26} {a:>18,.4f} {b:>18,.4f} {diff:>9.4%} {'✅' if diff == 0 else '≈'}")
+
+
+if __name__ == '__main__':
+    main()
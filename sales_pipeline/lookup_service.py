@@ -0,0 +1,196 @@
+"""
+RFM Customer Lookup Service
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Small asyncio HTTP service answering single-customer RFM
+             lookups from the memory-mapped customer index
+
+Usage:
+    python -m sales_pipeline.lookup_service                       # http://127.0.0.1:8765
+    python -m sales_pipeline.lookup_service --port 9000
+    python -m sales_pipeline.lookup_service --unix /tmp/rfm.sock  # local socket instead of TCP
+
+Endpoints:
+    GET /customers/CUST0042    the customer's RFM row as JSON (404 if unknown)
+    GET /health                customer count and snapshot time of the loaded index
+
+    curl http://127.0.0.1:8765/customers/CUST0042
+    curl --unix-socket /tmp/rfm.sock http://localhost/customers/CUST0042
+
+Connections are kept alive between requests. The index file is checked every
+--reload-interval seconds; when 05_rfm_analysis.py has published a new
+snapshot, it is opened and swapped in between two requests. Lookups in
+flight finish on the snapshot they started with.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from sales_pipeline.customer_index import DEFAULT_INDEX, CustomerIndex
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+RELOAD_INTERVAL = 1.0
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class LookupService:
+    """
+    Holds the current index and swaps in new snapshots as they are published
+    """
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = path
+        self.index = CustomerIndex(path)
+        self.requests = 0
+        self.reloads = 0
+
+    def _published_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.index.version
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self):
+        """
+        Open a newly published snapshot; returns True if one was swapped in
+        """
+        if self._published_version() == self.index.version:
+            return False
+        index = CustomerIndex(self.path)
+        # A single assignment: every request sees either the old index or the new one.
+        # The old map is released once nothing refers to it any more.
+        self.index = index
+        self.reloads += 1
+        return True
+
+    def handle(self, method, target):
+        """
+        (status, body) for one request
+        """
+        self.requests += 1
+        if method != 'GET':
+            return 405, {'error': 'only GET is supported'}
+        path = target.split('?', 1)[0].rstrip('/')
+        if path == '/health':
+            index = self.index
+            return 200, {'customers': len(index), 'snapshot': index.header['created'],
+                         'requests': self.requests, 'reloads': self.reloads}
+        if path.startswith('/customers/'):
+            customer = path[len('/customers/'):]
+            row = self.index.lookup(customer)
+            if row is None:
+                return 404, {'error': f'customer {customer} not found'}
+            return 200, row
+        return 404, {'error': f'no such endpoint: {path}'}
+
+
+def http_response(status, body, keep_alive):
+    payload = json.dumps(body).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('ascii') + payload
+
+
+async def serve_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip().lower()
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                writer.write(http_response(400, {'error': 'malformed request line'}, False))
+                break
+            method, target, version = parts
+            keep_alive = headers.get('connection') != 'close' and version != 'HTTP/1.0'
+            status, body = service.handle(method, target)
+            writer.write(http_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionResetError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def watch_index(service, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if service.reload_if_changed():
+                print(f"   🔄 Reloaded {service.path}: {len(service.index):,} customers, "
+                      f"snapshot {service.index.header['created']}", flush=True)
+        except (OSError, ValueError) as error:
+            # Keep serving the previous snapshot
+            print(f"   ⚠️  Could not reload {service.path}: {error}", flush=True)
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, interval=RELOAD_INTERVAL):
+    def handler(reader, writer):
+        return serve_connection(service, reader, writer)
+
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+        address = unix_path
+    else:
+        server = await asyncio.start_server(handler, host, port)
+        address = f"http://{host}:{port}"
+
+    print(f"\n🚀 Serving {len(service.index):,} customers on {address}", flush=True)
+    watcher = asyncio.create_task(watch_index(service, interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve RFM customer lookups over HTTP.')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f'index file (default: {DEFAULT_INDEX})')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a local Unix socket instead of TCP')
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help=f'seconds between checks for a new snapshot (default: {RELOAD_INTERVAL})')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("RFM CUSTOMER LOOKUP SERVICE")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    service = LookupService(args.index)
+    print(f"\n📇 Opened {args.index} in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(snapshot {service.index.header['created']})")
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix, args.reload_interval))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()
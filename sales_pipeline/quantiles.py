@@ -0,0 +1,156 @@
+"""
+Streaming Quantile Sketches
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: KLL quantile sketch for computing quantile boundaries in one
+             pass with bounded memory; sketches built on separate partitions
+             can be merged
+
+Error bound:
+    A KLL sketch with parameter k answers rank and quantile queries with a
+    normalized rank error of about 2.3 / k^0.97 (99% confidence), independent
+    of the number of values seen: roughly 1.3% for the default k=200 and
+    0.35% for k=800. A quantile estimate for q is a value whose true rank lies
+    within q ± eps. The figures are the published ones for KLL (Karnin, Lang
+    and Liberty, 2016; Apache DataSketches); benchmarks/compare_rfm_quantiles.py
+    measures the observed error of this implementation.
+
+    Memory is about 3k retained values (8 bytes each) plus O(log n) levels.
+"""
+
+import math
+
+import numpy as np
+
+DEFAULT_K = 200
+
+# Each level below the top holds 2/3 the capacity of the level above it
+CAPACITY_DECAY = 2 / 3
+
+
+def rank_error_bound(k=DEFAULT_K):
+    """
+    Normalized rank error of a KLL sketch with parameter k (99% confidence)
+    """
+    return 2.296 / k ** 0.9723
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch over float64 values.
+
+    Level h holds values that each stand for 2^h inputs. When the sketch is
+    over capacity, the lowest full level is sorted and every other value
+    (random offset) is promoted to the next level with twice the weight.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def retained(self):
+        return sum(len(level) for level in self.levels)
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * CAPACITY_DECAY ** depth))
+
+    def _compact(self, level):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        items = np.sort(self.levels[level])
+        # An odd item out stays behind so the total weight is preserved
+        keep = items[:len(items) % 2]
+        promoted = items[len(keep) + self._rng.integers(2)::2]
+        self.levels[level] = keep
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def _compress(self):
+        while self.retained > sum(self._capacity(h) for h in range(len(self.levels))):
+            level = next(h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h))
+            self._compact(level)
+
+    def update(self, values):
+        """
+        Add an array of values (NaNs are ignored)
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch (e.g. from a different partition) into this one
+        """
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with different k ({self.k} vs {other.k})")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _sorted_view(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def rank(self, values, inclusive=False):
+        """
+        Estimated number of inputs below each value (or at/below, if inclusive)
+        """
+        sorted_values, cumulative = self._sorted_view()
+        idx = np.searchsorted(sorted_values, np.asarray(values, dtype=np.float64),
+                              side='right' if inclusive else 'left')
+        return np.where(idx > 0, cumulative[np.maximum(idx - 1, 0)], 0)
+
+    def quantile(self, quantiles):
+        """
+        Estimated quantiles with linear interpolation, like np.quantile.
+
+        While nothing has been compacted the sketch still holds every input
+        and the answer is exact.
+        """
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if self.n == 0:
+            return np.full(quantiles.shape, np.nan)
+        if len(self.levels) == 1:
+            # np.quantile keeps the shape of quantiles: a scalar gives a scalar
+            return np.quantile(self.levels[0], quantiles)
+
+        sorted_values, cumulative = self._sorted_view()
+        position = quantiles * (self.n - 1)
+        lower = np.floor(position)
+        # The value at 0-based rank r is the first one whose cumulative weight exceeds r
+        below = sorted_values[np.searchsorted(cumulative, lower, side='right')]
+        above = sorted_values[np.minimum(
+            np.searchsorted(cumulative, np.minimum(lower + 1, self.n - 1), side='right'),
+            len(sorted_values) - 1)]
+        estimate = below + (position - lower) * (above - below)
+        estimate = np.where(quantiles <= 0, self.min, estimate)
+        return np.where(quantiles >= 1, self.max, estimate)
@@ -0,0 +1,242 @@
+"""
+RFM Scoring and Segmentation Engine
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Vectorized recency / frequency / monetary metrics, 1-5 scores
+             and segment assignment for any number of customers
+
+score_rfm is exact: pd.qcut over the whole customer table. score_rfm_streaming
+is the bounded-memory alternative: quintile boundaries come from mergeable KLL
+sketches (sales_pipeline/quantiles.py) and customers are scored chunk by chunk.
+"""
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.instrument import stage
+from sales_pipeline.quantiles import DEFAULT_K, KLLSketch
+from sales_pipeline.schema import to_dollars
+
+# ==========================================
+# SEGMENT RULES
+# ==========================================
+
+SEGMENTS = [
+    'Champions',
+    'Loyal Customers',
+    'Potential Loyalists',
+    'At Risk',
+    "Can't Lose Them",
+    'Hibernating',
+    'New Customers',
+    'Promising',
+    'Others'
+]
+
+
+def segment_customer(r, f, m):
+    """
+    Assign customer segment based on RFM scores
+
+    This is the reference rule chain; the vectorized path looks its answers
+    up in SEGMENT_TABLE, which is built from this function.
+    """
+    # Champions: Best customers
+    if r >= 4 and f >= 4 and m >= 4:
+        return 'Champions'
+
+    # Loyal Customers: Buy frequently, spend well
+    elif f >= 4 and m >= 4:
+        return 'Loyal Customers'
+
+    # Potential Loyalists: Recent buyers with potential
+    elif r >= 4 and f >= 2:
+        return 'Potential Loyalists'
+
+    # At Risk: Good customers who haven't bought recently
+    elif r <= 2 and f >= 3 and m >= 3:
+        return 'At Risk'
+
+    # Can't Lose Them: High-value customers at risk
+    elif r <= 2 and m >= 4:
+        return "Can't Lose Them"
+
+    # Hibernating: Inactive customers
+    elif r <= 2 and f <= 2:
+        return 'Hibernating'
+
+    # New Customers: Recent first-time buyers
+    elif r >= 4 and f <= 2:
+        return 'New Customers'
+
+    # Promising: New with potential
+    elif r >= 3 and f == 1:
+        return 'Promising'
+
+    else:
+        return 'Others'
+
+
+def build_segment_table():
+    """
+    Segment code for every (R, F, M) score combination, indexed [r, f, m] (1-5)
+    """
+    table = np.zeros((6, 6, 6), dtype=np.int8)
+    for r in range(1, 6):
+        for f in range(1, 6):
+            for m in range(1, 6):
+                table[r, f, m] = SEGMENTS.index(segment_customer(r, f, m))
+    return table
+
+
+SEGMENT_TABLE = build_segment_table()
+
+
+# ==========================================
+# METRICS AND SCORES
+# ==========================================
+
+def rfm_from_summary(customer_summary, reference_date):
+    """
+    RFM metrics from a per-customer summary (frequency, monetary, last_purchase),
+    such as AnalysisContext.customer_summary
+    """
+    with stage('rfm.metrics', rows=len(customer_summary)):
+        return pd.DataFrame({
+            'customer_id': customer_summary.index,
+            'recency': (reference_date - customer_summary['last_purchase']).dt.days.to_numpy(),  # Recency
+            'frequency': customer_summary['frequency'].to_numpy(),  # Frequency
+            'monetary': customer_summary['monetary'].to_numpy()  # Monetary
+        })
+
+
+def compute_rfm(df, reference_date=None):
+    """
+    RFM metrics straight from transactions, using only native groupby reductions
+    """
+    if reference_date is None:
+        reference_date = df['sale_date'].max() + pd.Timedelta(days=1)
+    summary = df.groupby('customer_id').agg(
+        frequency=('transaction_id', 'count'),
+        monetary=('revenue', 'sum'),
+        last_purchase=('sale_date', 'max')
+    )
+    summary['monetary'] = to_dollars(summary['monetary'])
+    return rfm_from_summary(summary, reference_date)
+
+
+def score_rfm(rfm):
+    """
+    Add R_score, F_score, M_score (quintiles, 1-5) and the combined RFM_score
+    """
+    with stage('rfm.score', rows=len(rfm)):
+        rfm = rfm.copy()
+
+        # Recency: lower is better (bought recently)
+        rfm['R_score'] = pd.qcut(rfm['recency'], q=5, labels=[5, 4, 3, 2, 1])
+
+        # Frequency: higher is better
+        rfm['F_score'] = pd.qcut(rfm['frequency'].rank(method='first'), q=5, labels=[1, 2, 3, 4, 5])
+
+        # Monetary: higher is better
+        rfm['M_score'] = pd.qcut(rfm['monetary'], q=5, labels=[1, 2, 3, 4, 5])
+
+        # Convert to numeric
+        rfm['R_score'] = rfm['R_score'].astype(int)
+        rfm['F_score'] = rfm['F_score'].astype(int)
+        rfm['M_score'] = rfm['M_score'].astype(int)
+
+        # Combined RFM score
+        rfm['RFM_score'] = rfm['R_score'] + rfm['F_score'] + rfm['M_score']
+        return rfm
+
+
+def assign_segments(r_score, f_score, m_score):
+    """
+    Vectorized segment assignment: one table lookup per customer.
+
+    Returns a Categorical over SEGMENTS with the same labels as segment_customer.
+    """
+    codes = SEGMENT_TABLE[np.asarray(r_score), np.asarray(f_score), np.asarray(m_score)]
+    return pd.Categorical.from_codes(codes, categories=SEGMENTS)
+
+
+def segment_rfm(rfm):
+    """
+    Add the segment column to a scored RFM frame
+    """
+    with stage('rfm.segment', rows=len(rfm)):
+        rfm = rfm.copy()
+        codes = assign_segments(rfm['R_score'], rfm['F_score'], rfm['M_score']).codes
+        rfm['segment'] = np.array(SEGMENTS, dtype=object)[codes]
+        return rfm
+
+
+# ==========================================
+# STREAMING (APPROXIMATE) SCORES
+# ==========================================
+
+# The same quintile points pd.qcut(q=5) uses, including its nextafter nudge
+QUINTILES = np.linspace(0, 1, 6)
+np.putmask(QUINTILES, 5 * QUINTILES != np.arange(6), np.nextafter(QUINTILES, 1))
+
+
+def rfm_sketches(rfm, k=DEFAULT_K, seed=None):
+    """
+    One KLL sketch per RFM metric for a chunk of customers
+    """
+    return {metric: KLLSketch(k, seed).update(rfm[metric].to_numpy())
+            for metric in ['recency', 'frequency', 'monetary']}
+
+
+def merge_sketches(sketches, other):
+    """
+    Combine the sketches of two partitions (in place, returns the first)
+    """
+    for metric, sketch in sketches.items():
+        sketch.merge(other[metric])
+    return sketches
+
+
+def quintile_scores(values, edges):
+    """
+    0-4 bin index with pd.qcut's right-closed bins (lowest edge included)
+    """
+    return np.searchsorted(edges[1:-1], values, side='left')
+
+
+def score_rfm_streaming(chunks, sketches):
+    """
+    Score customer chunks against sketch quintile boundaries.
+
+    chunks is an iterable of RFM frames in the same order pd.qcut would see
+    them; sketches come from rfm_sketches / merge_sketches over all of them.
+    F_score ranks frequency like rank(method='first'): the sketch estimates
+    how many customers buy less often, and ties are broken by arrival order
+    with one counter per distinct frequency value.
+
+    Yields scored chunks with the same columns as score_rfm.
+    """
+    n = sketches['frequency'].n
+    recency_edges = sketches['recency'].quantile(QUINTILES)
+    monetary_edges = sketches['monetary'].quantile(QUINTILES)
+    rank_edges = 1 + QUINTILES * (n - 1)
+    seen = {}
+
+    for chunk in chunks:
+        chunk = chunk.copy()
+        frequency = chunk['frequency'].to_numpy()
+
+        # Position of each customer among its ties, continuing across chunks
+        values, inverse, counts = np.unique(frequency, return_inverse=True, return_counts=True)
+        earlier = np.array([seen.get(value, 0) for value in values], dtype=np.int64)
+        ties = pd.Series(frequency).groupby(frequency).cumcount().to_numpy() + earlier[inverse]
+        for value, count in zip(values, earlier + counts):
+            seen[value] = count
+        rank = sketches['frequency'].rank(frequency) + ties + 1
+
+        chunk['R_score'] = 5 - quintile_scores(chunk['recency'].to_numpy(), recency_edges)
+        chunk['F_score'] = quintile_scores(rank, rank_edges) + 1
+        chunk['M_score'] = quintile_scores(chunk['monetary'].to_numpy(), monetary_edges) + 1
+        chunk['RFM_score'] = chunk['R_score'] + chunk['F_score'] + chunk['M_score']
+        yield chunk
@@ -0,0 +1,294 @@
+"""
+Incremental RFM Updates
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Keeps per-customer RFM state (last purchase, purchase count,
+             monetary sum) in a persistent store and folds in only the
+             transactions that arrived after the last watermark
+
+Usage:
+    python -m sales_pipeline.rfm_incremental                     # catch up from sales_data.parquet
+    python -m sales_pipeline.rfm_incremental --delta day.csv     # merge one day's batch
+    python -m sales_pipeline.rfm_incremental --rebuild           # recompute state from full history
+
+The watermark is the last sale_date already merged; batches are whole days,
+so any row dated on or before the watermark is treated as already counted.
+That is only right while the source is appended to, so a refresh first
+checks it the way the cube does (storage.appended_only) and rebuilds the
+state from the full history when it was rewritten, e.g. regenerated. A
+batch merged with --delta that the main source does not also contain is
+dropped by the next refresh from that source.
+Reading new rows from the Parquet dataset prunes every month partition
+before the watermark, so reading a batch costs time proportional to the new
+volume. Folding it into the state and re-deriving the quintile scores are
+proportional to the number of customers, never to the transaction history.
+"""
+
+import argparse
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from sales_pipeline.customer_index import write_index
+from sales_pipeline.quantiles import DEFAULT_K
+from sales_pipeline.rfm import (merge_sketches, rfm_from_summary, rfm_sketches, score_rfm,
+                                score_rfm_streaming, segment_rfm)
+from sales_pipeline.schema import format_ids, to_dollars
+from sales_pipeline.storage import (appended_only, as_date, default_source, fingerprint_digest, load_sales,
+                                   source_fingerprint)
+
+DEFAULT_STATE = 'rfm_state.parquet'
+DEFAULT_OUTPUT = 'rfm_customer_segments.csv'
+SCORE_CHUNK_SIZE = 1_000_000
+
+STATE_COLUMNS = ['frequency', 'monetary_cents', 'last_purchase']
+DELTA_COLUMNS = ['transaction_id', 'sale_date', 'customer_id', 'revenue']
+
+
+# ==========================================
+# STATE STORE
+# ==========================================
+
+def empty_state():
+    state = pd.DataFrame({
+        'frequency': pd.Series(dtype=np.int64),
+        'monetary_cents': pd.Series(dtype=np.int64),
+        'last_purchase': pd.Series(dtype='datetime64[ms]')
+    })
+    state.index = pd.Index([], dtype=np.uint32, name='customer_id')
+    return state
+
+
+def empty_metadata():
+    return {'watermark': None, 'id_widths': {}, 'rows_merged': 0}
+
+
+def load_state(path=DEFAULT_STATE):
+    """
+    Returns (state, metadata); metadata holds the watermark, ID widths and
+    the source (path, fingerprint, manifest) the state was refreshed from
+    """
+    if not os.path.exists(path):
+        return empty_state(), empty_metadata()
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[b'rfm_state'])
+    state = table.to_pandas(date_as_object=False).set_index('customer_id')
+    return state[STATE_COLUMNS], metadata
+
+
+def save_state(state, metadata, path=DEFAULT_STATE):
+    """
+    Write the state atomically, so a crashed run never leaves a half-written store
+    """
+    table = pa.Table.from_pandas(state.reset_index(), preserve_index=False)
+    table = table.replace_schema_metadata({b'rfm_state': json.dumps(metadata).encode()})
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# ==========================================
+# MERGE
+# ==========================================
+
+def summarize_delta(delta):
+    """
+    Per-customer partial state for a batch of transactions
+    """
+    summary = delta.groupby('customer_id').agg(
+        frequency=('transaction_id', 'count'),
+        monetary_cents=('revenue', 'sum'),
+        last_purchase=('sale_date', 'max')
+    )
+    summary['frequency'] = summary['frequency'].astype(np.int64)
+    summary['monetary_cents'] = summary['monetary_cents'].astype(np.int64)
+    return summary
+
+
+def merge_state(state, partial):
+    """
+    Fold a per-customer partial into the state.
+
+    Existing customers are updated by index lookup and new ones appended.
+    Both the membership test and the append pass over the whole state, so a
+    merge is O(customers) per batch (about 0.1 s at 2 million customers);
+    it never touches the transaction history.
+    """
+    if partial.empty:
+        return state
+    known = partial.index.isin(state.index)
+
+    updates = partial[known]
+    if len(updates):
+        current = state.loc[updates.index]
+        state.loc[updates.index, 'frequency'] = current['frequency'] + updates['frequency']
+        state.loc[updates.index, 'monetary_cents'] = current['monetary_cents'] + updates['monetary_cents']
+        state.loc[updates.index, 'last_purchase'] = np.maximum(
+            current['last_purchase'].to_numpy(), updates['last_purchase'].to_numpy())
+
+    new = partial[~known]
+    if len(new):
+        state = pd.concat([state, new[STATE_COLUMNS]]) if len(state) else new[STATE_COLUMNS].copy()
+    return state
+
+
+def read_new_transactions(watermark, source=None, delta_path=None):
+    """
+    Transactions dated after the watermark, from a delta batch or the main dataset
+    """
+    start = None if watermark is None else as_date(watermark) + datetime.timedelta(days=1)
+    return load_sales(delta_path or source, columns=DELTA_COLUMNS, start=start)
+
+
+def apply_delta(state, metadata, delta):
+    """
+    Merge a batch of transactions into the state and advance the watermark
+    """
+    if metadata['watermark'] is not None:
+        delta = delta[delta['sale_date'] > pd.Timestamp(metadata['watermark'])]
+    if delta.empty:
+        return state, metadata, 0
+
+    state = merge_state(state, summarize_delta(delta))
+    widths = metadata.get('id_widths', {})
+    for column, width in delta.attrs.get('id_widths', {}).items():
+        widths[column] = max(widths.get(column, 0), width)
+
+    metadata = {
+        **metadata,
+        'watermark': str(delta['sale_date'].max().date()),
+        'id_widths': widths,
+        'rows_merged': metadata.get('rows_merged', 0) + len(delta)
+    }
+    return state, metadata, len(delta)
+
+
+def refresh_state(state, metadata, source):
+    """
+    Merge the source's transactions after the watermark; returns (state,
+    metadata, rows merged). Unless the source was only appended to since
+    the last refresh, the state is rebuilt from the full history.
+    """
+    fingerprint = source_fingerprint(source)
+    # appended_only compares the rows up to the watermark with metadata['rows']
+    appended, manifest = appended_only(source, fingerprint, {**metadata, 'rows': metadata.get('rows_merged')})
+    if not appended:
+        state, metadata = empty_state(), empty_metadata()
+    delta = read_new_transactions(metadata['watermark'], source)
+    state, metadata, merged = apply_delta(state, metadata, delta)
+    metadata = {**metadata, 'source': source, 'fingerprint': fingerprint_digest(fingerprint), 'manifest': manifest}
+    return state, metadata, merged
+
+
+# ==========================================
+# RE-SCORE
+# ==========================================
+
+def state_rfm(state, metadata):
+    """
+    Unscored RFM metrics for every customer in the state
+    """
+    reference_date = pd.Timestamp(metadata['watermark']) + pd.Timedelta(days=1)
+    summary = pd.DataFrame({
+        'frequency': state['frequency'],
+        'monetary': to_dollars(state['monetary_cents']),
+        'last_purchase': state['last_purchase']
+    }).sort_index()
+    return rfm_from_summary(summary, reference_date)
+
+
+def score_state(state, metadata, sketch_k=None):
+    """
+    R/F/M quintile scores and segments for every customer in the state.
+
+    With sketch_k, quintile boundaries come from KLL sketches built per chunk
+    and merged, instead of an exact qcut over all customers.
+    """
+    rfm = state_rfm(state, metadata)
+    if sketch_k is None:
+        return segment_rfm(score_rfm(rfm))
+
+    chunks = [rfm.iloc[i:i + SCORE_CHUNK_SIZE] for i in range(0, len(rfm), SCORE_CHUNK_SIZE)]
+    sketches = rfm_sketches(chunks[0], sketch_k)
+    for chunk in chunks[1:]:
+        merge_sketches(sketches, rfm_sketches(chunk, sketch_k))
+    return pd.concat([segment_rfm(chunk) for chunk in score_rfm_streaming(chunks, sketches)])
+
+
+def index_path(output):
+    return os.path.splitext(output)[0] + '.idx'
+
+
+def export_segments(rfm, metadata, output=DEFAULT_OUTPUT):
+    """
+    Write the segments CSV and publish the matching customer index next to it
+    """
+    rfm_export = rfm.assign(customer_id=format_ids(
+        rfm['customer_id'], 'customer_id', metadata['id_widths'].get('customer_id')))
+    rfm_export.to_csv(output, index=False)
+    write_index(rfm, index_path(output), id_width=metadata['id_widths'].get('customer_id'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Incrementally update RFM state and segments.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--delta', help='CSV or Parquet batch of new transactions to merge')
+    parser.add_argument('--state', default=DEFAULT_STATE, help=f'state store (default: {DEFAULT_STATE})')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'segments CSV (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--rebuild', action='store_true', help='discard the state and rebuild from full history')
+    parser.add_argument('--approximate', action='store_true',
+                        help='score with streaming quantile sketches instead of exact quintiles')
+    parser.add_argument('--sketch-k', type=int, default=DEFAULT_K,
+                        help=f'sketch size for --approximate (default: {DEFAULT_K})')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 70)
+    print("INCREMENTAL RFM UPDATE")
+    print("=" * 70)
+
+    if args.rebuild:
+        state, metadata = empty_state(), empty_metadata()
+    else:
+        state, metadata = load_state(args.state)
+    print(f"\n📦 State: {len(state):,} customers, watermark {metadata['watermark'] or '(none)'}")
+
+    previous = metadata
+    if args.delta:
+        delta = read_new_transactions(metadata['watermark'], delta_path=args.delta)
+        state, metadata, merged = apply_delta(state, metadata, delta)
+        if merged:
+            # The main source no longer describes the state; the next refresh re-checks it
+            metadata['fingerprint'] = None
+    else:
+        state, metadata, merged = refresh_state(state, metadata, args.source or default_source())
+
+    if metadata != previous:
+        save_state(state, metadata, args.state)
+    if merged == 0:
+        print("   ✅ No new transactions since the watermark")
+        if metadata['watermark'] is None:
+            return
+    else:
+        print(f"   ✅ Merged {merged:,} new transactions → {len(state):,} customers, "
+              f"watermark {metadata['watermark']}")
+
+    rfm = score_state(state, metadata, args.sketch_k if args.approximate else None)
+    export_segments(rfm, metadata, args.output)
+    print(f"\n🏷️  Re-scored {len(rfm):,} customers"
+          + (f" (approximate quintiles, k={args.sketch_k})" if args.approximate else ""))
+    for segment, count in rfm['segment'].value_counts().items():
+        print(f"   {segment}: {count:,}")
+    print(f"\n💾 Saved: {args.output}, {index_path(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Canonical Sales Schema
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Compact in-memory dtypes for the sales frame, shared by the
+             generator, the Parquet store and every analysis script
+
+Compared to the CSV as read by pd.read_csv (object strings and int64 numbers),
+the compact schema stores:
+    - transaction_id / customer_id as uint32 (numeric part of 'TXN00001' / 'CUST0001')
+    - product / product_category as categoricals
+    - quantity as uint8
+    - unit_price / revenue as int32 cents
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+COLUMNS = ['transaction_id', 'sale_date', 'product', 'product_category',
+           'customer_id', 'quantity', 'unit_price', 'revenue']
+
+ID_COLUMNS = {'transaction_id': 'TXN', 'customer_id': 'CUST'}
+CATEGORY_COLUMNS = ['product', 'product_category']
+MONEY_COLUMNS = ['unit_price', 'revenue']
+
+# Money is held as integer cents; CSV files and reports stay in dollars
+CENTS_PER_DOLLAR = 100
+
+pandas_dtypes = {
+    'transaction_id': 'uint32',
+    'sale_date': 'datetime64[ms]',
+    'product': 'category',
+    'product_category': 'category',
+    'customer_id': 'uint32',
+    'quantity': 'uint8',
+    'unit_price': 'int32',
+    'revenue': 'int32'
+}
+
+arrow_schema = pa.schema([
+    ('transaction_id', pa.uint32()),
+    ('sale_date', pa.date32()),
+    ('product', pa.dictionary(pa.int32(), pa.string())),
+    ('product_category', pa.dictionary(pa.int8(), pa.string())),
+    ('customer_id', pa.uint32()),
+    ('quantity', pa.uint8()),
+    ('unit_price', pa.int32()),
+    ('revenue', pa.int32())
+])
+
+
+# ==========================================
+# IDS
+# ==========================================
+
+def parse_ids(labels, column):
+    """
+    'CUST0001' → 1, as uint32
+    """
+    prefix = ID_COLUMNS[column]
+    return pd.Series(labels).str[len(prefix):].astype(np.uint32).to_numpy()
+
+
+def customer_key(customer):
+    """
+    Integer key for 'CUST0042', '42' or 42; None if it is not a customer ID
+    """
+    text = str(customer).strip().upper()
+    prefix = ID_COLUMNS['customer_id']
+    if text.startswith(prefix):
+        text = text[len(prefix):]
+    if not text.isdigit() or int(text) > np.iinfo(np.uint32).max:
+        return None
+    return int(text)
+
+
+def format_ids(values, column, width=None):
+    """
+    Rebuild 'CUST0001'-style labels from the integer keys.
+
+    values is a pandas Series or Index; width is the zero-padded digit count
+    (see the id_widths attribute of frames returned by load_sales).
+    """
+    return ID_COLUMNS[column] + values.astype(str).str.zfill(width or 4)
+
+
+# ==========================================
+# MONEY
+# ==========================================
+
+def to_cents(dollars):
+    return np.round(np.asarray(dollars, dtype=np.float64) * CENTS_PER_DOLLAR).astype(np.int32)
+
+
+def to_dollars(cents):
+    """
+    Cents → dollars for reporting.
+
+    Whole-dollar amounts stay integers so reports and exported CSVs look the
+    same as before money moved to cents; anything else becomes float.
+    """
+    if isinstance(cents, (pd.Series, pd.DataFrame, np.ndarray)):
+        if (np.asarray(cents) % CENTS_PER_DOLLAR == 0).all():
+            return cents // CENTS_PER_DOLLAR
+        return cents / CENTS_PER_DOLLAR
+    if cents % CENTS_PER_DOLLAR == 0:
+        return int(cents) // CENTS_PER_DOLLAR
+    return cents / CENTS_PER_DOLLAR
+
+
+# ==========================================
+# CONVERSION
+# ==========================================
+
+def compact_frame(df):
+    """
+    Convert a frame in the CSV layout (as from pd.read_csv) to the compact schema
+    """
+    compact = pd.DataFrame(index=df.index)
+    for column in COLUMNS:
+        values = df[column]
+        if column in ID_COLUMNS:
+            values = parse_ids(values, column) if values.dtype.kind not in 'iu' else values
+        elif column in MONEY_COLUMNS:
+            values = to_cents(values)
+        elif column == 'sale_date':
+            values = pd.to_datetime(values)
+        compact[column] = pd.Series(values, index=df.index).astype(pandas_dtypes[column])
+    compact.attrs = dict(df.attrs)
+    return compact
+
+
+def csv_frame(df, id_widths=None):
+    """
+    Inverse of compact_frame: string IDs and dollar amounts, as written to CSV
+    """
+    id_widths = id_widths or df.attrs.get('id_widths', {})
+    out = pd.DataFrame(index=df.index)
+    for column in COLUMNS:
+        values = df[column]
+        if column in ID_COLUMNS:
+            values = format_ids(values, column, id_widths.get(column))
+        elif column in MONEY_COLUMNS:
+            values = to_dollars(values.astype(np.int64))
+        elif column in CATEGORY_COLUMNS:
+            values = values.astype(str)
+        elif column == 'quantity':
+            values = values.astype(np.int64)
+        out[column] = values
+    return out
+
+
+# ==========================================
+# MEMORY REPORT
+# ==========================================
+
+def memory_report(df, sample_rows=100_000):
+    """
+    Bytes per row of the compact frame vs the same rows in the CSV layout.
+
+    The CSV-layout size is measured on a sample (object strings are costly to
+    build) and extrapolated to the full frame.
+    """
+    n_rows = len(df)
+    compact_bytes = int(df[COLUMNS].memory_usage(deep=True, index=False).sum())
+    sample = df[COLUMNS].head(sample_rows)
+    legacy = csv_frame(sample).astype({c: object for c in ID_COLUMNS}
+                                      | {c: object for c in CATEGORY_COLUMNS})
+    legacy_per_row = float(legacy.memory_usage(deep=True, index=False).sum()) / max(len(sample), 1)
+    legacy_bytes = int(legacy_per_row * n_rows)
+    return {
+        'rows': n_rows,
+        'compact_bytes': compact_bytes,
+        'legacy_bytes': legacy_bytes,
+        'compact_bytes_per_row': compact_bytes / max(n_rows, 1),
+        'legacy_bytes_per_row': legacy_per_row,
+        'saved_bytes': legacy_bytes - compact_bytes,
+        'saved_pct': (1 - compact_bytes / legacy_bytes) * 100 if legacy_bytes else 0.0
+    }
@@ -0,0 +1,337 @@
+"""
+Embedded SQL Runner
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Runs the named queries in sql_queries.sql against the sales
+             dataset in an embedded SQLite database, with cached results and
+             per-query timings
+
+Usage:
+    python -m sales_pipeline.sql --list
+    python -m sales_pipeline.sql                        # every query
+    python -m sales_pipeline.sql --queries 1 4 8 --show
+    python -m sales_pipeline.sql --compare-pandas       # time SQL against the pandas version
+
+sql_queries.sql is written for MySQL. Before running a query, the few MySQL
+functions it uses are rewritten to SQLite (DATE_FORMAT, DATE_SUB ... INTERVAL,
+YEAR, QUARTER; CONCAT is registered as a function). CURDATE() is anchored to
+the last sale date in the data, so "recent period" queries stay meaningful on
+a historical snapshot; --today overrides it.
+
+The queries run against the indexed warehouse of sales_pipeline.warehouse.
+The database and each query result are cached in .pipeline_cache/sql/ and
+reused until the source data changes.
+"""
+
+import argparse
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.schema import CENTS_PER_DOLLAR, ID_COLUMNS, format_ids
+from sales_pipeline.storage import fingerprint_digest, load_sales
+from sales_pipeline.warehouse import DATABASE_FILE, connect, print_duplicates
+
+QUERIES_FILE = 'sql_queries.sql'
+SQL_CACHE_DIR = os.path.join('.pipeline_cache', 'sql')
+RESULTS_DIR = os.path.join(SQL_CACHE_DIR, 'results')
+
+# The warehouse view the queries read; it joins the fact and product tables
+TABLE = 'sales_transactions'
+
+
+# ==========================================
+# QUERY FILE
+# ==========================================
+
+QUERY_HEADER = re.compile(r'^-- QUERY (\d+): (.+)$', re.MULTILINE)
+
+
+def read_queries(path=QUERIES_FILE):
+    """
+    {number: (title, sql)} for every '-- QUERY N: Title' block in the file
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    headers = list(QUERY_HEADER.finditer(text))
+    queries = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        body = text[header.end():following.start() if following else len(text)]
+        statement = '\n'.join(line for line in body.splitlines() if not line.strip().startswith('--'))
+        queries[int(header.group(1))] = (header.group(2).strip(), statement.strip().rstrip(';').strip())
+    return queries
+
+
+def to_sqlite(sql, today):
+    """
+    Rewrite the MySQL date functions used in sql_queries.sql for SQLite
+    """
+    sql = re.sub(r'CURDATE\(\)', f"'{today}'", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"DATE_FORMAT\(([^(),]+),\s*('[^']*')\)", r'strftime(\2, \1)', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'DATE_SUB\(([^(),]+),\s*INTERVAL\s+(\d+)\s+DAY\)', r"date(\1, '-\2 days')", sql,
+                 flags=re.IGNORECASE)
+    sql = re.sub(r'\bYEAR\(([^()]+)\)', r"CAST(strftime('%Y', \1) AS INTEGER)", sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bQUARTER\(([^()]+)\)', r"((CAST(strftime('%m', \1) AS INTEGER) + 2) / 3)", sql,
+                 flags=re.IGNORECASE)
+    return sql
+
+
+def sql_concat(*values):
+    return ''.join('' if value is None else str(value) for value in values)
+
+
+# ==========================================
+# DATABASE
+# ==========================================
+
+def open_database(source=None, rebuild=False):
+    """
+    Connection to the warehouse (see sales_pipeline.warehouse) with the
+    functions the rewritten queries need; returns (connection, metadata, rebuilt)
+    """
+    conn, metadata, rebuilt = connect(source, rebuild=rebuild)
+    conn.create_function('CONCAT', -1, sql_concat, deterministic=True)
+    return conn, metadata, rebuilt
+
+
+# ==========================================
+# RUN
+# ==========================================
+
+def label_ids(result, id_widths):
+    for column in ID_COLUMNS:
+        if column in result.columns:
+            result[column] = format_ids(result[column], column, id_widths.get(column))
+    return result
+
+
+def run_query(conn, metadata, sql, today=None, use_cache=True):
+    """
+    Run one query; returns (result, seconds, cached)
+    """
+    today = today or metadata['last_date']
+    sqlite_sql = to_sqlite(sql, today)
+    key = fingerprint_digest((metadata['fingerprint'], sqlite_sql))[:24]
+    cache_path = os.path.join(RESULTS_DIR, f'{key}.pkl')
+
+    start = time.perf_counter()
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f), time.perf_counter() - start, True
+
+    result = label_ids(pd.read_sql_query(sqlite_sql, conn), metadata['id_widths'])
+    seconds = time.perf_counter() - start
+    if use_cache:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return result, seconds, False
+
+
+# ==========================================
+# PANDAS EQUIVALENTS
+# ==========================================
+
+def _summary(grouped, **columns):
+    # ROUND(AVG(x), 2) in the SQL
+    result = grouped.agg(**columns).reset_index()
+    averages = [column for column in result.columns if str(column).startswith('avg_')]
+    result[averages] = result[averages].round(2)
+    return result
+
+
+def pandas_queries(df, today):
+    """
+    The same reports in pandas, keyed by query number, for benchmarking.
+    df is the compact frame from load_sales; money is in dollars in the results.
+    """
+    df = df.assign(revenue=df['revenue'] / CENTS_PER_DOLLAR)
+    today = pd.Timestamp(today)
+
+    def customer_segment(total):
+        return np.select([total >= 5000, total >= 2000, total >= 500],
+                         ['VIP', 'High-Value', 'Regular'], 'Occasional')
+
+    def q7():
+        totals = df.groupby('customer_id')['revenue'].sum()
+        return _summary(totals.groupby(customer_segment(totals.to_numpy())),
+                        customer_count='count', segment_revenue='sum',
+                        avg_customer_value='mean') \
+            .rename(columns={'index': 'customer_segment'}) \
+            .sort_values('segment_revenue', ascending=False)
+
+    def q8():
+        dates = df['sale_date'].dt
+        result = _summary(df.groupby([dates.year.rename('year'), dates.quarter.rename('q')]),
+                          total_transactions=('transaction_id', 'count'),
+                          unique_customers=('customer_id', 'nunique'),
+                          quarterly_revenue=('revenue', 'sum'),
+                          avg_order_value=('revenue', 'mean'))
+        quarter = 'Q' + result['q'].astype(str) + ' ' + result['year'].astype(str)
+        return result.drop(columns=['year', 'q']).assign(quarter=quarter)[['quarter'] + list(result.columns[2:])]
+
+    def q9():
+        basket = np.select([df['quantity'] == 1, df['quantity'] <= 3], ['Single Item', '2-3 Items'], '4+ Items')
+        return _summary(df.groupby(pd.Series(basket, name='basket_size', index=df.index)),
+                        transaction_count=('transaction_id', 'count'),
+                        total_revenue=('revenue', 'sum'),
+                        avg_order_value=('revenue', 'mean')) \
+            .sort_values('transaction_count', ascending=False)
+
+    recent = df[df['sale_date'] >= today - pd.Timedelta(days=30)]
+    return {
+        1: lambda: _summary(df.groupby('product', observed=True),
+                            total_transactions=('transaction_id', 'count'),
+                            total_units_sold=('quantity', 'sum'),
+                            total_revenue=('revenue', 'sum'),
+                            avg_transaction_value=('revenue', 'mean'))
+        .nlargest(10, 'total_revenue'),
+        2: lambda: _summary(df.groupby(df['sale_date'].dt.to_period('M').astype(str).rename('year_month')),
+                            transactions=('transaction_id', 'count'),
+                            total_revenue=('revenue', 'sum'),
+                            avg_order_value=('revenue', 'mean')),
+        3: lambda: _summary(df.groupby('customer_id'),
+                            purchase_frequency=('transaction_id', 'count'),
+                            total_items_purchased=('quantity', 'sum'),
+                            total_revenue=('revenue', 'sum'),
+                            avg_order_value=('revenue', 'mean'),
+                            first_purchase_date=('sale_date', 'min'),
+                            last_purchase_date=('sale_date', 'max'))
+        .nlargest(20, 'total_revenue'),
+        4: lambda: _summary(df.groupby('product_category', observed=True),
+                            unique_customers=('customer_id', 'nunique'),
+                            total_transactions=('transaction_id', 'count'),
+                            total_units_sold=('quantity', 'sum'),
+                            total_revenue=('revenue', 'sum'),
+                            avg_transaction_value=('revenue', 'mean'),
+                            avg_items_per_transaction=('quantity', 'mean'))
+        .sort_values('total_revenue', ascending=False),
+        5: lambda: _summary(recent.groupby('sale_date'),
+                            daily_transactions=('transaction_id', 'count'),
+                            daily_revenue=('revenue', 'sum'),
+                            avg_order_value=('revenue', 'mean'))
+        .sort_values('sale_date', ascending=False),
+        6: lambda: _summary(df.groupby(['product_category', 'product'], observed=True),
+                            transactions=('transaction_id', 'count'),
+                            product_revenue=('revenue', 'sum'))
+        .sort_values(['product_category', 'product_revenue'], ascending=[True, False]),
+        7: q7,
+        8: q8,
+        9: q9,
+        10: lambda: pd.DataFrame([{
+            'total_customers': df['customer_id'].nunique(),
+            'total_transactions': len(df),
+            'total_items_sold': int(df['quantity'].sum()),
+            'total_revenue': df['revenue'].sum(),
+            'avg_order_value': round(df['revenue'].mean(), 2),
+            'first_transaction_date': df['sale_date'].min(),
+            'last_transaction_date': df['sale_date'].max()
+        }])
+    }
+
+
+def same_values(sql_result, pandas_result):
+    """
+    True when both results hold the same rows, matched on the first (key)
+    column; numbers agree to the cent, since SQLite and Python round
+    half-cents differently
+    """
+    if sql_result.shape != pandas_result.shape:
+        return False
+
+    def normalized(frame):
+        frame = frame.copy()
+        frame.columns = range(len(frame.columns))
+        for column in frame.columns:
+            if pd.api.types.is_datetime64_any_dtype(frame[column]):
+                frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+            elif not pd.api.types.is_numeric_dtype(frame[column]):
+                frame[column] = frame[column].astype(str)
+        return frame.sort_values(0).reset_index(drop=True)
+
+    sql_result, pandas_result = normalized(sql_result), normalized(pandas_result)
+    for column in sql_result.columns:
+        a, b = sql_result[column], pandas_result[column]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            if not np.allclose(a.astype(np.float64), b.astype(np.float64), rtol=0, atol=0.011):
+                return False
+        elif not a.astype(str).equals(b.astype(str)):
+            return False
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run sql_queries.sql against the sales dataset.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--file', default=QUERIES_FILE, help=f'query file (default: {QUERIES_FILE})')
+    parser.add_argument('--queries', type=int, nargs='+', help='query numbers to run (default: all)')
+    parser.add_argument('--today', help='date CURDATE() stands for (default: last sale date)')
+    parser.add_argument('--no-cache', action='store_true', help='always execute, never read or write cached results')
+    parser.add_argument('--show', action='store_true', help='print each result')
+    parser.add_argument('--list', action='store_true', help='list the named queries and exit')
+    parser.add_argument('--compare-pandas', action='store_true',
+                        help='also run the pandas version of each report and compare timings and results')
+    args = parser.parse_args(argv)
+    if args.queries:
+        valid = list(read_queries(args.file))
+        unknown = [number for number in args.queries if number not in valid]
+        if unknown:
+            parser.error(f"unknown query number(s) {', '.join(map(str, unknown))} in {args.file} "
+                         f"(valid: {', '.join(map(str, valid))})")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    queries = read_queries(args.file)
+
+    if args.list:
+        for number, (title, _) in queries.items():
+            print(f"{number:>3}. {title}")
+        return
+
+    print("=" * 70)
+    print("SQL QUERIES")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    conn, metadata, rebuilt = open_database(args.source)
+    print(f"\n🗄️  Database: {DATABASE_FILE} "
+          f"({'loaded in' if rebuilt else 'reused,'} {time.perf_counter() - start:.2f}s)")
+    print_duplicates(metadata)
+
+    pandas_reports = {}
+    if args.compare_pandas:
+        pandas_reports = pandas_queries(load_sales(args.source), args.today or metadata['last_date'])
+        print(f"\n{'#':>3} {'Query':<44} {'Rows':>6} {'SQL (ms)':>10} {'pandas (ms)':>12}  Match")
+    else:
+        print(f"\n{'#':>3} {'Query':<44} {'Rows':>6} {'Time (ms)':>10}")
+
+    for number in args.queries or list(queries):
+        title, sql = queries[number]
+        result, seconds, cached = run_query(conn, metadata, sql, args.today, use_cache=not args.no_cache)
+        line = f"{number:>3} {title[:44]:<44} {len(result):>6} {seconds * 1000:>10.1f}"
+        if not args.compare_pandas:
+            line += '  (cached)' if cached else ''
+        elif number in pandas_reports:
+            pandas_start = time.perf_counter()
+            expected = pandas_reports[number]()
+            pandas_ms = (time.perf_counter() - pandas_start) * 1000
+            expected = label_ids(expected, metadata['id_widths'])
+            match = '✅' if same_values(result, expected) else '❌'
+            line += f" {pandas_ms:>12.1f}  {match}{'  (SQL cached)' if cached else ''}"
+        print(line)
+        if args.show:
+            print(result.to_string(index=False), end='\n\n')
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
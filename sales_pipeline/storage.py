@@ -0,0 +1,454 @@
+"""
+Columnar Storage for the Sales Dataset
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Reads and writes sales transactions as a Parquet dataset
+             partitioned by year_month, with typed columns
+
+Usage:
+    python -m sales_pipeline.storage sales_data.csv sales_data.parquet
+    python -m sales_pipeline.storage sales_shards/ sales_data.parquet
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from sales_pipeline.instrument import stage
+from sales_pipeline.schema import CENTS_PER_DOLLAR, ID_COLUMNS, MONEY_COLUMNS, arrow_schema
+
+DEFAULT_CSV = 'sales_data.csv'
+DEFAULT_DATASET = 'sales_data.parquet'
+
+PARTITION_COLUMN = 'year_month'
+
+# Read size when hashing CSV files for the append checks
+DIGEST_CHUNK_SIZE = 8 << 20
+
+# ==========================================
+# SCHEMA
+# ==========================================
+
+# Keys keep only the numeric part of 'TXN00001' / 'CUST0001'; the zero-padded
+# width is kept in the dataset metadata so the original IDs can be rebuilt.
+ID_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+sales_schema = arrow_schema
+
+# Money is parsed as float so CSVs with cents also convert
+csv_column_types = {
+    'transaction_id': pa.string(),
+    'sale_date': pa.date32(),
+    'product': pa.string(),
+    'product_category': pa.string(),
+    'customer_id': pa.string(),
+    'quantity': pa.int64(),
+    'unit_price': pa.float64(),
+    'revenue': pa.float64()
+}
+
+# Empty fields read as nulls in every column (string columns otherwise read
+# them as ''), so the quality checks see them as missing
+null_convert_options = pacsv.ConvertOptions(column_types=csv_column_types, strings_can_be_null=True)
+
+
+def id_widths_metadata(widths):
+    return {f'{column}_width'.encode(): str(width).encode() for column, width in widths.items()}
+
+
+# ==========================================
+# CSV → TYPED ARROW
+# ==========================================
+
+def _numeric_key(column):
+    digits = pc.utf8_ltrim(column, characters=ID_LETTERS)
+    return digits, pc.max(pc.utf8_length(digits)).as_py() or 0
+
+
+def year_month_keys(dates):
+    """
+    'YYYY-MM' string per date. strftime is slow per row, so each distinct
+    date is formatted once and the strings are taken back out by index.
+    """
+    encoded = pc.dictionary_encode(dates)
+    return pc.take(pc.strftime(encoded.dictionary, format='%Y-%m'), encoded.indices)
+
+
+def typed_batch(batch, widths=None):
+    """
+    Convert one raw CSV record batch to sales_schema plus the year_month key.
+
+    widths is updated in place with the widest zero-padded ID seen so far.
+    """
+    columns = {}
+    for name in sales_schema.names:
+        column = batch.column(name)
+        target = sales_schema.field(name).type
+        if name in ID_COLUMNS:
+            digits, width = _numeric_key(column)
+            try:
+                column = pc.cast(digits, target)
+            except pa.ArrowInvalid:
+                # Empty or non-numeric IDs become null, so they reach the
+                # quality checks as missing instead of failing the load
+                column = pc.cast(pc.if_else(pc.utf8_is_digit(digits), digits, None), target)
+            if widths is not None:
+                widths[name] = max(widths.get(name, 0), width)
+        elif name in MONEY_COLUMNS:
+            column = pc.cast(pc.round(pc.multiply(column, CENTS_PER_DOLLAR)), target)
+        elif pa.types.is_dictionary(target):
+            column = pc.cast(pc.dictionary_encode(column), target)
+        else:
+            column = pc.cast(column, target)
+        columns[name] = column
+    columns[PARTITION_COLUMN] = year_month_keys(columns['sale_date'])
+    return pa.record_batch(list(columns.values()), names=list(columns))
+
+
+def iter_csv_batches(csv_paths, block_size=64 << 20, convert_options=None):
+    """
+    Stream raw record batches from one or more CSV files without loading them whole
+    """
+    convert_options = convert_options or null_convert_options
+    read_options = pacsv.ReadOptions(block_size=block_size)
+    for path in csv_paths:
+        with pacsv.open_csv(path, read_options=read_options,
+                            convert_options=convert_options) as reader:
+            for batch in reader:
+                yield batch
+
+
+def csv_inputs(source):
+    """
+    A CSV file, or a directory of shards written by 01_generate_dataset.py --output-dir
+    """
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '*.csv')))
+    return [source]
+
+
+# ==========================================
+# WRITE
+# ==========================================
+
+def convert_csv_to_parquet(source=DEFAULT_CSV, dataset_path=DEFAULT_DATASET):
+    """
+    One-shot conversion of the CSV (or CSV shards) into the partitioned Parquet dataset.
+
+    Batches are streamed through, so memory stays bounded for large inputs.
+    Returns the number of rows written.
+    """
+    widths = {}
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        for batch in iter_csv_batches(csv_inputs(source)):
+            rows += batch.num_rows
+            yield typed_batch(batch, widths)
+
+    # Widths are only known after the scan, so they go into a _common_metadata
+    # sidecar written once the data files are done.
+    write_schema = sales_schema.append(pa.field(PARTITION_COLUMN, pa.string()))
+    ds.write_dataset(
+        batches(),
+        dataset_path,
+        schema=write_schema,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive'),
+        existing_data_behavior='delete_matching',
+        basename_template='part-{i}.parquet',
+        max_rows_per_group=1 << 20
+    )
+
+    pq.write_metadata(sales_schema.with_metadata(id_widths_metadata(widths)),
+                      os.path.join(dataset_path, '_common_metadata'))
+    return rows
+
+
+# ==========================================
+# READ
+# ==========================================
+
+def default_source():
+    return DEFAULT_DATASET if os.path.isdir(DEFAULT_DATASET) else DEFAULT_CSV
+
+
+def source_fingerprint(source):
+    """
+    Cheap identity of the input data: path, size and mtime of every file
+    """
+    paths = sorted(glob.glob(os.path.join(source, '**', '*'), recursive=True)) \
+        if os.path.isdir(source) else [source]
+    return tuple(
+        (os.path.relpath(path, source) if os.path.isdir(source) else path,
+         os.path.getsize(path), os.path.getmtime(path))
+        for path in paths if os.path.isfile(path)
+    )
+
+
+def fingerprint_digest(fingerprint):
+    """
+    Short stable key for a source_fingerprint, for cache metadata and file names
+    """
+    return hashlib.sha256(repr(fingerprint).encode()).hexdigest()
+
+
+def open_dataset(dataset_path=DEFAULT_DATASET):
+    return ds.dataset(
+        dataset_path,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive'),
+        exclude_invalid_files=False,
+        ignore_prefixes=['_', '.']
+    )
+
+
+def read_id_widths(dataset_path=DEFAULT_DATASET):
+    metadata_path = os.path.join(dataset_path, '_common_metadata')
+    if not os.path.exists(metadata_path):
+        return {}
+    metadata = pq.read_schema(metadata_path).metadata or {}
+    return {column: int(metadata[f'{column}_width'.encode()])
+            for column in ID_COLUMNS if f'{column}_width'.encode() in metadata}
+
+
+def as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def build_filter(months=None, start=None, end=None):
+    """
+    Row filter for load_sales.
+
+    Conditions on year_month are resolved from the directory names alone,
+    so partitions outside the requested months are never opened.
+    """
+    conditions = []
+    if months is not None:
+        conditions.append(ds.field(PARTITION_COLUMN).isin([str(m) for m in months]))
+    if start is not None:
+        start = as_date(start)
+        conditions.append(ds.field(PARTITION_COLUMN) >= start.strftime('%Y-%m'))
+        conditions.append(ds.field('sale_date') >= start)
+    if end is not None:
+        end = as_date(end)
+        conditions.append(ds.field(PARTITION_COLUMN) <= end.strftime('%Y-%m'))
+        conditions.append(ds.field('sale_date') <= end)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_table(source=None, columns=None, months=None, start=None, end=None):
+    """
+    Read the sales data as a typed Arrow table.
+
+    source defaults to sales_data.parquet when it exists and sales_data.csv
+    otherwise; a CSV source is typed on the fly with the same schema.
+    columns projects the read, months / start / end prune partitions.
+    Returns (table, id_widths).
+    """
+    if source is None:
+        source = default_source()
+
+    expression = build_filter(months, start, end)
+
+    if os.path.isdir(source) and not glob.glob(os.path.join(source, '*.csv')):
+        dataset = open_dataset(source)
+        table = dataset.to_table(columns=columns or sales_schema.names, filter=expression)
+        return table, read_id_widths(source)
+
+    widths = {}
+    batches = [typed_batch(batch, widths) for batch in iter_csv_batches(csv_inputs(source))]
+    if not batches:
+        # A header-only CSV still yields a (typed, empty) table
+        batches = [typed_batch(pa.RecordBatch.from_pylist([], schema=pa.schema(csv_column_types)))]
+    table = pa.Table.from_batches(batches)
+    if expression is not None:
+        table = table.filter(expression)
+    return table.select(columns or sales_schema.names), widths
+
+
+def iter_batches(source=None, columns=None, batch_size=1_000_000, block_size=1 << 20):
+    """
+    Stream the sales data as typed Arrow record batches.
+
+    Parquet is read batch_size rows at a time. CSV is read in block_size
+    byte blocks; the Arrow CSV reader buffers a few dozen blocks ahead, so
+    small blocks are what keeps memory flat regardless of file size.
+    Yields (batch, id_widths); for a CSV source the widths grow as IDs are seen.
+    """
+    if source is None:
+        source = default_source()
+    columns = columns or sales_schema.names
+
+    if os.path.isdir(source) and not glob.glob(os.path.join(source, '*.csv')):
+        widths = read_id_widths(source)
+        for batch in open_dataset(source).to_batches(columns=columns, batch_size=batch_size):
+            yield batch, widths
+        return
+
+    widths = {}
+    for batch in iter_csv_batches(csv_inputs(source), block_size):
+        yield typed_batch(batch, widths).select(columns), widths
+
+
+def load_sales(source=None, columns=None, months=None, start=None, end=None):
+    """
+    Read the sales data as a pandas DataFrame in the compact schema
+    (see sales_pipeline.schema): datetime64 sale_date, categorical product /
+    product_category, uint32 keys, uint8 quantity and int32 cents for money.
+
+    A key column with missing IDs comes back as nullable UInt32 instead of
+    float, so per-customer groupbys skip those rows as they did before.
+    """
+    source = source or default_source()
+    with stage('load.read', source=source) as record:
+        table, widths = load_table(source, columns, months, start, end)
+        record['rows'] = table.num_rows
+    with stage('load.to_pandas', rows=table.num_rows):
+        df = table.to_pandas(date_as_object=False)
+    for name in ID_COLUMNS:
+        if name in df and table.column(name).null_count:
+            df[name] = df[name].astype('UInt32')
+    df.attrs['id_widths'] = widths
+    return df
+
+
+# ==========================================
+# APPEND CHECKS
+# ==========================================
+
+def file_digests(path, prefix_size=None):
+    """
+    SHA-256 of a file, and of its first prefix_size bytes when given, in one read
+    """
+    digest, prefix = hashlib.sha256(), None
+    with open(path, 'rb') as f:
+        if prefix_size is not None:
+            for chunk in iter(lambda: f.read(min(DIGEST_CHUNK_SIZE, prefix_size - f.tell())), b''):
+                digest.update(chunk)
+            prefix = digest.hexdigest()
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest(), prefix
+
+
+def source_manifest(source, fingerprint, previous=None):
+    """
+    {file: [size, mtime, sha256]} for a source_fingerprint, and the files
+    rewritten since the previous manifest.
+
+    Only CSV files get a SHA-256 (of their whole content). A file counts as
+    rewritten when it is gone, or changed without being a CSV that only grew
+    and still starts with the bytes hashed before. Unchanged files keep their
+    previous entry, so only new and changed files are read.
+    """
+    previous = previous or {}
+    manifest, rewritten = {}, []
+    for name, size, mtime in fingerprint:
+        old = previous.get(name)
+        if old is not None and old[:2] == [size, mtime]:
+            manifest[name] = old
+            continue
+        digest = None
+        if name.endswith('.csv'):
+            path = os.path.join(source, name) if os.path.isdir(source) else name
+            grown = old is not None and old[2] is not None and size > old[0]
+            digest, prefix = file_digests(path, old[0] if grown else None)
+            if old is not None and (prefix is None or prefix != old[2]):
+                rewritten.append(name)
+        elif old is not None:
+            rewritten.append(name)
+        manifest[name] = [size, mtime, digest]
+    rewritten += [name for name in previous if name not in manifest]
+    return manifest, rewritten
+
+
+def partition_month(name):
+    """
+    year_month of a file inside a partitioned dataset, or None
+    """
+    for part in name.split(os.sep):
+        if part.startswith(PARTITION_COLUMN + '='):
+            return part.split('=', 1)[1]
+    return None
+
+
+def rows_through(source, end, df=None):
+    """
+    Rows of the source dated up to end (inclusive); df, when given, is
+    counted instead of reading the source
+    """
+    end = as_date(end)
+    if df is not None:
+        return int((df['sale_date'] <= datetime.datetime.combine(end, datetime.time())).sum())
+    if os.path.isdir(source) and not glob.glob(os.path.join(source, '*.csv')):
+        return open_dataset(source).count_rows(filter=build_filter(end=end))
+    options = pacsv.ConvertOptions(column_types={'sale_date': pa.date32()}, include_columns=['sale_date'])
+    rows = 0
+    for batch in iter_csv_batches(csv_inputs(source), convert_options=options):
+        rows += pc.sum(pc.less_equal(batch.column('sale_date'), pa.scalar(end, pa.date32()))).as_py() or 0
+    return rows
+
+
+def appended_only(source, fingerprint, metadata, df=None):
+    """
+    Whether source has only gained rows since the refresh that wrote
+    metadata (the source, manifest, watermark and rows kept by the cube and
+    the cohort state); returns (appended, manifest of the source now).
+
+    It has when every file of the earlier manifest is unchanged, is a CSV
+    that only grew (see source_manifest), or is a Parquet file in the
+    watermark's month partition or later, and the rows dated up to the
+    watermark still number metadata['rows']. Anything else, such as a
+    regenerated CSV or a changed older partition, means history was rewritten.
+    """
+    manifest, rewritten = source_manifest(source, fingerprint, metadata.get('manifest'))
+    if metadata.get('source') != source or metadata.get('manifest') is None:
+        return False, manifest
+    if metadata['watermark'] is None:
+        return True, manifest
+    month = as_date(metadata['watermark']).strftime('%Y-%m')
+    for name in rewritten:
+        # Sidecars such as _common_metadata hold no rows
+        if not os.path.basename(name).startswith(('_', '.')) and (partition_month(name) or '') < month:
+            return False, manifest
+    return rows_through(source, metadata['watermark'], df) == metadata['rows'], manifest
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convert sales_data.csv (or a directory of CSV shards) to a partitioned Parquet dataset.')
+    parser.add_argument('source', nargs='?', default=DEFAULT_CSV,
+                        help=f'CSV file or shard directory (default: {DEFAULT_CSV})')
+    parser.add_argument('dataset', nargs='?', default=DEFAULT_DATASET,
+                        help=f'output dataset directory (default: {DEFAULT_DATASET})')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"📦 Converting {args.source} → {args.dataset} (partitioned by {PARTITION_COLUMN})...")
+    rows = convert_csv_to_parquet(args.source, args.dataset)
+    partitions = len(glob.glob(os.path.join(args.dataset, f'{PARTITION_COLUMN}=*')))
+    print(f"   ✅ {rows:,} rows written to {partitions} partitions")
+
+
+if __name__ == '__main__':
+    main()
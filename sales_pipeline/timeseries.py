@@ -0,0 +1,307 @@
+"""
+Daily Revenue Time Series
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Day-level revenue, transaction and customer series with rolling
+             windows, moving averages and week-over-week / year-over-year
+             growth, updated in O(1) as days are appended
+
+Usage:
+    python -m sales_pipeline.timeseries                    # trend report for the latest day
+    python -m sales_pipeline.timeseries --days 14          # ... and the last 14 days
+
+Measures (one value per calendar day, days without sales count as zero):
+    revenue         cents
+    transactions    number of transactions
+    customers       distinct customers that bought that day
+
+Each measure is a contiguous numpy array plus a running prefix sum, so the
+sum over any window of days is one subtraction. Appending a day writes one
+value and one prefix sum (the arrays grow by doubling), and the rolling sums,
+moving averages and growth rates for the new day follow in O(1) from the
+prefix sums. Whole-series methods (rolling, growth, frame) are vectorized
+over the same arrays.
+
+Growth compares trailing windows: week over week is the last 7 days against
+the 7 before them, year over year the last 7 days against the same weekdays
+52 weeks (364 days) earlier. Windows that reach before the first day are NaN.
+
+Customers are distinct within a day only; summed over a window they count
+customer-days, so their moving average is the average number of daily
+buyers. Monthly totals are only offered for the additive measures.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.schema import CENTS_PER_DOLLAR, to_dollars
+
+MEASURES = ['revenue', 'transactions', 'customers']
+ADDITIVE_MEASURES = ['revenue', 'transactions']
+
+WINDOWS = (7, 30, 90)
+WEEK = 7
+YEAR = 364
+
+INITIAL_CAPACITY = 512
+
+
+class DailySeries:
+    """
+    Day-level measures from start onwards, one array slot per calendar day
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.start = None
+        self.length = 0
+        self.values = {measure: np.zeros(capacity, dtype=np.int64) for measure in MEASURES}
+        # cumulative[m][i] is the sum of the first i days
+        self.cumulative = {measure: np.zeros(capacity + 1, dtype=np.int64) for measure in MEASURES}
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_frame(cls, daily):
+        """
+        Series from a frame indexed by sale_date with one column per measure
+        (the daily_totals base aggregate)
+        """
+        series = cls(max(INITIAL_CAPACITY, len(daily)))
+        series.extend(daily)
+        return series
+
+    # ==========================================
+    # APPEND
+    # ==========================================
+
+    @property
+    def end(self):
+        """
+        Last day in the series (numpy datetime64[D]), or None when empty
+        """
+        return None if self.start is None else self.start + np.timedelta64(self.length - 1, 'D')
+
+    def _reserve(self, length):
+        capacity = len(self.values['revenue'])
+        if length <= capacity:
+            return
+        capacity = max(length, 2 * capacity)
+        for measure in MEASURES:
+            values = np.zeros(capacity, dtype=np.int64)
+            values[:self.length] = self.values[measure][:self.length]
+            cumulative = np.zeros(capacity + 1, dtype=np.int64)
+            cumulative[:self.length + 1] = self.cumulative[measure][:self.length + 1]
+            self.values[measure], self.cumulative[measure] = values, cumulative
+
+    def _position(self, day):
+        day = np.datetime64(pd.Timestamp(day).date(), 'D')
+        if self.start is None:
+            self.start = day
+        position = int((day - self.start) // np.timedelta64(1, 'D'))
+        if position < self.length:
+            raise ValueError(f"Days must be appended in order: {day} is not after {self.end}")
+        return position
+
+    def append(self, day, revenue, transactions, customers):
+        """
+        Add one whole day (revenue in cents); skipped days in between count as zero
+        """
+        position = self._position(day)
+        self._reserve(position + 1)
+        for measure, value in zip(MEASURES, (revenue, transactions, customers)):
+            cumulative = self.cumulative[measure]
+            # Skipped days add nothing, so their prefix sums repeat the last one
+            cumulative[self.length + 1:position + 1] = cumulative[self.length]
+            self.values[measure][position] = value
+            cumulative[position + 1] = cumulative[position] + value
+        self.length = position + 1
+        return self
+
+    def extend(self, daily):
+        """
+        Append several whole days at once from a frame indexed by sale_date
+        """
+        if not len(daily):
+            return self
+        daily = daily.sort_index()
+        days = daily.index.to_numpy().astype('datetime64[D]')
+        first = self._position(days[0])
+        positions = first + (days - days[0]).astype(np.int64)
+        length = int(positions[-1]) + 1
+        self._reserve(length)
+        for measure in MEASURES:
+            values = self.values[measure]
+            values[self.length:length] = 0
+            values[positions] = daily[measure].to_numpy(dtype=np.int64)
+            cumulative = self.cumulative[measure]
+            np.cumsum(values[self.length:length], out=cumulative[self.length + 1:length + 1])
+            cumulative[self.length + 1:length + 1] += cumulative[self.length]
+        self.length = length
+        return self
+
+    # ==========================================
+    # WINDOWS AT ONE DAY (O(1))
+    # ==========================================
+
+    def _index(self, day=None):
+        if not self.length:
+            raise ValueError("The series is empty")
+        if day is None:
+            return self.length - 1
+        index = int((np.datetime64(pd.Timestamp(day).date(), 'D') - self.start) // np.timedelta64(1, 'D'))
+        if not 0 <= index < self.length:
+            raise KeyError(f"{day} is outside {self.start} to {self.end}")
+        return index
+
+    def window_sum(self, measure, window, day=None, lag=0):
+        """
+        Sum over the window days ending lag days before day (default: the
+        last day); NaN if the window reaches before the first day
+        """
+        end = self._index(day) + 1 - lag
+        if end - window < 0:
+            return np.nan
+        cumulative = self.cumulative[measure]
+        return int(cumulative[end] - cumulative[end - window])
+
+    def moving_average(self, measure, window, day=None):
+        return self.window_sum(measure, window, day) / window
+
+    def growth(self, measure, window=WEEK, lag=WEEK, day=None):
+        """
+        % change of the trailing window against the window lag days earlier
+        """
+        current = self.window_sum(measure, window, day)
+        previous = self.window_sum(measure, window, day, lag)
+        if np.isnan(previous) or previous == 0:
+            return np.nan
+        return (current - previous) / previous * 100
+
+    def snapshot(self, day=None, windows=WINDOWS):
+        """
+        Rolling sums, moving averages and growth of every measure at one day
+        """
+        snapshot = {'day': str(self.start + np.timedelta64(self._index(day), 'D'))}
+        for measure in MEASURES:
+            scale = CENTS_PER_DOLLAR if measure == 'revenue' else 1
+            values = {'day': int(self.values[measure][self._index(day)]) / scale}
+            for window in windows:
+                values[f'sum_{window}d'] = self.window_sum(measure, window, day) / scale
+                values[f'avg_{window}d'] = self.moving_average(measure, window, day) / scale
+            values['wow_pct'] = self.growth(measure, WEEK, WEEK, day)
+            values['yoy_pct'] = self.growth(measure, WEEK, YEAR, day)
+            snapshot[measure] = values
+        return snapshot
+
+    # ==========================================
+    # WHOLE SERIES (VECTORIZED)
+    # ==========================================
+
+    def days(self):
+        return pd.date_range(pd.Timestamp(self.start), periods=self.length, freq='D', name='sale_date') \
+            if self.length else pd.DatetimeIndex([], name='sale_date')
+
+    def series(self, measure):
+        """
+        The daily values as a view, revenue in cents
+        """
+        return self.values[measure][:self.length]
+
+    def rolling_sum(self, measure, window, lag=0):
+        """
+        Sum of the window days ending lag days before each day (float, NaN where incomplete)
+        """
+        cumulative = self.cumulative[measure][:self.length + 1].astype(np.float64)
+        sums = np.full(self.length, np.nan)
+        first = window - 1 + lag
+        if first < self.length:
+            sums[first:] = cumulative[window:self.length + 1 - lag] - cumulative[:self.length + 1 - lag - window]
+        return sums
+
+    def rolling_growth(self, measure, window=WEEK, lag=WEEK):
+        current = self.rolling_sum(measure, window)
+        previous = self.rolling_sum(measure, window, lag)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = (current - previous) / previous * 100
+        growth[previous == 0] = np.nan
+        return growth
+
+    def frame(self, measure='revenue', windows=WINDOWS):
+        """
+        One row per day: the measure, its rolling sums and moving averages,
+        and week-over-week / year-over-year growth; revenue in dollars
+        """
+        scale = CENTS_PER_DOLLAR if measure == 'revenue' else 1
+        frame = pd.DataFrame({measure: self.series(measure) / scale}, index=self.days())
+        for window in windows:
+            rolling = self.rolling_sum(measure, window) / scale
+            frame[f'sum_{window}d'] = rolling
+            frame[f'avg_{window}d'] = rolling / window
+        frame['wow_pct'] = self.rolling_growth(measure, WEEK, WEEK)
+        frame['yoy_pct'] = self.rolling_growth(measure, WEEK, YEAR)
+        return frame
+
+    def monthly(self, measure='revenue'):
+        """
+        Monthly totals indexed by year_month, like the monthly_revenue base
+        aggregate (revenue in dollars)
+        """
+        if measure not in ADDITIVE_MEASURES:
+            raise ValueError(f"Monthly totals of {measure!r} would double-count; "
+                             f"use one of {', '.join(ADDITIVE_MEASURES)}")
+        months = self.days().to_period('M')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if self.length else np.array([], dtype=int)
+        totals = np.add.reduceat(self.series(measure), starts) if self.length else np.zeros(0, dtype=np.int64)
+        monthly = pd.Series(totals, index=pd.PeriodIndex(months[starts], name='year_month'), name=measure)
+        return to_dollars(monthly) if measure == 'revenue' else monthly
+
+
+def daily_series(ctx):
+    """
+    DailySeries over the daily_totals aggregate of an AnalysisContext
+    """
+    return DailySeries.from_frame(ctx.daily_totals)
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Rolling revenue trends from the daily series.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--days', type=int, default=0, help='also list the last N days')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from sales_pipeline.context import get_context
+
+    args = parse_args(argv)
+    series = daily_series(get_context(args.source))
+
+    print("=" * 70)
+    print("ROLLING REVENUE TRENDS")
+    print("=" * 70)
+    print(f"\n📅 {len(series):,} days, {series.start} to {series.end}")
+
+    snapshot = series.snapshot()
+    print(f"\n{'As of ' + snapshot['day']:<18} {'Day':>14} " +
+          ' '.join(f"{f'{w}-day avg':>14}" for w in WINDOWS) + f" {'WoW':>9} {'YoY':>9}")
+    for measure in MEASURES:
+        values = snapshot[measure]
+        money = '$' if measure == 'revenue' else ''
+        cells = [f"{money}{values['day']:,.2f}"] + [f"{money}{values[f'avg_{w}d']:,.2f}" for w in WINDOWS]
+        growth = [f"{values[key]:+.1f}%" if pd.notna(values[key]) else 'n/a' for key in ('wow_pct', 'yoy_pct')]
+        print(f"{measure:<18} " + ' '.join(f"{cell:>14}" for cell in cells) + ' '.join(f"{g:>10}" for g in growth))
+
+    if args.days:
+        print(f"\nLast {args.days} days (revenue):")
+        print(series.frame('revenue').tail(args.days).round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
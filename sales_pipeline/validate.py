@@ -0,0 +1,383 @@
+"""
+Data Quality Validator
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Runs the data-quality checks of 02_data_analysis.py in one
+             streaming pass over record batches, so files of any size can
+             be validated in bounded memory
+
+Usage:
+    python -m sales_pipeline.validate                              # sales_data.parquet or sales_data.csv
+    python -m sales_pipeline.validate big.csv --report report.json --offsets violations.csv
+    python -m sales_pipeline.validate big.csv --duplicates bloom --expected-rows 500000000
+
+Checks, per row:
+    missing_values              any empty field (also counted per column)
+    duplicate_transaction_id    transaction id seen on an earlier row
+    revenue_mismatch            revenue != quantity * unit_price, in cents
+    invalid_id                  transaction or customer id without a numeric part
+A row can fail several checks. Rows are numbered from 0 in file order
+(the header line is not a row), like the index of the frame in 02.
+
+Duplicates are found on the integer part of the transaction id. By default
+the seen ids are kept in an exact bitmap: one bit per id up to the largest
+one, 125 MB for ids up to a billion. --duplicates bloom uses a Bloom filter
+sized for --expected-rows instead, whatever the id range: about 3.4 bytes
+per row at the default 0.1% false-positive rate, so it pays off when ids
+are sparse (numbered far beyond the row count). It never misses a
+duplicate, but a small share of the reported ones may be false; the
+estimated rate is in the report.
+
+The report counts violations per check and keeps the offsets of the first
+--max-offsets rows of each; --offsets writes every violating row as it is
+found. The command exits with status 1 when any check fails.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sales_pipeline.instrument import stage
+from sales_pipeline.kpis import CustomerBitmap, hash64
+from sales_pipeline.schema import CENTS_PER_DOLLAR, COLUMNS
+from sales_pipeline.storage import (ID_LETTERS, csv_inputs, default_source, iter_csv_batches,
+                                    null_convert_options, open_dataset)
+
+CHECKS = ['missing_values', 'duplicate_transaction_id', 'revenue_mismatch', 'invalid_id']
+
+MAX_OFFSETS = 1000
+BLOOM_ERROR_RATE = 0.001
+CSV_BLOCK_SIZE = 1 << 20
+PARQUET_BATCH_SIZE = 1_000_000
+
+
+# ==========================================
+# SEEN TRANSACTION IDS
+# ==========================================
+
+class BloomFilter:
+    """
+    Approximate set of integer keys in a fixed number of bits: no false
+    negatives, false positives at about error_rate once capacity keys are in.
+
+    Register-blocked: all the bits of one key sit in a single 64-bit word,
+    so checking or adding a key touches one word instead of n_hashes random
+    bytes. That needs somewhat more bits than a classic Bloom filter for the
+    same error rate; the filter is sized for it.
+    """
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        bits_per_key = -math.log(error_rate) / math.log(2) ** 2
+        # Up to 10 bit positions of 6 bits each fit in one 64-bit hash
+        self.n_hashes = min(10, max(1, round(bits_per_key * math.log(2))))
+        n_words = math.ceil(self.capacity * bits_per_key / 64)
+        while self.expected_rate(self.capacity, n_words) > error_rate:
+            n_words = math.ceil(n_words * 1.05)
+        self.words = np.zeros(n_words, dtype=np.uint64)
+        self.added = 0
+
+    def expected_rate(self, keys, n_words=None):
+        """
+        False-positive rate with keys added: keys land in words as a Poisson
+        process, and a word holding j keys has j * n_hashes bit positions drawn
+        """
+        n_words = n_words or len(self.words)
+        load = keys / n_words
+        # Positions can repeat, so a key sets fewer than n_hashes distinct bits
+        distinct = 64 * (1 - (63 / 64) ** self.n_hashes)
+        rate, probability = 0.0, math.exp(-load)
+        for j in range(int(load + 10 * math.sqrt(load) + 20)):
+            if j:
+                probability *= load / j
+            rate += probability * (1 - (63 / 64) ** (self.n_hashes * j)) ** distinct
+        return rate
+
+    def _locate(self, keys):
+        """
+        (word index, bit mask) of every key
+        """
+        hashes = hash64(keys)
+        # Multiply-shift maps the top 32 bits onto the words without a division
+        index = ((hashes >> np.uint64(32)) * np.uint64(len(self.words))) >> np.uint64(32)
+        bits = hash64(hashes)
+        mask = np.zeros(len(hashes), dtype=np.uint64)
+        for i in range(self.n_hashes):
+            mask |= np.left_shift(np.uint64(1), (bits >> np.uint64(6 * i)) & np.uint64(63))
+        return index.astype(np.intp), mask
+
+    def contains(self, keys):
+        """
+        Boolean array: which keys may have been added
+        """
+        index, mask = self._locate(keys)
+        return self.words[index] & mask == mask
+
+    def update(self, keys):
+        index, mask = self._locate(keys)
+        # A fancy-indexed |= keeps only the last write to a repeated word,
+        # so bits lost that way are set again (much faster than bitwise_or.at)
+        while len(index):
+            self.words[index] |= mask
+            lost = self.words[index] & mask != mask
+            index, mask = index[lost], mask[lost]
+        self.added += len(keys)
+        return self
+
+    def false_positive_rate(self):
+        """
+        Expected false-positive rate for the keys added so far
+        """
+        return self.expected_rate(self.added)
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+
+
+def estimate_rows(source):
+    """
+    Row count of a Parquet dataset, or an estimate for CSV from the first block
+    """
+    if os.path.isdir(source) and not glob.glob(os.path.join(source, '*.csv')):
+        return open_dataset(source).count_rows()
+    paths = csv_inputs(source)
+    with open(paths[0], 'rb') as f:
+        sample = f.read(CSV_BLOCK_SIZE)
+    bytes_per_row = len(sample) / max(sample.count(b'\n'), 1)
+    return int(sum(os.path.getsize(path) for path in paths) / bytes_per_row)
+
+
+# ==========================================
+# CHECKS
+# ==========================================
+
+def id_keys(column):
+    """
+    (int64 keys, invalid mask or None) for an ID column, raw ('TXN00001')
+    or typed; null and invalid ids get key 0
+    """
+    if not pa.types.is_string(column.type) and not pa.types.is_large_string(column.type):
+        return integers(column), None
+    digits = pc.utf8_ltrim(column, characters=ID_LETTERS)
+    try:
+        keys = pc.cast(digits, pa.int64())
+        invalid = None
+    except pa.ArrowInvalid:
+        valid = pc.fill_null(pc.utf8_is_digit(digits), True)
+        keys = pc.cast(pc.if_else(valid, digits, None), pa.int64())
+        invalid = ~valid.to_numpy(zero_copy_only=False)
+    return pc.fill_null(keys, 0).to_numpy(), invalid
+
+
+def integers(column):
+    return pc.fill_null(column, 0).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def cents(column):
+    """
+    int64 cents: CSV money is read in dollars, the typed schema stores cents
+    """
+    if pa.types.is_floating(column.type):
+        column = pc.round(pc.multiply(column, CENTS_PER_DOLLAR))
+    return integers(column)
+
+
+class Validator:
+    """
+    One-pass data-quality checks; feed it record batches in file order
+    (raw CSV or the typed schema) and read the result with report()
+    """
+
+    def __init__(self, duplicates='exact', expected_rows=None, error_rate=BLOOM_ERROR_RATE,
+                 max_offsets=MAX_OFFSETS, offsets_file=None):
+        if duplicates == 'bloom':
+            if not expected_rows:
+                raise ValueError("duplicates='bloom' needs expected_rows to size the filter")
+            self.seen = BloomFilter(expected_rows, error_rate)
+        else:
+            self.seen = CustomerBitmap()
+        self.duplicates = duplicates
+        self.max_offsets = max_offsets
+        self.offsets_file = offsets_file
+        self.rows = 0
+        self.missing_by_column = {}
+        self.violations = dict.fromkeys(CHECKS, 0)
+        self.first_offsets = {check: [] for check in CHECKS}
+
+    def update(self, batch):
+        n_rows = batch.num_rows
+        if not n_rows:
+            return self
+
+        missing = None
+        for name, column in zip(batch.schema.names, batch.columns):
+            nulls = column.null_count
+            self.missing_by_column[name] = self.missing_by_column.get(name, 0) + nulls
+            if nulls:
+                mask = column.is_null().to_numpy(zero_copy_only=False)
+                missing = mask if missing is None else missing | mask
+
+        ids = batch.column('transaction_id')
+        keys, invalid = id_keys(ids)
+        has_id = ~ids.is_null().to_numpy(zero_copy_only=False) if ids.null_count else np.ones(n_rows, dtype=bool)
+        if invalid is not None:
+            has_id &= ~invalid
+        invalid_customer = id_keys(batch.column('customer_id'))[1]
+        if invalid_customer is not None:
+            invalid = invalid_customer if invalid is None else invalid | invalid_customer
+        keys = keys[has_id]
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[np.unique(keys, return_index=True)[1]] = False
+        duplicate = np.zeros(n_rows, dtype=bool)
+        duplicate[has_id] = repeated | self.seen.contains(keys)
+        self.seen.update(keys)
+
+        expected = cents(batch.column('unit_price')) * integers(batch.column('quantity'))
+        revenue_mismatch = expected != cents(batch.column('revenue'))
+        if missing is not None:
+            revenue_mismatch &= ~missing
+
+        for check, mask in [('missing_values', missing), ('duplicate_transaction_id', duplicate),
+                            ('revenue_mismatch', revenue_mismatch), ('invalid_id', invalid)]:
+            if mask is not None and mask.any():
+                self.record(check, np.flatnonzero(mask) + self.rows)
+        self.rows += n_rows
+        return self
+
+    def record(self, check, offsets):
+        self.violations[check] += len(offsets)
+        room = self.max_offsets - len(self.first_offsets[check])
+        if room > 0:
+            self.first_offsets[check].extend(offsets[:room].tolist())
+        if self.offsets_file is not None:
+            self.offsets_file.write(''.join(f'{offset},{check}\n' for offset in offsets.tolist()))
+
+    def report(self):
+        duplicates = {'method': self.duplicates, 'memory_bytes': self.seen.nbytes}
+        if self.duplicates == 'bloom':
+            duplicates['false_positive_rate'] = round(self.seen.false_positive_rate(), 6)
+        return {
+            'rows': self.rows,
+            'valid': not any(self.violations.values()),
+            'violations': dict(self.violations),
+            'missing_by_column': dict(self.missing_by_column),
+            'first_offsets': {check: offsets for check, offsets in self.first_offsets.items() if offsets},
+            'duplicates': duplicates
+        }
+
+
+def iter_raw_batches(source):
+    """
+    Record batches as stored: raw CSV columns (empty fields as nulls) or the typed Parquet schema
+    """
+    if os.path.isdir(source) and not glob.glob(os.path.join(source, '*.csv')):
+        yield from open_dataset(source).to_batches(columns=COLUMNS, batch_size=PARQUET_BATCH_SIZE)
+        return
+    yield from iter_csv_batches(csv_inputs(source), CSV_BLOCK_SIZE, null_convert_options)
+
+
+def validate_source(source=None, **options):
+    """
+    Validation report for one pass over a CSV file, shard directory or Parquet dataset
+    """
+    source = source or default_source()
+    validator = Validator(**options)
+    start = time.perf_counter()
+    with stage('validate', source=source) as record:
+        for batch in iter_raw_batches(source):
+            validator.update(batch)
+        record['rows'] = validator.rows
+    seconds = time.perf_counter() - start
+    return {'source': source, **validator.report(), 'seconds': round(seconds, 3),
+            'rows_per_second': round(validator.rows / seconds) if seconds else None}
+
+
+def validate_frame(df, batch_rows=PARQUET_BATCH_SIZE):
+    """
+    Validation report for a sales frame already in memory
+    """
+    validator = Validator()
+    for batch in pa.Table.from_pandas(df, preserve_index=False).to_batches(max_chunksize=batch_rows):
+        validator.update(batch)
+    return validator.report()
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check the sales data for quality problems in one streaming pass.')
+    parser.add_argument('source', nargs='?',
+                        help='CSV file, shard directory or Parquet dataset '
+                             '(default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--duplicates', choices=['exact', 'bloom'], default='exact',
+                        help='seen transaction ids: exact bitmap or Bloom filter (default: exact)')
+    parser.add_argument('--expected-rows', type=int,
+                        help='rows to size the Bloom filter for (default: estimated from the source)')
+    parser.add_argument('--error-rate', type=float, default=BLOOM_ERROR_RATE,
+                        help=f'Bloom filter false-positive rate (default: {BLOOM_ERROR_RATE})')
+    parser.add_argument('--max-offsets', type=int, default=MAX_OFFSETS,
+                        help=f'violating row offsets kept in the report per check (default: {MAX_OFFSETS})')
+    parser.add_argument('--offsets', metavar='PATH', help='write every violating row as "row,check" lines')
+    parser.add_argument('--report', metavar='PATH', help='write the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    source = args.source or default_source()
+
+    print("=" * 70)
+    print("DATA QUALITY VALIDATION")
+    print("=" * 70)
+
+    options = {'duplicates': args.duplicates, 'max_offsets': args.max_offsets}
+    if args.duplicates == 'bloom':
+        options['expected_rows'] = args.expected_rows or estimate_rows(source)
+        options['error_rate'] = args.error_rate
+
+    offsets_file = open(args.offsets, 'w') if args.offsets else None
+    try:
+        if offsets_file is not None:
+            offsets_file.write('row,check\n')
+        report = validate_source(source, offsets_file=offsets_file, **options)
+    finally:
+        if offsets_file is not None:
+            offsets_file.close()
+
+    print(f"\n📦 {report['rows']:,} rows from {source} in {report['seconds']:.2f}s "
+          f"({report['rows_per_second'] or 0:,} rows/s)")
+    duplicates = report['duplicates']
+    print(f"   Seen ids: {duplicates['method']}, {duplicates['memory_bytes'] / 1024:,.1f} KB"
+          + (f", est. false-positive rate {duplicates['false_positive_rate']:.4%}"
+             if 'false_positive_rate' in duplicates else ''))
+
+    print(f"\n{'Check':<28} {'Rows':>12}   First offsets")
+    for check, count in report['violations'].items():
+        first = report['first_offsets'].get(check, [])[:5]
+        print(f"{check:<28} {count:>12,}   {'✅' if not count else '⚠️  ' + ', '.join(map(str, first))}")
+    missing = {column: count for column, count in report['missing_by_column'].items() if count}
+    if missing:
+        print(f"\nMissing values by column: {missing}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.report}")
+
+    print(f"\n{'✅ All checks passed' if report['valid'] else '❌ Data quality issues found'}")
+    sys.exit(0 if report['valid'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""
+Indexed SQLite Warehouse
+Author: Juan Esteban Agudelo Alonso
+Project: Sales Data Analysis Portfolio
+Description: Loads the sales dataset into a normalized, indexed SQLite file
+             and serves point lookups (one customer's history, one day's
+             revenue) from the indexes instead of a scan of the data
+
+Usage:
+    python -m sales_pipeline.warehouse                          # build or reuse, print the layout
+    python -m sales_pipeline.warehouse --customer CUST0042      # one customer's history
+    python -m sales_pipeline.warehouse --day 2024-06-01         # one day's revenue by category
+    python -m sales_pipeline.warehouse --day 2024-06-01 --explain --compare-scan
+
+Schema:
+    products        product dimension: product_id, product, product_category
+    customers       customer dimension: customer_id, customer_code, first and
+                    last purchase, transactions
+    transactions    fact table: transaction_id, sale_date, customer_id,
+                    product_id, quantity, unit_price and revenue
+    sales_transactions
+                    view joining the fact to the product dimension, with the
+                    column layout sql_queries.sql is written against
+
+Indexes lead with (sale_date), (customer_id, sale_date) and
+(product_category, product); the two on the fact table carry the measures
+as trailing columns, so the point lookups are answered from the index alone.
+A fourth, (product_id, sale_date), serves product and category filters.
+
+The fact table keeps SQLite's rowid as its key and only a non-unique index
+on transaction_id: duplicate or missing transaction IDs are data-quality
+findings (see sales_pipeline.validate), so they are loaded and counted
+instead of failing the load. Missing IDs and products are stored as NULL.
+
+The load runs as a single transaction: each record batch is bulk-inserted
+with executemany, and the indexes are built once after the last batch. The
+file is rebuilt when the source data changes.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from sales_pipeline.schema import CENTS_PER_DOLLAR, customer_key, format_ids
+from sales_pipeline.storage import (as_date, default_source, fingerprint_digest, iter_batches,
+                                    load_sales, source_fingerprint)
+
+DATABASE_FILE = os.path.join('.pipeline_cache', 'sql', 'sales.sqlite')
+
+# Bumped whenever the schema changes, so older database files are rebuilt
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE products (
+    product_id INTEGER PRIMARY KEY,
+    product TEXT NOT NULL UNIQUE,
+    product_category TEXT NOT NULL
+);
+CREATE TABLE customers (
+    customer_id INTEGER PRIMARY KEY,
+    customer_code TEXT NOT NULL,
+    first_purchase TEXT NOT NULL,
+    last_purchase TEXT NOT NULL,
+    transactions INTEGER NOT NULL
+);
+CREATE TABLE transactions (
+    transaction_id INTEGER,
+    sale_date TEXT NOT NULL,
+    customer_id INTEGER REFERENCES customers (customer_id),
+    product_id INTEGER REFERENCES products (product_id),
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    revenue REAL NOT NULL
+);
+CREATE VIEW sales_transactions AS
+SELECT t.transaction_id, t.sale_date, p.product, p.product_category,
+       t.customer_id, t.quantity, t.unit_price, t.revenue
+FROM transactions t
+LEFT JOIN products p ON p.product_id = t.product_id;
+CREATE TABLE _meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+INDEXES = """
+CREATE INDEX idx_transactions_date ON transactions (sale_date, product_id, quantity, revenue);
+CREATE INDEX idx_transactions_customer ON transactions
+    (customer_id, sale_date, product_id, quantity, unit_price, revenue);
+CREATE INDEX idx_transactions_product ON transactions (product_id, sale_date, quantity, revenue);
+CREATE INDEX idx_products_category ON products (product_category, product);
+CREATE INDEX idx_transactions_id ON transactions (transaction_id);
+"""
+
+CUSTOMER_HISTORY = """
+SELECT t.transaction_id, t.sale_date, p.product, p.product_category,
+       t.quantity, t.unit_price, t.revenue
+FROM transactions t
+JOIN products p ON p.product_id = t.product_id
+WHERE t.customer_id = ?
+ORDER BY t.sale_date, t.transaction_id
+"""
+
+DAY_REVENUE = """
+SELECT p.product_category,
+       COUNT(*) AS transactions,
+       SUM(t.quantity) AS units_sold,
+       ROUND(SUM(t.revenue), 2) AS revenue
+FROM transactions t
+JOIN products p ON p.product_id = t.product_id
+WHERE t.sale_date = ?
+GROUP BY p.product_category
+ORDER BY revenue DESC
+"""
+
+
+# ==========================================
+# LOAD
+# ==========================================
+
+def _statements(script):
+    return [statement for statement in script.split(';') if statement.strip()]
+
+
+def _date_text(dates):
+    # strftime once per distinct day rather than once per row
+    days, inverse = np.unique(dates.to_numpy(), return_inverse=True)
+    return pd.DatetimeIndex(days).strftime('%Y-%m-%d').to_numpy(dtype=object)[inverse]
+
+
+def _product_ids(df, products, conn):
+    """
+    Product dimension keys for a batch, adding products not seen before
+    """
+    product = df['product'].astype('category')
+    new = df.loc[~df['product'].isin(list(products)) & df['product'].notna(),
+                 ['product', 'product_category']].drop_duplicates('product')
+    rows = []
+    for name, category in new.itertuples(index=False):
+        products[name] = len(products) + 1
+        rows.append((products[name], str(name), str(category)))
+    conn.executemany('INSERT INTO products VALUES (?, ?, ?)', rows)
+    lookup = np.array([products[name] for name in product.cat.categories], dtype=np.int64)
+    codes = product.cat.codes.to_numpy()
+    ids = lookup[codes].tolist()
+    if (codes < 0).any():
+        # Missing products are stored as NULL
+        ids = [None if code < 0 else key for code, key in zip(codes.tolist(), ids)]
+    return ids
+
+
+def _keys(column):
+    # Missing IDs are stored as NULL
+    if column.null_count:
+        return column.to_pylist()
+    return column.to_numpy().astype(np.int64).tolist()
+
+
+def insert_batch(conn, batch, products):
+    """
+    Bulk-insert one record batch into the fact table; returns rows inserted
+    """
+    df = batch.to_pandas(date_as_object=False)
+    columns = [
+        _keys(batch.column('transaction_id')),
+        _date_text(df['sale_date']).tolist(),
+        _keys(batch.column('customer_id')),
+        _product_ids(df, products, conn),
+        df['quantity'].to_numpy(dtype=np.int64).tolist(),
+        (df['unit_price'].to_numpy() / CENTS_PER_DOLLAR).tolist(),
+        (df['revenue'].to_numpy() / CENTS_PER_DOLLAR).tolist()
+    ]
+    conn.executemany('INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)', zip(*columns))
+    return len(df)
+
+
+def build_database(source, path=DATABASE_FILE):
+    """
+    Load the source into a fresh database file and swap it in; returns rows loaded.
+
+    IDs are stored as their integer keys; customer labels live in the
+    customer dimension and query results are relabelled on the way out.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    # Nothing reads the file until it is swapped in, so skip the journal
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -65536')
+
+    # executescript would commit between statements, so run them one by one
+    conn.execute('BEGIN')
+    for statement in _statements(SCHEMA):
+        conn.execute(statement)
+    products, widths, rows = {}, {}, 0
+    for batch, widths in iter_batches(source):
+        rows += insert_batch(conn, batch, products)
+    for statement in _statements(INDEXES):
+        conn.execute(statement)
+
+    customers = pd.read_sql_query(
+        'SELECT customer_id, MIN(sale_date) AS first_purchase, MAX(sale_date) AS last_purchase, '
+        'COUNT(*) AS transactions FROM transactions WHERE customer_id IS NOT NULL GROUP BY customer_id', conn)
+    customers.insert(1, 'customer_code', format_ids(customers['customer_id'], 'customer_id',
+                                                    widths.get('customer_id')))
+    conn.executemany('INSERT INTO customers VALUES (?, ?, ?, ?, ?)',
+                     customers.itertuples(index=False, name=None))
+
+    last_date = conn.execute('SELECT MAX(sale_date) FROM transactions').fetchone()[0]
+    duplicates = conn.execute('SELECT COUNT(transaction_id) - COUNT(DISTINCT transaction_id) '
+                              'FROM transactions').fetchone()[0]
+    conn.executemany('INSERT INTO _meta VALUES (?, ?)', [
+        ('fingerprint', fingerprint_digest(source_fingerprint(source))),
+        ('schema_version', str(SCHEMA_VERSION)),
+        ('id_widths', json.dumps(widths)),
+        ('last_date', last_date),
+        ('rows', str(rows)),
+        ('duplicate_transactions', str(duplicates))
+    ])
+    conn.execute('COMMIT')
+    conn.execute('ANALYZE')
+    conn.close()
+    os.replace(tmp_path, path)
+    return rows
+
+
+def print_duplicates(metadata):
+    duplicates = int(metadata.get('duplicate_transactions', 0))
+    if duplicates:
+        print(f"   ⚠️  {duplicates:,} rows repeat a transaction_id of an earlier row "
+              f"(python -m sales_pipeline.validate lists them)")
+
+
+def read_meta(conn):
+    try:
+        return dict(conn.execute('SELECT key, value FROM _meta').fetchall())
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def connect(source=None, path=DATABASE_FILE, rebuild=False):
+    """
+    Connection to the cached database, rebuilt first if the source or the
+    schema changed.
+
+    Returns (connection, metadata, rebuilt).
+    """
+    source = source or default_source()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fingerprint = fingerprint_digest(source_fingerprint(source))
+
+    conn = None
+    if os.path.exists(path) and not rebuild:
+        conn = sqlite3.connect(path)
+        metadata = read_meta(conn)
+        if metadata.get('fingerprint') != fingerprint or \
+                metadata.get('schema_version') != str(SCHEMA_VERSION):
+            conn.close()
+            conn = None
+    rebuilt = conn is None
+    if rebuilt:
+        build_database(source, path)
+        conn = sqlite3.connect(path)
+
+    metadata = read_meta(conn)
+    metadata['id_widths'] = json.loads(metadata['id_widths'])
+    return conn, metadata, rebuilt
+
+
+# ==========================================
+# POINT LOOKUPS
+# ==========================================
+
+def customer_history(conn, customer, id_widths=None):
+    """
+    Every transaction of one customer, oldest first
+    """
+    history = pd.read_sql_query(CUSTOMER_HISTORY, conn, params=(customer_key(customer),))
+    history['transaction_id'] = format_ids(history['transaction_id'], 'transaction_id',
+                                           (id_widths or {}).get('transaction_id'))
+    return history
+
+
+def day_revenue(conn, day):
+    """
+    One day's transactions, units and revenue by category
+    """
+    return pd.read_sql_query(DAY_REVENUE, conn, params=(str(as_date(day)),))
+
+
+def query_plan(conn, sql, params):
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def timed(lookup, *args):
+    start = time.perf_counter()
+    result = lookup(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def scan_customer(source, customer):
+    df = load_sales(source)
+    return df[df['customer_id'] == customer_key(customer)]
+
+
+def scan_day(source, day):
+    df = load_sales(source)
+    return df[df['sale_date'] == pd.Timestamp(as_date(day))]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the indexed SQLite warehouse and run point lookups.')
+    parser.add_argument('--source', help='sales dataset (default: sales_data.parquet if present, else sales_data.csv)')
+    parser.add_argument('--database', default=DATABASE_FILE, help=f'database file (default: {DATABASE_FILE})')
+    parser.add_argument('--rebuild', action='store_true', help='reload even if the source has not changed')
+    parser.add_argument('--customer', help="print one customer's history (e.g. CUST0042)")
+    parser.add_argument('--day', help="print one day's revenue by category (YYYY-MM-DD)")
+    parser.add_argument('--explain', action='store_true', help='print the query plan of each lookup')
+    parser.add_argument('--compare-scan', action='store_true',
+                        help='also time the same lookup as a full read of the source')
+    args = parser.parse_args(argv)
+    if args.customer and customer_key(args.customer) is None:
+        parser.error(f"--customer: not a customer ID: {args.customer}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    source = args.source or default_source()
+
+    print("=" * 70)
+    print("SALES WAREHOUSE")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    conn, metadata, rebuilt = connect(source, args.database, args.rebuild)
+    print(f"\n🗄️  Database: {args.database} "
+          f"({'loaded in' if rebuilt else 'reused,'} {time.perf_counter() - start:.2f}s)")
+    for table in ['transactions', 'customers', 'products']:
+        count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        print(f"   {table:<14} {count:>12,} rows")
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                           "AND name LIKE 'idx_%' ORDER BY name").fetchall()
+    print(f"   Indexes: {', '.join(name for name, in indexes)}")
+    print_duplicates(metadata)
+
+    lookups = []
+    if args.customer:
+        lookups.append((f"Customer {args.customer}", CUSTOMER_HISTORY, (customer_key(args.customer),),
+                        lambda: customer_history(conn, args.customer, metadata['id_widths']),
+                        lambda: scan_customer(source, args.customer)))
+    if args.day:
+        lookups.append((f"Day {args.day}", DAY_REVENUE, (str(as_date(args.day)),),
+                        lambda: day_revenue(conn, args.day),
+                        lambda: scan_day(source, args.day)))
+
+    for title, sql, params, lookup, scan in lookups:
+        result, ms = timed(lookup)
+        print(f"\n🔎 {title}: {len(result):,} rows in {ms:.2f} ms")
+        if args.explain:
+            for step in query_plan(conn, sql, params):
+                print(f"   plan: {step}")
+        if args.compare_scan:
+            scanned, scan_ms = timed(scan)
+            print(f"   Full read of the source: {len(scanned):,} rows in {scan_ms:.0f} ms "
+                  f"({scan_ms / max(ms, 1e-3):,.0f}x slower)")
+        print(result.to_string(index=False) if len(result) else "   (no rows)")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import numpy as np
+
+from sales_pipeline.quantiles import KLLSketch
+
+
+def small_sketch():
+    sketch = KLLSketch(seed=0)
+    sketch.update(np.arange(1, 101, dtype=np.float64))
+    return sketch
+
+
+def test_small_sketch_scalar_quantile():
+    median = small_sketch().quantile(0.5)
+    assert np.ndim(median) == 0
+    assert float(median) == np.quantile(np.arange(1, 101), 0.5)
+
+
+def test_small_sketch_array_quantiles():
+    quantiles = [0.0, 0.25, 0.5, 1.0]
+    estimate = small_sketch().quantile(quantiles)
+    assert estimate.shape == (4,)
+    np.testing.assert_array_equal(estimate, np.quantile(np.arange(1, 101), quantiles))